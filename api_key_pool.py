@@ -0,0 +1,214 @@
+"""Module for api_key_pool."""
+
+import hashlib
+import itertools
+import logging
+import os
+import threading
+import time
+import metrics
+from gateways.http_session import ApiKeyRejectedError, THROTTLED_KEY_STATUSES
+from rate_controller import RateController
+
+_wait_seconds = metrics.histogram(
+    'api_key_pool_wait_seconds',
+    'Seconds each call waited for a key in the pool to allow it.'
+)
+_retired_keys = metrics.counter(
+    'api_key_pool_retired_keys_total',
+    'API keys taken out of rotation after being rejected.'
+)
+_throttled_calls = metrics.counter(
+    'api_key_pool_throttled_calls_total',
+    'Calls the API throttled, after which their key was rested.'
+)
+
+class NoApiKeysError(Exception):
+    """Raised when every key in an ApiKeyPool has been retired."""
+
+class ApiKeyPool:
+    """Pool of API keys for a metered weather API, each with its own budget
+    of 'calls_per_minute' calls per minute, up to 'burst' at once, and
+    'calls_per_day' calls per calendar day in 'timezone', as a
+    RateController enforces.
+
+    Each call is made with the key that has the most calls left today,
+    taking turns between keys that are level, so the pool as a whole
+    allows as many calls as all of its keys together. Keys that the API
+    rejects as unauthorized are taken out of rotation for as long as the
+    pool lives. A key that the API throttles is rested instead, for
+    'initial_backoff' seconds, doubling with each throttled call in a row up
+    to 'max_backoff', and then used again.
+
+    When 'state_directory' is given, each key's calls today are saved there
+    under a name derived from a hash of the key, so the daily budgets
+    survive restarts without the keys being written to disk. A
+    'legacy_state_filename', written by a single RateController before the
+    pool was used, is moved there as the state of the first key, unless
+    that key already has some.
+    """
+    def __init__(self, api_keys, calls_per_minute=None, calls_per_day=None,
+                 burst=1, state_directory=None, timezone='UTC',
+                 clock=time.time, initial_backoff=1.0, max_backoff=3600.0,
+                 legacy_state_filename=None):
+        if state_directory is not None:
+            os.makedirs(state_directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._clock = clock
+        self._initial_backoff = initial_backoff
+        self._max_backoff = max_backoff
+        self._turns = itertools.count()
+        self._rate_controllers = {}
+        self._last_turns = {}
+        self._backoffs = {}
+        self._rested_until = {}
+
+        for index, api_key in enumerate(dict.fromkeys(api_keys)):
+            state_filename = None
+            if state_directory is not None:
+                state_filename = os.path.join(
+                    state_directory,
+                    ApiKeyPool._make_key_name(api_key) + '.json'
+                )
+                if index == 0 and legacy_state_filename is not None:
+                    ApiKeyPool._migrate_state(legacy_state_filename,
+                                              state_filename)
+
+            self._rate_controllers[api_key] = RateController(
+                calls_per_minute,
+                calls_per_day,
+                burst,
+                state_filename,
+                timezone,
+                clock
+            )
+            self._last_turns[api_key] = -1
+
+        if not self._rate_controllers:
+            raise ValueError('An ApiKeyPool needs at least one API key')
+
+    @property
+    def api_keys(self):
+        """Return the keys still in rotation."""
+        with self._lock:
+            return list(self._rate_controllers)
+
+    def call(self, function, *args, **kwargs):
+        """Return function(*args, api_key=api_key, **kwargs) for a key chosen
+        by 'acquire'. If 'function' raises ApiKeyRejectedError, the key is
+        rested if it was throttled or else retired, and the call is made
+        again.
+        """
+        while True:
+            api_key = self.acquire()
+            try:
+                result = function(*args, api_key=api_key, **kwargs)
+            except ApiKeyRejectedError as error:
+                if error.status_code in THROTTLED_KEY_STATUSES:
+                    self.back_off(api_key)
+                else:
+                    self.retire(api_key, error)
+                continue
+
+            with self._lock:
+                self._backoffs.pop(api_key, None)
+            return result
+
+    def acquire(self):
+        """Block until some key may be used, count the call against it and
+        return it. Raise NoApiKeysError if every key has been retired.
+        """
+        with _wait_seconds.time():
+            while True:
+                with self._lock:
+                    api_key, wait = self._try_acquire()
+                if api_key is not None:
+                    return api_key
+                time.sleep(wait)
+
+    def back_off(self, api_key):
+        """Rest 'api_key' for twice as long as the last time it was rested
+        without having been used successfully since.
+        """
+        with self._lock:
+            if api_key not in self._rate_controllers:
+                return
+            backoff = min(
+                self._backoffs.get(api_key, self._initial_backoff/2)*2,
+                self._max_backoff
+            )
+            self._backoffs[api_key] = backoff
+            self._rested_until[api_key] = self._clock() + backoff
+
+        _throttled_calls.inc()
+        logging.warning('Resting throttled API key {name} for {seconds} '
+                        'seconds'.format(
+                            name=ApiKeyPool._make_key_name(api_key),
+                            seconds=backoff
+                        ))
+
+    def retire(self, api_key, reason=None):
+        """Take 'api_key' out of rotation."""
+        with self._lock:
+            if self._rate_controllers.pop(api_key, None) is None:
+                return
+            del self._last_turns[api_key]
+            self._backoffs.pop(api_key, None)
+            self._rested_until.pop(api_key, None)
+
+        _retired_keys.inc()
+        logging.warning('Retiring API key {name}: {reason}'.format(
+            name=ApiKeyPool._make_key_name(api_key),
+            reason=reason
+        ))
+
+    def _try_acquire(self):
+        """Return (api_key, 0) if a key may be used right now, or else
+        (None, seconds until one may).
+        """
+        if not self._rate_controllers:
+            raise NoApiKeysError('Every API key has been retired')
+
+        now = self._clock()
+        shortest_wait = None
+        for api_key in sorted(self._rate_controllers, key=self._priority):
+            wait = self._rested_until.get(api_key, now) - now
+            if wait <= 0:
+                wait = self._rate_controllers[api_key].try_reserve()
+            if not wait:
+                self._last_turns[api_key] = next(self._turns)
+                return api_key, 0
+            if shortest_wait is None or wait < shortest_wait:
+                shortest_wait = wait
+
+        return None, shortest_wait
+
+    def _priority(self, api_key):
+        """Sort key that puts the key with the most calls left today first,
+        then the one used least recently.
+        """
+        remaining = self._rate_controllers[api_key].remaining_calls_today
+        if remaining is None:
+            remaining = float('inf')
+        return -remaining, self._last_turns[api_key]
+
+    @staticmethod
+    def _migrate_state(legacy_state_filename, state_filename):
+        """Move the calls saved in 'legacy_state_filename' to
+        'state_filename', unless the latter already exists.
+        """
+        if (not os.path.exists(legacy_state_filename) or
+                os.path.exists(state_filename)):
+            return
+
+        os.replace(legacy_state_filename, state_filename)
+        logging.info('Moved the calls saved in {legacy} to {state}'.format(
+            legacy=legacy_state_filename,
+            state=state_filename
+        ))
+
+    @staticmethod
+    def _make_key_name(api_key):
+        """Return a name for 'api_key' that does not reveal it."""
+        return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
@@ -0,0 +1,280 @@
+"""Benchmarks for the gateways and the weather_history pipeline.
+
+Run from the repository root, for example:
+
+    python -m benchmarks.run_benchmarks --rows 1000000 --output results.json
+
+Synthetic FollowMee exports and dark_sky_data.csv files are generated in a
+scratch directory, and the full pipeline runs against a local stub of the
+Dark Sky API, so no network access or API key is needed. Results are
+written as JSON so that runs on different commits can be compared. A
+timing check that fails, such as plucking Dark Sky responses growing
+much slower than reading their hourly data, makes the run exit with
+status 1.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import weather_history
+from gateways import CsvGateway, DarkSkyGateway, FollowMeeFileGateway
+from .stub_dark_sky_server import StubDarkSkyServer
+from .synthetic_data import (make_dark_sky_response, make_subject_location_summaries,
+                             make_weather_summary, write_dark_sky_data,
+                             write_follow_mee_exports)
+
+# Plucking a response must cost at most this many times the one pass that
+# extracts its hourly columns, so that the statistics stay cheap enough to
+# re-pluck millions of cached responses.
+MAX_PLUCK_OVERHEAD = 3.0
+
+class Benchmarks:
+    """Runs each benchmark and collects its timing."""
+    def __init__(self, work_directory, rows, files, rows_per_file, lookups,
+                 responses, latency, processes):
+        self._work_directory = work_directory
+        self._rows = rows
+        self._files = files
+        self._rows_per_file = rows_per_file
+        self._lookups = lookups
+        self._responses = responses
+        self._latency = latency
+        self._processes = processes
+        self.results = {}
+        self.checks = {}
+
+    def run(self):
+        stored = make_subject_location_summaries(self._rows, seed=1)
+        csv_filename = os.path.join(self._work_directory, 'dark_sky_data.csv')
+
+        self._measure('csv_batch_writer', self._rows,
+                      write_dark_sky_data, csv_filename, stored)
+        self._benchmark_csv_record(stored)
+        self._benchmark_csv_lookups(csv_filename, stored)
+        self._benchmark_follow_mee()
+        self._benchmark_pluck_response()
+        self._benchmark_pipeline()
+
+    def _benchmark_csv_record(self, stored):
+        filename = os.path.join(self._work_directory, 'record.csv')
+        csv_gateway = CsvGateway(filename)
+        generator = random.Random(2)
+        records = [(make_weather_summary(generator), location)
+                   for location in stored[:min(self._rows, 10000)]]
+
+        def record():
+            for weather_summary, location in records:
+                csv_gateway.record_weather_summary(weather_summary, location)
+
+        self._measure('csv_record_weather_summary', len(records), record)
+
+    def _benchmark_csv_lookups(self, csv_filename, stored):
+        generator = random.Random(3)
+        misses = make_subject_location_summaries(self._lookups, seed=4)
+        lookups = [generator.choice(stored) if index % 2 else misses[index]
+                   for index in range(self._lookups)]
+
+        csv_gateway = CsvGateway(csv_filename)
+        self._measure('csv_index_load', self._rows,
+                      csv_gateway.fetch_weather_summary, lookups[0])
+
+        def fetch():
+            for location in lookups:
+                csv_gateway.fetch_weather_summary(location)
+
+        self._measure('csv_fetch_weather_summary', len(lookups), fetch)
+
+        scanning_gateway = CsvGateway(csv_filename, indexed=False)
+        scans = lookups[:10]
+
+        def scan():
+            for location in scans:
+                scanning_gateway.fetch_weather_summary(location)
+
+        self._measure('csv_fetch_weather_summary_scan', len(scans), scan)
+
+        self._measure('csv_fetch_unrecorded_locations', len(lookups),
+                      CsvGateway(csv_filename).fetch_unrecorded_locations,
+                      lookups)
+
+    def _benchmark_follow_mee(self):
+        directory_name = os.path.join(self._work_directory, 'exports')
+        filenames = write_follow_mee_exports(
+            directory_name,
+            make_subject_location_summaries(self._files, seed=5),
+            self._rows_per_file
+        )
+
+        def extract():
+            for filename in filenames:
+                FollowMeeFileGateway.extract_subject_location_summary(filename)
+
+        self._measure('follow_mee_extract_subject_location_summary',
+                      len(filenames), extract)
+
+        self._measure(
+            'follow_mee_extract_subject_location_summaries',
+            len(filenames),
+            lambda: list(FollowMeeFileGateway.extract_subject_location_summaries(
+                filenames,
+                self._processes
+            ))
+        )
+
+    def _benchmark_pluck_response(self):
+        generator = random.Random(6)
+        responses = [make_dark_sky_response(generator)
+                     for _ in range(self._responses)]
+
+        self._measure('dark_sky_extract_hourly_columns', len(responses),
+                      lambda: [DarkSkyGateway._extract_hourly_columns(response)
+                               for response in responses])
+        self._measure('dark_sky_pluck_response', len(responses),
+                      lambda: [DarkSkyGateway._pluck_response(response)
+                               for response in responses])
+        self._check(
+            'dark_sky_pluck_response_overhead',
+            self.results['dark_sky_pluck_response']['seconds'] /
+            self.results['dark_sky_extract_hourly_columns']['seconds'],
+            MAX_PLUCK_OVERHEAD
+        )
+
+    def _benchmark_pipeline(self):
+        directory_name = os.path.join(self._work_directory, 'exports')
+        pipeline_directory = os.path.join(self._work_directory, 'pipeline')
+        os.makedirs(pipeline_directory)
+        base_url = DarkSkyGateway.BASE_URL
+        working_directory = os.getcwd()
+
+        with StubDarkSkyServer(self._latency) as server:
+            DarkSkyGateway.BASE_URL = server.url
+            os.chdir(pipeline_directory)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    self._measure(
+                        'weather_history_pipeline',
+                        self._files,
+                        weather_history.get_weather_history,
+                        'benchmark_api_key',
+                        downloaded_files_path=directory_name,
+                        processes=self._processes,
+                        cache_directory=''
+                    )
+            finally:
+                os.chdir(working_directory)
+                DarkSkyGateway.BASE_URL = base_url
+
+    def _check(self, name, value, limit):
+        """Record whether 'value' is within 'limit'."""
+        passed = value <= limit
+        self.checks[name] = {'value': value, 'limit': limit, 'passed': passed}
+        print('{name}: {value:.2f} (limit {limit}){failed}'.format(
+            name=name,
+            value=value,
+            limit=limit,
+            failed='' if passed else ' FAILED'
+        ), file=sys.stderr)
+
+    def _measure(self, name, operations, function, *args, **kwargs):
+        start = time.perf_counter()
+        function(*args, **kwargs)
+        seconds = time.perf_counter() - start
+
+        self.results[name] = {
+            'seconds': seconds,
+            'operations': operations,
+            'operations_per_second': operations/seconds if seconds else None
+        }
+        print('{name}: {seconds:.3f}s for {operations} operations'.format(
+            name=name,
+            seconds=seconds,
+            operations=operations
+        ), file=sys.stderr)
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000,
+                        help='rows in the synthetic dark_sky_data.csv')
+    parser.add_argument('--files', type=int, default=1000,
+                        help='number of synthetic FollowMee exports')
+    parser.add_argument('--rows-per-file', type=int, default=1000,
+                        help='GPS points in each FollowMee export')
+    parser.add_argument('--lookups', type=int, default=10000,
+                        help='number of CsvGateway lookups to time')
+    parser.add_argument('--responses', type=int, default=10000,
+                        help='number of Dark Sky responses to pluck')
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='seconds the stub Dark Sky API takes to answer')
+    parser.add_argument('--processes', type=int,
+                        help='processes for parsing exports; one per CPU if unset')
+    parser.add_argument('--work-directory',
+                        help='scratch directory; a temporary one if unset')
+    parser.add_argument('--output', default='benchmark_results.json',
+                        help='file to write the JSON results to')
+    args = parser.parse_args()
+
+    work_directory = args.work_directory or tempfile.mkdtemp(
+        prefix='moves_research_benchmarks_'
+    )
+    os.makedirs(work_directory, exist_ok=True)
+
+    benchmarks = Benchmarks(
+        work_directory,
+        args.rows,
+        args.files,
+        args.rows_per_file,
+        args.lookups,
+        args.responses,
+        args.latency,
+        args.processes
+    )
+    try:
+        benchmarks.run()
+    finally:
+        if not args.work_directory:
+            shutil.rmtree(work_directory)
+
+    with open(args.output, 'w') as output_file:
+        json.dump({
+            'commit': get_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'parameters': {
+                'rows': args.rows,
+                'files': args.files,
+                'rows_per_file': args.rows_per_file,
+                'lookups': args.lookups,
+                'responses': args.responses,
+                'latency': args.latency,
+                'processes': args.processes
+            },
+            'results': benchmarks.results,
+            'checks': benchmarks.checks
+        }, output_file, indent=2)
+
+    if not all(check['passed'] for check in benchmarks.checks.values()):
+        sys.exit(1)
@@ -0,0 +1,44 @@
+"""Module for stub_dark_sky_server."""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .synthetic_data import make_dark_sky_response
+
+class StubDarkSkyServer:
+    """Local HTTP server that answers every request with a synthetic Dark Sky
+    response after 'latency' seconds. Use it as a context manager; 'url' is
+    the value to give DarkSkyGateway.BASE_URL.
+    """
+    def __init__(self, latency=0.0):
+        body = json.dumps(make_dark_sky_response(random.Random(0))).encode()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                time.sleep(latency)
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self.url = 'http://127.0.0.1:{port}/forecast'.format(
+            port=self._server.server_port
+        )
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._server.shutdown()
+        self._server.server_close()
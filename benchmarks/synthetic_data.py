@@ -0,0 +1,101 @@
+"""Module for synthetic_data."""
+
+import csv
+import os
+import random
+from datetime import date, timedelta
+from definitions import SubjectLocationSummary, WeatherSummary
+from gateways import CsvGateway
+
+FIRST_DATE = date(2018, 1, 1)
+
+def make_subject_location_summaries(count, seed=0):
+    """Return 'count' distinct, reproducible SubjectLocationSummary."""
+    generator = random.Random(seed)
+    return [
+        SubjectLocationSummary(
+            '{:08d}'.format(index),
+            round(generator.uniform(-124.0, -67.0), 6),
+            round(generator.uniform(25.0, 49.0), 6),
+            FIRST_DATE + timedelta(days=generator.randrange(365))
+        ) for index in range(count)
+    ]
+
+def make_weather_summary(generator):
+    mean_temp = generator.uniform(0.0, 100.0)
+    return WeatherSummary(
+        mean_temp,
+        mean_temp + generator.uniform(0.0, 15.0),
+        mean_temp - generator.uniform(0.0, 15.0),
+        generator.uniform(0.0, 0.5),
+        mean_temp + generator.uniform(-5.0, 5.0),
+        mean_temp + generator.uniform(0.0, 20.0),
+        mean_temp - generator.uniform(0.0, 20.0)
+    )
+
+def write_dark_sky_data(filename, subject_location_summaries, seed=0):
+    """Write a dark_sky_data.csv holding a weather summary for each of
+    'subject_location_summaries'.
+    """
+    generator = random.Random(seed)
+    if os.path.exists(filename):
+        os.remove(filename)
+
+    with CsvGateway(filename).batch_writer(max_rows=100000) as csvWriter:
+        for subject_location_summary in subject_location_summaries:
+            csvWriter.record_weather_summary(
+                make_weather_summary(generator),
+                subject_location_summary
+            )
+
+def write_follow_mee_exports(directory_name, subject_location_summaries,
+                             rows_per_file):
+    """Write a FollowMee export to 'directory_name' for each of
+    'subject_location_summaries', with 'rows_per_file' points each, and
+    return their paths.
+    """
+    os.makedirs(directory_name, exist_ok=True)
+    filenames = []
+
+    for summary in subject_location_summaries:
+        filename = os.path.join(
+            directory_name,
+            '{subject_id}_{date}_json.csv'.format(
+                subject_id=summary.subject_id,
+                date=summary.date.isoformat()
+            )
+        )
+        with open(filename, 'w') as follow_mee_file:
+            writer = csv.writer(follow_mee_file)
+            writer.writerow(['Data.Date', 'Data.Latitude', 'Data.Longitude',
+                             'Data.Accuracy'])
+            for row in range(rows_per_file):
+                writer.writerow([
+                    '{date}T{hour:02d}:{minute:02d}:00-04:00'.format(
+                        date=summary.date.isoformat(),
+                        hour=row*24//rows_per_file,
+                        minute=row % 60
+                    ),
+                    summary.latitude + row*1e-5,
+                    summary.longitude + row*1e-5,
+                    10
+                ])
+        filenames.append(filename)
+
+    return filenames
+
+def make_dark_sky_response(generator, hours=24):
+    """Return a decoded Dark Sky response with 'hours' hours of data."""
+    return {
+        'daily': {'data': [{
+            'temperatureHigh': generator.uniform(60.0, 100.0),
+            'temperatureLow': generator.uniform(20.0, 60.0),
+            'apparentTemperatureHigh': generator.uniform(60.0, 100.0),
+            'apparentTemperatureLow': generator.uniform(20.0, 60.0)
+        }]},
+        'hourly': {'data': [{
+            'temperature': generator.uniform(20.0, 100.0),
+            'apparentTemperature': generator.uniform(20.0, 100.0),
+            'precipIntensity': generator.uniform(0.0, 0.1)
+        } for _ in range(hours)]}
+    }
@@ -0,0 +1,93 @@
+import argparse
+import glob
+import os
+from collections import Counter
+
+from gateways import CsvCompactor, ManifestGateway
+from gateways.csv_compactor import DEFAULT_MAX_MEMORY_BYTES
+
+def compact_weather_history(csv_filename='dark_sky_data.csv',
+                            max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES,
+                            temporary_directory=None, shard_directory=None,
+                            manifest_filename=None):
+    """Remove duplicate rows and rows without weather from 'csv_filename',
+    or from every shard in 'shard_directory', moving invalid rows to a
+    '.quarantine' file next to each, using no more than about
+    'max_memory_bytes' of memory for rows at a time. Must not be run while
+    weather is being recorded.
+
+    If any locations are removed, the manifest at 'manifest_filename', the
+    one 'weather_history' uses by default, is removed too: it lists them as
+    fetched, and the next run seeds a new one from the compacted weather so
+    that they are fetched again.
+    """
+    if shard_directory:
+        filenames = sorted(glob.glob(os.path.join(shard_directory,
+                                                  'shard-*.csv')))
+    else:
+        filenames = [csv_filename]
+
+    totals = Counter()
+    for filename in filenames:
+        totals.update(CsvCompactor(
+            filename,
+            max_memory_bytes,
+            temporary_directory
+        ).compact())
+
+    print(('Read {} rows; kept {}, dropped {} duplicates and {} locations '
+           'without weather and quarantined {} invalid rows').format(
+               totals['rows'],
+               totals['kept'],
+               totals['duplicates'],
+               totals['empty'],
+               totals['invalid']
+           ))
+
+    if totals['empty'] or totals['invalid']:
+        if manifest_filename is None:
+            manifest_filename = ManifestGateway.default_filename(
+                csv_filename,
+                shard_directory
+            )
+        try:
+            os.remove(manifest_filename)
+        except FileNotFoundError:
+            pass
+        else:
+            print('Removed {} so that the next run fetches those again'.format(
+                manifest_filename
+            ))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--csv-filename', default='dark_sky_data.csv')
+    parser.add_argument(
+        '--shard-directory',
+        help='compact every shard in this directory instead of --csv-filename'
+    )
+    parser.add_argument(
+        '--max-memory-bytes',
+        type=int,
+        default=DEFAULT_MAX_MEMORY_BYTES,
+        help='rows to sort in memory at a time, in bytes'
+    )
+    parser.add_argument(
+        '--temporary-directory',
+        help=('directory for the sorted runs; defaults to the directory of '
+              'the file being compacted')
+    )
+    parser.add_argument(
+        '--manifest-filename',
+        help=('manifest to remove if locations are dropped or quarantined; '
+              'defaults to the one weather_history.py uses')
+    )
+    args = parser.parse_args()
+
+    compact_weather_history(
+        args.csv_filename,
+        args.max_memory_bytes,
+        args.temporary_directory,
+        args.shard_directory,
+        args.manifest_filename
+    )
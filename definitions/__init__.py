@@ -1,3 +1,7 @@
 from .subject_location_summary import SubjectLocationSummary
 from .spacetime_point import SpacetimePoint
 from .weather_summary import WeatherSummary
+from .approximate_weather_summary import ApproximateWeatherSummary
+from .subject_location_summary_array import SubjectLocationSummaryArray
+from .weather_summary_array import WeatherSummaryArray
+from .weather_summary_index import WeatherSummaryIndex
@@ -0,0 +1,27 @@
+"""Module for approximate_weather_summary."""
+
+from dataclasses import dataclass
+from .weather_summary import WeatherSummary
+
+@dataclass(slots=True)
+class ApproximateWeatherSummary(WeatherSummary):
+    """Class that represents a summary of the weather taken from a nearby
+    location on the same date, 'distance_km' kilometres away.
+    """
+    distance_km: float = None
+
+    @classmethod
+    def from_weather_summary(cls, weather_summary, distance_km):
+        return cls(
+            weather_summary.mean_temp,
+            weather_summary.max_temp,
+            weather_summary.min_temp,
+            weather_summary.precipitation,
+            weather_summary.apparent_mean_temp,
+            weather_summary.apparent_max_temp,
+            weather_summary.apparent_min_temp,
+            weather_summary.median_temp,
+            weather_summary.stddev_temp,
+            weather_summary.hours_above_threshold,
+            distance_km
+        )
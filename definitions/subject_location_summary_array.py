@@ -0,0 +1,148 @@
+"""Module for subject_location_summary_array."""
+
+from array import array
+from collections.abc import Sequence
+from datetime import date
+from .subject_location_summary import SubjectLocationSummary
+
+class SubjectLocationSummaryArray(Sequence):
+    """Class that compactly stores a sequence of SubjectLocationSummary.
+
+    Fields are kept in parallel arrays: longitudes and latitudes as float64,
+    dates as int32 ordinals, and subjects as int32 indexes into a table of
+    distinct subject IDs. Items are rebuilt on access and compare equal to
+    the summaries that were stored.
+
+    The position of the first of each distinct summary is kept in an
+    open-addressing hash table, itself an array, so 'find' and 'in' take
+    constant time without a Python object per summary.
+    """
+    __slots__ = (
+        '_subject_ids',
+        '_subject_indexes',
+        '_subject_indexes_by_id',
+        '_longitudes',
+        '_latitudes',
+        '_dates',
+        '_table',
+        '_distinct_count'
+    )
+
+    def __init__(self, subject_location_summaries=()):
+        self._subject_ids = []
+        self._subject_indexes = array('i')
+        self._subject_indexes_by_id = {}
+        self._longitudes = array('d')
+        self._latitudes = array('d')
+        self._dates = array('i')
+        self._table = array('q', [-1])*8
+        self._distinct_count = 0
+        self.extend(subject_location_summaries)
+
+    def append(self, subject_location_summary):
+        subject_id = subject_location_summary.subject_id
+        subject_index = self._subject_indexes_by_id.get(subject_id)
+        if subject_index is None:
+            subject_index = len(self._subject_ids)
+            self._subject_indexes_by_id[subject_id] = subject_index
+            self._subject_ids.append(subject_id)
+
+        fields = (
+            subject_index,
+            float(subject_location_summary.longitude),
+            float(subject_location_summary.latitude),
+            subject_location_summary.date.toordinal()
+        )
+        position, slot = self._probe(fields)
+
+        self._subject_indexes.append(fields[0])
+        self._longitudes.append(fields[1])
+        self._latitudes.append(fields[2])
+        self._dates.append(fields[3])
+
+        if position is None:
+            self._table[slot] = len(self) - 1
+            self._distinct_count += 1
+            if 2*self._distinct_count > len(self._table):
+                self._grow_table()
+
+    def extend(self, subject_location_summaries):
+        for subject_location_summary in subject_location_summaries:
+            self.append(subject_location_summary)
+
+    def find(self, subject_location_summary):
+        """Return the position of the first summary equal to
+        'subject_location_summary', or None if there is none.
+        """
+        subject_index = self._subject_indexes_by_id.get(
+            subject_location_summary.subject_id
+        )
+        if subject_index is None:
+            return None
+
+        return self._probe((
+            subject_index,
+            float(subject_location_summary.longitude),
+            float(subject_location_summary.latitude),
+            subject_location_summary.date.toordinal()
+        ))[0]
+
+    def __contains__(self, subject_location_summary):
+        return self.find(subject_location_summary) is not None
+
+    def __len__(self):
+        return len(self._dates)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return SubjectLocationSummaryArray(
+                self[i] for i in range(*index.indices(len(self)))
+            )
+
+        return SubjectLocationSummary(
+            self._subject_ids[self._subject_indexes[index]],
+            self._longitudes[index],
+            self._latitudes[index],
+            date.fromordinal(self._dates[index])
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            mine == theirs for mine, theirs in zip(self, other)
+        )
+
+    __hash__ = None
+
+    def _probe(self, fields):
+        """Return (position, slot): the position of the stored summary with
+        'fields' and its slot in the table, or None and the empty slot where
+        it belongs.
+        """
+        subject_index, longitude, latitude, ordinal = fields
+        mask = len(self._table) - 1
+        slot = hash(fields) & mask
+
+        while True:
+            position = self._table[slot]
+            if position < 0:
+                return None, slot
+            if (self._longitudes[position] == longitude and
+                    self._latitudes[position] == latitude and
+                    self._dates[position] == ordinal and
+                    self._subject_indexes[position] == subject_index):
+                return position, slot
+            slot = (slot + 1) & mask
+
+    def _grow_table(self):
+        positions = [position for position in self._table if position >= 0]
+        self._table = array('q', [-1])*(2*len(self._table))
+        for position in positions:
+            _, slot = self._probe((
+                self._subject_indexes[position],
+                self._longitudes[position],
+                self._latitudes[position],
+                self._dates[position]
+            ))
+            self._table[slot] = position
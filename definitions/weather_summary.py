@@ -2,7 +2,7 @@
 
 from dataclasses import dataclass
 
-@dataclass
+@dataclass(slots=True)
 class WeatherSummary:
     """Class that represents a summary of the weather."""
     mean_temp: float
@@ -12,3 +12,6 @@ class WeatherSummary:
     apparent_mean_temp: float = None
     apparent_max_temp: float = None
     apparent_min_temp: float = None
+    median_temp: float = None
+    stddev_temp: float = None
+    hours_above_threshold: int = None
@@ -0,0 +1,79 @@
+"""Module for weather_summary_array."""
+
+import math
+from array import array
+from collections.abc import Sequence
+from .approximate_weather_summary import ApproximateWeatherSummary
+from .weather_summary import WeatherSummary
+
+FIELDNAMES = (
+    'mean_temp',
+    'max_temp',
+    'min_temp',
+    'precipitation',
+    'apparent_mean_temp',
+    'apparent_max_temp',
+    'apparent_min_temp',
+    'median_temp',
+    'stddev_temp',
+    'hours_above_threshold'
+)
+
+class WeatherSummaryArray(Sequence):
+    """Class that compactly stores a sequence of WeatherSummary.
+
+    Each field is kept in its own float64 array, with None stored as NaN,
+    along with the distance of an ApproximateWeatherSummary. Items are
+    rebuilt on access and compare equal to the summaries that were stored,
+    except that a field that was NaN comes back as None.
+    """
+    __slots__ = ('_columns', '_distances')
+
+    def __init__(self, weather_summaries=()):
+        self._columns = {fieldname: array('d') for fieldname in FIELDNAMES}
+        self._distances = array('d')
+        self.extend(weather_summaries)
+
+    def append(self, weather_summary):
+        for fieldname, column in self._columns.items():
+            value = getattr(weather_summary, fieldname)
+            column.append(math.nan if value is None else value)
+
+        distance_km = getattr(weather_summary, 'distance_km', None)
+        self._distances.append(math.nan if distance_km is None else distance_km)
+
+    def extend(self, weather_summaries):
+        for weather_summary in weather_summaries:
+            self.append(weather_summary)
+
+    def __len__(self):
+        return len(self._distances)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return WeatherSummaryArray(
+                self[i] for i in range(*index.indices(len(self)))
+            )
+
+        values = []
+        for fieldname, column in self._columns.items():
+            value = column[index]
+            if math.isnan(value):
+                value = None
+            elif fieldname == 'hours_above_threshold':
+                value = int(value)
+            values.append(value)
+
+        distance_km = self._distances[index]
+        if math.isnan(distance_km):
+            return WeatherSummary(*values)
+        return ApproximateWeatherSummary(*values, distance_km=distance_km)
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return len(self) == len(other) and all(
+            mine == theirs for mine, theirs in zip(self, other)
+        )
+
+    __hash__ = None
@@ -0,0 +1,42 @@
+"""Module for weather_summary_index."""
+
+from .subject_location_summary_array import SubjectLocationSummaryArray
+from .weather_summary_array import WeatherSummaryArray
+
+class WeatherSummaryIndex:
+    """Class that compactly maps each SubjectLocationSummary to a
+    WeatherSummary, like a dict but with both kept in struct-of-arrays
+    containers. Only the first summary set for a location is kept.
+    """
+    __slots__ = ('_locations', '_weather_summaries')
+
+    def __init__(self):
+        self._locations = SubjectLocationSummaryArray()
+        self._weather_summaries = WeatherSummaryArray()
+
+    def get(self, subject_location_summary, default=None):
+        position = self._locations.find(subject_location_summary)
+        if position is None:
+            return default
+        return self._weather_summaries[position]
+
+    def setdefault(self, subject_location_summary, weather_summary):
+        """Associate 'weather_summary' with 'subject_location_summary' unless
+        it already has one, and return the one it has.
+        """
+        position = self._locations.find(subject_location_summary)
+        if position is not None:
+            return self._weather_summaries[position]
+
+        self._locations.append(subject_location_summary)
+        self._weather_summaries.append(weather_summary)
+        return weather_summary
+
+    def items(self):
+        return zip(self._locations, self._weather_summaries)
+
+    def __contains__(self, subject_location_summary):
+        return subject_location_summary in self._locations
+
+    def __len__(self):
+        return len(self._locations)
@@ -1,6 +1,16 @@
+from .coalescing_weather_gateway import CoalescingWeatherGateway
+from .concurrent_weather_gateway import ConcurrentWeatherGateway
+from .csv_compactor import CsvCompactor
 from .csv_gateway import CsvGateway
 from .dark_sky_gateway import DarkSkyGateway
+from .directory_watcher import DirectoryWatcher
 from .file_gateway import FileGateway
 from .follow_mee_file_gateway import FollowMeeFileGateway
+from .manifest_gateway import ManifestGateway
+from .nearby_weather_gateway import NearbyWeatherGateway
+from .parquet_gateway import ParquetGateway
+from .response_cache import ResponseCache
+from .sharded_csv_gateway import ShardedCsvGateway
+from .sqlite_gateway import SqliteGateway
 from .weather_gateway import WeatherGateway
 
@@ -0,0 +1,23 @@
+"""Module for append_only_file."""
+
+import os
+
+def truncate_partial_line(filename):
+    """Cut off anything after the last newline in 'filename', such as a line
+    left half-written by a crash.
+    """
+    with open(filename, 'rb+') as append_only_file:
+        end = append_only_file.seek(0, os.SEEK_END)
+        position = end
+
+        while position > 0:
+            step = min(4096, position)
+            append_only_file.seek(position - step)
+            newline = append_only_file.read(step).rfind(b'\n')
+            if newline != -1:
+                position = position - step + newline + 1
+                break
+            position -= step
+
+        if position != end:
+            append_only_file.truncate(position)
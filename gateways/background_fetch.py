@@ -0,0 +1,87 @@
+"""Module for background_fetch."""
+
+import queue
+import threading
+
+POLL_SECONDS = 0.1
+
+_DONE = object()
+
+class BackgroundFetch:
+    """Runs 'fetch_weather_summaries', a callable such as
+    ConcurrentWeatherGateway.fetch_weather_summaries, on a thread of its
+    own, so that a gateway wrapping it can hand it locations one at a time
+    and go on answering other locations while they are fetched.
+
+    'request' never blocks, so the caller should collect 'completed' after
+    each request; it waits while more than 'max_queued' locations have not
+    yet been taken by the fetcher, so the caller never runs further ahead
+    of it than that. 'fetch_weather_summaries' must yield every weather
+    summary it has before it takes another location.
+    """
+    def __init__(self, fetch_weather_summaries, max_queued=1):
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._max_queued = max_queued
+        self._outstanding = 0
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(fetch_weather_summaries,),
+            daemon=True
+        )
+        self._thread.start()
+
+    def request(self, subject_location_summary):
+        """Queue 'subject_location_summary' to be fetched."""
+        self._requests.put(subject_location_summary)
+        self._outstanding += 1
+
+    def completed(self, wait=False):
+        """Yield the (subject_location_summary, weather_summary) pairs that
+        have been fetched so far. With 'wait', or while too many locations
+        are queued, wait for at least one first.
+        """
+        while self._outstanding:
+            block = wait or self._requests.qsize() >= self._max_queued
+            try:
+                if block:
+                    result = self._results.get(timeout=POLL_SECONDS)
+                else:
+                    result = self._results.get_nowait()
+            except queue.Empty:
+                if block:
+                    continue
+                return
+            wait = False
+            yield from self._unwrap(result)
+
+    def finish(self):
+        """Yield the pairs for every location still being fetched."""
+        self._requests.put(_DONE)
+        while self._outstanding:
+            yield from self._unwrap(self._results.get())
+
+    def close(self):
+        """Let the fetcher end once the locations it has taken are fetched."""
+        self._requests.put(_DONE)
+
+    def _run(self, fetch_weather_summaries):
+        try:
+            for pair in fetch_weather_summaries(
+                    iter(self._requests.get, _DONE)):
+                self._results.put((pair, None))
+        except BaseException as error:
+            self._results.put((None, error))
+        finally:
+            self._results.put((None, None))
+
+    def _unwrap(self, result):
+        pair, error = result
+        if error is not None:
+            self._outstanding = 0
+            raise error
+        if pair is None:
+            self._outstanding = 0
+            return
+        self._outstanding -= 1
+        yield pair
@@ -0,0 +1,98 @@
+"""Module for coalescing_weather_gateway."""
+
+from collections import OrderedDict
+from definitions import SubjectLocationSummary
+from .background_fetch import BackgroundFetch
+
+class CoalescingWeatherGateway:
+    """Gateway that fetches the weather only once per grid cell and day.
+
+    Locations are snapped to a grid of 'cell_size' degrees, and every location
+    that falls in the same cell on the same date is given the weather fetched
+    for the centre of that cell. 'fetch_weather_summaries' is a callable such
+    as ConcurrentWeatherGateway.fetch_weather_summaries: it takes an iterable
+    of SubjectLocationSummary and yields (subject_location_summary,
+    weather_summary) pairs.
+
+    The weather of at most 'max_cells' cells is remembered, dropping the
+    least recently used, so a long-running gateway does not grow without
+    bound.
+    """
+    def __init__(self, fetch_weather_summaries, cell_size=0.01,
+                 max_cells=100000, max_waiting=1000):
+        self._fetch_weather_summaries = fetch_weather_summaries
+        self._cell_size = cell_size
+        self._max_cells = max_cells
+        self._max_waiting = max_waiting
+        self._weather_summaries = OrderedDict()
+
+    def fetch_weather_summaries(self, subject_location_summaries):
+        """Yield a (subject_location_summary, weather_summary) pair for each of
+        'subject_location_summaries', fetching the weather for each cell and
+        day only the first time it is seen, or after it has been forgotten.
+
+        Locations in a cell whose weather is known are yielded as soon as
+        they are read, while the weather for new cells is fetched on a thread
+        of its own. Once 'max_waiting' locations are waiting on cells being
+        fetched, no more are read until one of those cells arrives.
+        """
+        waiting = {}
+        waiting_count = 0
+        fetch = BackgroundFetch(self._fetch_weather_summaries)
+
+        def answer_waiting(pairs):
+            nonlocal waiting_count
+            for cell, weather_summary in pairs:
+                self._weather_summaries[cell] = weather_summary
+                if len(self._weather_summaries) > self._max_cells:
+                    self._weather_summaries.popitem(last=False)
+
+                locations = waiting.pop(cell)
+                waiting_count -= len(locations)
+                for location in locations:
+                    yield location, weather_summary
+
+        try:
+            for location in subject_location_summaries:
+                cell = self._make_cell(location)
+                if cell in self._weather_summaries:
+                    self._weather_summaries.move_to_end(cell)
+                    yield location, self._weather_summaries[cell]
+                elif cell in waiting:
+                    waiting[cell].append(location)
+                    waiting_count += 1
+                else:
+                    waiting[cell] = [location]
+                    waiting_count += 1
+                    fetch.request(cell)
+
+                yield from answer_waiting(fetch.completed(
+                    wait=waiting_count >= self._max_waiting
+                ))
+
+            yield from answer_waiting(fetch.finish())
+        finally:
+            fetch.close()
+
+    def _make_cell(self, subject_location_summary):
+        return CoalescingWeatherGateway.make_cell(subject_location_summary,
+                                                  self._cell_size)
+
+    @staticmethod
+    def make_cell(subject_location_summary, cell_size):
+        """Return the centre of the cell of 'cell_size' degrees containing
+        'subject_location_summary' as a SubjectLocationSummary without a
+        subject. This is the location whose weather is fetched for the cell.
+        """
+        return SubjectLocationSummary(
+            None,
+            CoalescingWeatherGateway._snap(subject_location_summary.longitude,
+                                           cell_size),
+            CoalescingWeatherGateway._snap(subject_location_summary.latitude,
+                                           cell_size),
+            subject_location_summary.date
+        )
+
+    @staticmethod
+    def _snap(coordinate, cell_size):
+        return round(round(coordinate/cell_size)*cell_size, 10)
@@ -0,0 +1,49 @@
+"""Module for concurrent_weather_gateway."""
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
+class ConcurrentWeatherGateway:
+    """Gateway for fetching many weather summaries at once.
+
+    'fetch_weather_summary' is any callable that takes a
+    SubjectLocationSummary and returns its WeatherSummary, such as
+    DarkSkyGateway.fetch_weather_summary with the API key bound. Rate
+    limiting belongs to that callable, such as through
+    DarkSkyGateway.fetch_weather_summary's 'rate_controller', so that
+    locations answered from a cache do not spend any budget.
+    """
+    def __init__(self, fetch_weather_summary, max_in_flight=8):
+        self._fetch_weather_summary = fetch_weather_summary
+        self._max_in_flight = max_in_flight
+
+    def fetch_weather_summaries(self, subject_location_summaries):
+        """Fetch the weather at each of 'subject_location_summaries', keeping
+        at most 'max_in_flight' requests running at a time. Yield
+        (subject_location_summary, weather_summary) pairs in the order the
+        requests complete.
+
+        Locations are only taken from 'subject_location_summaries' once the
+        weather of earlier ones has been yielded, so it may be an arbitrarily
+        long stream.
+        """
+        locations = iter(subject_location_summaries)
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=self._max_in_flight) as executor:
+            def submit(location):
+                future = executor.submit(self._fetch_weather_summary,
+                                         location)
+                in_flight[future] = location
+
+            for location in islice(locations, self._max_in_flight):
+                submit(location)
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    yield in_flight.pop(future), future.result()
+
+                for location in islice(locations, len(done)):
+                    submit(location)
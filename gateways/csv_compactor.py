@@ -0,0 +1,224 @@
+"""Module for csv_compactor."""
+
+import csv
+import heapq
+import os
+import shutil
+import tempfile
+from datetime import date
+from itertools import groupby
+
+KEY_FIELDNAMES = ('subject_id', 'longitude', 'latitude', 'date')
+DEFAULT_MAX_MEMORY_BYTES = 256*2**20
+MAX_RUNS_PER_MERGE = 64
+
+class CsvCompactor:
+    """Compacts a CsvGateway file, keeping one row per SubjectLocationSummary.
+
+    Of the rows recorded for a location, the one with the most weather
+    values is kept, preferring exact weather to approximate weather and,
+    among equals, the first recorded, which is the one CsvGateway reads.
+    Locations with no weather values at all are dropped. Rows that cannot be
+    read, such as those with the wrong number of fields or a malformed date,
+    are moved to 'filename' + '.quarantine', after its header if it is new,
+    once the compacted file is in place.
+
+    The file is sorted with an external merge sort: sorted runs of at most
+    about 'max_memory_bytes' of rows are written to a temporary directory
+    (in 'temporary_directory', or next to the file) and then merged, so
+    files much larger than memory can be compacted. Rows keep their text
+    exactly, and the compacted file, sorted by location, replaces the
+    original atomically.
+    """
+    def __init__(self, filename, max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES,
+                 temporary_directory=None):
+        self._filename = filename
+        self._max_memory_bytes = max_memory_bytes
+        self._temporary_directory = temporary_directory or os.path.dirname(
+            os.path.abspath(filename)
+        )
+        self._fieldnames = None
+        self._key_indexes = None
+        self.stats = {}
+
+    def compact(self):
+        """Compact the file, returning counts of the rows read, kept,
+        duplicated, dropped without weather and quarantined as invalid. Raise
+        RuntimeError, leaving the file as it was, if it changes while being
+        compacted.
+        """
+        signature = self._signature()
+        self.stats = {'rows': 0, 'kept': 0, 'duplicates': 0, 'empty': 0,
+                      'invalid': 0}
+        run_directory = tempfile.mkdtemp(prefix='compact-',
+                                         dir=self._temporary_directory)
+        compacted_filename = self._filename + '.compact'
+
+        try:
+            with open(self._filename, 'r', newline='') as csvfile:
+                reader = csv.reader(csvfile)
+                fieldnames = next(reader, None)
+                if fieldnames is None:
+                    return self.stats
+                self._fieldnames = fieldnames
+                self._key_indexes = [fieldnames.index(fieldname)
+                                     for fieldname in KEY_FIELDNAMES]
+                invalid_filename = os.path.join(run_directory, 'invalid.csv')
+                with open(invalid_filename, 'w', newline='') as invalid_file:
+                    runs = self._write_runs(reader, run_directory,
+                                            csv.writer(invalid_file))
+
+            runs = self._merge_runs_down(runs, run_directory)
+
+            with open(compacted_filename, 'w', newline='') as compacted_file:
+                writer = csv.writer(compacted_file)
+                writer.writerow(fieldnames)
+                for _, rows in groupby(self._merge(runs), key=self._key):
+                    self._write_best_row(writer, list(rows))
+                compacted_file.flush()
+                os.fsync(compacted_file.fileno())
+
+            if self._signature() != signature:
+                raise RuntimeError(
+                    '{} changed while it was being compacted'.format(
+                        self._filename
+                    )
+                )
+            os.replace(compacted_filename, self._filename)
+            if self.stats['invalid']:
+                self._quarantine(invalid_filename)
+        finally:
+            shutil.rmtree(run_directory)
+            if os.path.exists(compacted_filename):
+                os.remove(compacted_filename)
+
+        return self.stats
+
+    def _write_runs(self, reader, run_directory, invalid_writer):
+        """Write the rows from 'reader' into sorted run files of at most
+        about 'max_memory_bytes', returning their names in file order.
+        Invalid rows are written to 'invalid_writer' instead.
+        """
+        runs = []
+        rows = []
+        size = 0
+
+        for row in reader:
+            self.stats['rows'] += 1
+            if not self._is_valid(row):
+                self.stats['invalid'] += 1
+                invalid_writer.writerow(row)
+                continue
+
+            rows.append(row)
+            size += CsvCompactor._estimate_size(row)
+            if size >= self._max_memory_bytes:
+                runs.append(self._write_run(rows, run_directory))
+                rows = []
+                size = 0
+
+        if rows:
+            runs.append(self._write_run(rows, run_directory))
+
+        return runs
+
+    def _write_run(self, rows, run_directory):
+        rows.sort(key=self._key)
+        return self._write_run_file(rows, run_directory)
+
+    def _merge_runs_down(self, runs, run_directory):
+        """Merge consecutive runs until few enough are left to merge at
+        once without running out of file handles.
+        """
+        while len(runs) > MAX_RUNS_PER_MERGE:
+            runs = [
+                self._write_run_file(
+                    self._merge(runs[start:start + MAX_RUNS_PER_MERGE]),
+                    run_directory
+                ) for start in range(0, len(runs), MAX_RUNS_PER_MERGE)
+            ]
+        return runs
+
+    def _write_run_file(self, rows, run_directory):
+        descriptor, run_filename = tempfile.mkstemp(suffix='.csv',
+                                                    dir=run_directory)
+        with open(descriptor, 'w', newline='') as run_file:
+            csv.writer(run_file).writerows(rows)
+        return run_filename
+
+    def _merge(self, runs):
+        """Yield the rows of the sorted 'runs' in order. Rows with equal keys
+        come out in the order of the runs, which keeps them in file order.
+        """
+        return heapq.merge(
+            *(CsvCompactor._read_run(run) for run in runs),
+            key=self._key
+        )
+
+    def _write_best_row(self, writer, rows):
+        if len(rows) > 1:
+            self.stats['duplicates'] += len(rows) - 1
+
+        best_row = max(rows, key=self._score)
+        if not self._score(best_row)[0]:
+            self.stats['empty'] += 1
+            return
+
+        writer.writerow(best_row)
+        self.stats['kept'] += 1
+
+    def _key(self, row):
+        """Return the SubjectLocationSummary of 'row' as CsvGateway reads it,
+        as a sortable tuple.
+        """
+        subject_id, longitude, latitude, row_date = (
+            row[index] for index in self._key_indexes
+        )
+        return subject_id, float(longitude), float(latitude), row_date
+
+    def _score(self, row):
+        """Return (number of weather values, whether exact) for 'row'."""
+        values = 0
+        exact = True
+        for fieldname, value in zip(self._fieldnames, row):
+            if fieldname in KEY_FIELDNAMES or not value:
+                continue
+            if fieldname == 'source_distance_km':
+                exact = False
+            else:
+                values += 1
+        return values, exact
+
+    def _is_valid(self, row):
+        if len(row) != len(self._fieldnames):
+            return False
+        try:
+            date.fromisoformat(self._key(row)[3])
+        except ValueError:
+            return False
+        return True
+
+    def _quarantine(self, invalid_filename):
+        """Append the rows in 'invalid_filename' to the quarantine file."""
+        quarantine_filename = self._filename + '.quarantine'
+        with open(quarantine_filename, 'a', newline='') as quarantine_file:
+            if not quarantine_file.tell():
+                csv.writer(quarantine_file).writerow(self._fieldnames)
+            with open(invalid_filename, 'r', newline='') as invalid_file:
+                shutil.copyfileobj(invalid_file, quarantine_file)
+            quarantine_file.flush()
+            os.fsync(quarantine_file.fileno())
+
+    def _signature(self):
+        stat = os.stat(self._filename)
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def _read_run(run_filename):
+        with open(run_filename, 'r', newline='') as run_file:
+            yield from csv.reader(run_file)
+
+    @staticmethod
+    def _estimate_size(row):
+        """Estimate the bytes of memory that 'row' takes up while sorted."""
+        return sum(len(value) for value in row) + 64*(len(row) + 4)
@@ -1,14 +1,51 @@
 """Module for csv_gateway."""
 
 import csv
+import io
+import os
+import time
 from datetime import date
-from definitions import SubjectLocationSummary, WeatherSummary
+import metrics
+from definitions import (ApproximateWeatherSummary, SubjectLocationSummary,
+                         WeatherSummary, WeatherSummaryIndex)
+from .append_only_file import truncate_partial_line
+from .spatial_index import SpatialIndex, haversine_km
+
+_lookup_seconds = metrics.histogram(
+    'csv_lookup_seconds',
+    'Seconds taken to look up one weather summary in a CSV file.'
+)
+_index_load_seconds = metrics.histogram(
+    'csv_index_load_seconds',
+    'Seconds taken to load the index of a CSV file.'
+)
+_append_seconds = metrics.histogram(
+    'csv_append_seconds',
+    'Seconds taken to append one row, or one batch of rows, to a CSV file.'
+)
+_rows_appended = metrics.counter(
+    'csv_rows_appended_total',
+    'Rows appended to CSV files.'
+)
 
 class CsvGateway:
-    def __init__(self, filename):
+    def __init__(self, filename, indexed=True):
         """'filename' is the name of file containing all of the persisted data.
+
+        When 'indexed' is true, lookups are answered from an in-memory index
+        that is loaded on first use, kept up to date as summaries are
+        recorded, and reloaded whenever the file is changed by anyone else.
+        Otherwise every lookup scans the file.
+
+        A file written before a column was added is rewritten once, with the
+        missing columns added to the end of its header and left empty in the
+        rows already there, so that nothing recorded later is lost.
         """
         self._filename = filename
+        self._indexed = indexed
+        self._index = None
+        self._index_signature = None
+        self._spatial_index = None
         self.fieldnames = [
             'subject_id',
             'longitude',
@@ -20,7 +57,11 @@ class CsvGateway:
             'apparent_mean_temp',
             'apparent_max_temp',
             'apparent_min_temp',
-            'precipitation'
+            'precipitation',
+            'median_temp',
+            'stddev_temp',
+            'hours_above_threshold',
+            'source_distance_km'
         ]
 
         try:
@@ -28,24 +69,56 @@ class CsvGateway:
                 writer = csv.DictWriter(csvfile, self.fieldnames)
                 writer.writeheader()
         except FileExistsError:
-            pass
+            fieldnames = self._read_fieldnames()
+            if fieldnames is not None:
+                missing_fieldnames = [fieldname
+                                      for fieldname in self.fieldnames
+                                      if fieldname not in fieldnames]
+                if missing_fieldnames:
+                    self._add_columns(missing_fieldnames)
+                self.fieldnames = fieldnames + missing_fieldnames
 
     def record_weather_summary(self, weather_summary, subject_location_summary):
         """Record 'weather_summary' and associate it with
         'subject_location_summary'.
         """
-        with open(self._filename, 'a') as csvfile:
-            writer = csv.DictWriter(csvfile, self.fieldnames)
+        with _append_seconds.time():
+            index_is_fresh = self._index_is_fresh()
+
+            with open(self._filename, 'a') as csvfile:
+                writer = csv.DictWriter(csvfile, self.fieldnames)
+
+                row = CsvGateway._make_row(
+                    weather_summary,
+                    subject_location_summary
+                )
+
+                writer.writerow(row)
 
-            row = CsvGateway._make_row(weather_summary, subject_location_summary)
+            self._rows_appended([row], index_is_fresh)
 
-            writer.writerow(row)
+    def batch_writer(self, max_rows=1000, max_seconds=5.0, on_flush=None):
+        """Return a CsvBatchWriter that records weather summaries in batches
+        of up to 'max_rows' rows or 'max_seconds' seconds, checked as rows
+        are recorded, calling 'on_flush' after each batch is safely on disk. Use it as a context manager so
+        that the last batch is flushed.
+        """
+        return CsvBatchWriter(self, max_rows, max_seconds, on_flush)
 
     def fetch_weather_summary(self, subject_location_summary):
         """Fetch the weather summary associated with
         'subject_location_summary'. Return None if no such weather summary
         exists.
         """
+        with _lookup_seconds.time():
+            return self._fetch_weather_summary(subject_location_summary)
+
+    def _fetch_weather_summary(self, subject_location_summary):
+        if self._indexed:
+            if not self._index_is_fresh():
+                self._load_index()
+            return self._index.get(subject_location_summary)
+
         with open(self._filename, 'r') as csvfile:
             reader = csv.DictReader(csvfile)
 
@@ -58,6 +131,197 @@ class CsvGateway:
             else:
                 return None
 
+    def fetch_nearby_weather_summary(self, subject_location_summary,
+                                     max_distance_km):
+        """Fetch the weather summary recorded for the location closest to
+        'subject_location_summary' on the same date, for any subject, as an
+        ApproximateWeatherSummary tagged with its distance. Rows that are
+        themselves approximate are not used. Return None if no such location
+        is within 'max_distance_km' kilometres.
+
+        When indexed, the locations are kept in a SpatialIndex that is built
+        on first use and kept up to date along with the index.
+        """
+        if self._indexed:
+            if not self._index_is_fresh():
+                self._load_index()
+            if self._spatial_index is None:
+                self._load_spatial_index()
+            nearest = self._spatial_index.nearest(
+                subject_location_summary,
+                max_distance_km
+            )
+        else:
+            nearest = self._scan_for_nearest(
+                subject_location_summary,
+                max_distance_km
+            )
+
+        if nearest is None:
+            return None
+
+        distance, _, weather_summary = nearest
+        return ApproximateWeatherSummary.from_weather_summary(
+            weather_summary,
+            distance
+        )
+
+    def fetch_unrecorded_locations(self, subject_location_summaries):
+        """Return, in their original order, the members of
+        'subject_location_summaries' that have no weather summary recorded.
+        The file is read at most once, no matter how many are given.
+        """
+        subject_location_summaries = list(subject_location_summaries)
+
+        if self._index_is_fresh():
+            return [summary for summary in subject_location_summaries
+                    if summary not in self._index]
+
+        unrecorded = set(subject_location_summaries)
+
+        with open(self._filename, 'r') as csvfile:
+            for row in csv.DictReader(csvfile):
+                if not unrecorded:
+                    break
+                unrecorded.discard(
+                    CsvGateway._extract_subject_location_summary(row)
+                )
+
+        return [summary for summary in subject_location_summaries
+                if summary in unrecorded]
+
+    def fetch_all_weather_summaries(self):
+        """Yield a (subject_location_summary, weather_summary) pair for every
+        row of the file, in file order, reading it as a stream.
+        """
+        with open(self._filename, 'r') as csvfile:
+            for row in csv.DictReader(csvfile):
+                yield (CsvGateway._extract_subject_location_summary(row),
+                       CsvGateway._extract_weather_summary(row))
+
+    def _read_fieldnames(self):
+        """Return the column names in the file's header, or None if it has
+        none.
+        """
+        with open(self._filename, 'r') as csvfile:
+            return next(csv.reader(csvfile), None)
+
+    def _add_columns(self, missing_fieldnames):
+        """Rewrite the file with 'missing_fieldnames' added to the end of its
+        header and left empty in every row, replacing it atomically. A row
+        left half-written by a crash is dropped first.
+        """
+        truncate_partial_line(self._filename)
+        migrated_filename = self._filename + '.migrate'
+
+        with open(self._filename, 'r', newline='') as csvfile, \
+                open(migrated_filename, 'w', newline='') as migrated_file:
+            reader = csv.reader(csvfile)
+            writer = csv.writer(migrated_file)
+            writer.writerow(next(reader) + missing_fieldnames)
+            padding = ['']*len(missing_fieldnames)
+            for row in reader:
+                writer.writerow(row + padding)
+            migrated_file.flush()
+            os.fsync(migrated_file.fileno())
+
+        os.replace(migrated_filename, self._filename)
+
+    def _signature(self):
+        """Return a value that changes whenever the file changes on disk."""
+        stat = os.stat(self._filename)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _index_is_fresh(self):
+        return (self._index is not None and
+                self._index_signature == self._signature())
+
+    def _load_index(self):
+        """Load every row of the file into the index. Only the first row for
+        a given SubjectLocationSummary is kept, just as a scan would find.
+        """
+        with _index_load_seconds.time():
+            self._index = WeatherSummaryIndex()
+            self._index_signature = self._signature()
+            self._spatial_index = None
+
+            with open(self._filename, 'r') as csvfile:
+                for row in csv.DictReader(csvfile):
+                    self._index.setdefault(
+                        CsvGateway._extract_subject_location_summary(row),
+                        CsvGateway._extract_weather_summary(row)
+                    )
+
+    def _rows_appended(self, rows, index_was_fresh):
+        """Bring the index up to date after 'rows' were appended to the file.
+        'index_was_fresh' tells whether the index matched the file right
+        before they were.
+        """
+        _rows_appended.inc(len(rows))
+
+        if index_was_fresh:
+            for row in rows:
+                self._add_to_index(row)
+            self._index_signature = self._signature()
+        else:
+            self._index = None
+            self._spatial_index = None
+
+    def _add_to_index(self, row):
+        """Add 'row', as made by '_make_row', to the index exactly as it will
+        be read back from the file.
+        """
+        written_row = {}
+        for fieldname in self.fieldnames:
+            value = row.get(fieldname)
+            written_row[fieldname] = '' if value is None else str(value)
+
+        subject_location_summary = \
+            CsvGateway._extract_subject_location_summary(written_row)
+        if subject_location_summary in self._index:
+            return
+
+        weather_summary = CsvGateway._extract_weather_summary(written_row)
+        self._index.setdefault(subject_location_summary, weather_summary)
+
+        if self._spatial_index is not None:
+            self._add_to_spatial_index(
+                subject_location_summary,
+                weather_summary
+            )
+
+    def _load_spatial_index(self):
+        self._spatial_index = SpatialIndex()
+        for subject_location_summary, weather_summary in self._index.items():
+            self._add_to_spatial_index(
+                subject_location_summary,
+                weather_summary
+            )
+
+    def _add_to_spatial_index(self, subject_location_summary, weather_summary):
+        if not isinstance(weather_summary, ApproximateWeatherSummary):
+            self._spatial_index.add(subject_location_summary, weather_summary)
+
+    def _scan_for_nearest(self, subject_location_summary, max_distance_km):
+        """Like SpatialIndex.nearest, but scanning the whole file."""
+        nearest = None
+        for location, weather_summary in self.fetch_all_weather_summaries():
+            if (location.date != subject_location_summary.date or
+                    isinstance(weather_summary, ApproximateWeatherSummary)):
+                continue
+
+            distance = haversine_km(
+                subject_location_summary.longitude,
+                subject_location_summary.latitude,
+                location.longitude,
+                location.latitude
+            )
+            if (distance <= max_distance_km and
+                    (nearest is None or distance < nearest[0])):
+                nearest = (distance, location, weather_summary)
+
+        return nearest
+
     @staticmethod
     def _extract_subject_location_summary(row):
         return SubjectLocationSummary(
@@ -70,42 +334,67 @@ class CsvGateway:
     @staticmethod
     def _extract_weather_summary(row):
         try:
-            mean_temp = float(row['mean_temp'])
+            mean_temp = float(row.get('mean_temp', ''))
         except ValueError:
             mean_temp = None
         try:
-            min_temp = float(row['min_temp'])
+            min_temp = float(row.get('min_temp', ''))
         except ValueError:
             min_temp = None
         try:
-            max_temp = float(row['max_temp'])
+            max_temp = float(row.get('max_temp', ''))
         except ValueError:
             max_temp = None
         try:
-            precipitation = float(row['precipitation'])
+            precipitation = float(row.get('precipitation', ''))
         except ValueError:
             precipitation = None
         try:
-            apparent_mean_temp = float(row['apparent_mean_temp'])
+            apparent_mean_temp = float(row.get('apparent_mean_temp', ''))
         except ValueError:
             apparent_mean_temp = None
         try:
-            apparent_max_temp = float(row['apparent_max_temp'])
+            apparent_max_temp = float(row.get('apparent_max_temp', ''))
         except ValueError:
             apparent_max_temp = None
         try:
-            apparent_min_temp = float(row['apparent_min_temp'])
+            apparent_min_temp = float(row.get('apparent_min_temp', ''))
         except ValueError:
             apparent_min_temp = None
+        try:
+            median_temp = float(row.get('median_temp', ''))
+        except ValueError:
+            median_temp = None
+        try:
+            stddev_temp = float(row.get('stddev_temp', ''))
+        except ValueError:
+            stddev_temp = None
+        try:
+            hours_above_threshold = int(row.get('hours_above_threshold', ''))
+        except ValueError:
+            hours_above_threshold = None
 
-        return WeatherSummary(
+        weather_summary = WeatherSummary(
             mean_temp,
             max_temp,
             min_temp,
             precipitation,
             apparent_mean_temp,
             apparent_max_temp,
-            apparent_min_temp
+            apparent_min_temp,
+            median_temp,
+            stddev_temp,
+            hours_above_threshold
+        )
+
+        try:
+            source_distance_km = float(row.get('source_distance_km', ''))
+        except ValueError:
+            return weather_summary
+
+        return ApproximateWeatherSummary.from_weather_summary(
+            weather_summary,
+            source_distance_km
         )
 
     @staticmethod
@@ -138,8 +427,21 @@ class CsvGateway:
             apparent_min_temp = format(weather_summary.apparent_min_temp, '.2f')
         except TypeError:
             apparent_min_temp = None
+        try:
+            median_temp = format(weather_summary.median_temp, '.2f')
+        except TypeError:
+            median_temp = None
+        try:
+            stddev_temp = format(weather_summary.stddev_temp, '.2f')
+        except TypeError:
+            stddev_temp = None
+        try:
+            hours_above_threshold = format(weather_summary.hours_above_threshold,
+                                           '.0f')
+        except TypeError:
+            hours_above_threshold = None
 
-        return {
+        row = {
             'subject_id': subject_location_summary.subject_id,
             'longitude': subject_location_summary.longitude,
             'latitude': subject_location_summary.latitude,
@@ -150,5 +452,94 @@ class CsvGateway:
             'precipitation': precipitation,
             'apparent_mean_temp': apparent_mean_temp,
             'apparent_max_temp': apparent_max_temp,
-            'apparent_min_temp': apparent_min_temp
+            'apparent_min_temp': apparent_min_temp,
+            'median_temp': median_temp,
+            'stddev_temp': stddev_temp,
+            'hours_above_threshold': hours_above_threshold
         }
+
+        if isinstance(weather_summary, ApproximateWeatherSummary):
+            row['source_distance_km'] = format(weather_summary.distance_km,
+                                               '.3f')
+
+        return row
+
+
+class CsvBatchWriter:
+    """Records weather summaries into a CsvGateway's file through a single
+    open file handle.
+
+    Rows are buffered until 'max_rows' of them are waiting or, when the next
+    row is recorded, 'max_seconds' have passed since the oldest was
+    buffered. There is no timer, so rows recorded just before a long pause
+    stay buffered until another row, 'flush' or 'close'. Each batch is then
+    written with one write and fsync'd. A row left half-written by a crash is
+    truncated away when the writer is opened, so the file only ever holds
+    whole rows.
+    """
+    def __init__(self, csv_gateway, max_rows, max_seconds, on_flush=None):
+        self._csv_gateway = csv_gateway
+        self._max_rows = max_rows
+        self._max_seconds = max_seconds
+        self._on_flush = on_flush
+        self._rows = []
+        self._oldest_row_time = None
+        self._csvfile = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        truncate_partial_line(self._csv_gateway._filename)
+        self._csvfile = open(self._csv_gateway._filename, 'a')
+
+    def close(self):
+        if self._csvfile is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self._csvfile.close()
+            self._csvfile = None
+
+    def record_weather_summary(self, weather_summary, subject_location_summary):
+        """Buffer 'weather_summary', associated with
+        'subject_location_summary', and flush the batch if it is full or old
+        enough.
+        """
+        if not self._rows:
+            self._oldest_row_time = time.monotonic()
+
+        self._rows.append(
+            CsvGateway._make_row(weather_summary, subject_location_summary)
+        )
+
+        if (len(self._rows) >= self._max_rows or
+                time.monotonic() - self._oldest_row_time >= self._max_seconds):
+            self.flush()
+
+    def flush(self):
+        """Write every buffered row to disk."""
+        if not self._rows:
+            return
+
+        with _append_seconds.time():
+            batch = io.StringIO()
+            writer = csv.DictWriter(batch, self._csv_gateway.fieldnames)
+            writer.writerows(self._rows)
+
+            index_is_fresh = self._csv_gateway._index_is_fresh()
+
+            self._csvfile.write(batch.getvalue())
+            self._csvfile.flush()
+            os.fsync(self._csvfile.fileno())
+
+            self._csv_gateway._rows_appended(self._rows, index_is_fresh)
+        self._rows = []
+
+        if self._on_flush is not None:
+            self._on_flush()
@@ -1,47 +1,177 @@
 """Module for dark_sky_gateway."""
 
-import requests
+import json
+import math
+import statistics
+from functools import partial
+from . import http_session
+from .coalescing_weather_gateway import CoalescingWeatherGateway
+from .process_pool import map_in_chunks
+from .response_cache import ResponseCache
 from definitions import WeatherSummary
 
 class DarkSkyGateway:
     """Gateway for fetching weather summaries."""
+    BASE_URL = 'https://api.darksky.net/forecast'
+    HOURLY_FIELDS = ('temperature', 'apparentTemperature', 'precipIntensity')
+    TEMPERATURE_THRESHOLD = 80.0
+
     @staticmethod
-    def fetch_weather_summary(subject_location_summary, api_key):
+    def fetch_weather_summary(subject_location_summary, api_key=None,
+                              cache=None, rate_controller=None,
+                              key_pool=None):
         """Using 'api_key' for authorization, fetch a summary of the weather
-        at 'subject_location_summary'.
+        at 'subject_location_summary'. If 'cache' is given, it is consulted
+        before making a request, and successful responses are stored in it.
+        If 'rate_controller' is given, requests that miss the cache wait on
+        its 'control_rate' before being made. If 'key_pool' is given,
+        requests that miss the cache are made through it with a key from the
+        pool instead of 'api_key'.
+        """
+        response = DarkSkyGateway.fetch_response(
+            subject_location_summary,
+            api_key,
+            cache,
+            rate_controller,
+            key_pool
+        )
+
+        return DarkSkyGateway._pluck_response(json.loads(response))
+
+    @staticmethod
+    def fetch_response(subject_location_summary, api_key=None, cache=None,
+                       rate_controller=None, key_pool=None):
+        """Using 'api_key', or a key from 'key_pool' if it is given, for
+        authorization, fetch the raw JSON text of the weather at
+        'subject_location_summary', going through 'cache' if it is given.
+        Only a request that is actually sent waits on 'rate_controller' or
+        is counted against a key in 'key_pool'. Raise ApiKeyRejectedError if
+        the API refuses 'api_key'.
+        """
+        cache_key = DarkSkyGateway._make_cache_key(subject_location_summary)
+
+        if cache is not None:
+            response = cache.get(cache_key)
+            if response is not None:
+                return response
+
+        if rate_controller is not None:
+            rate_controller.control_rate()
+
+        if key_pool is not None:
+            response = key_pool.call(DarkSkyGateway._request_response,
+                                     subject_location_summary)
+        else:
+            response = DarkSkyGateway._request_response(
+                subject_location_summary,
+                api_key
+            )
+
+        if cache is not None and response.status_code == 200:
+            cache.put(cache_key, response.text)
+
+        return response.text
+
+    @staticmethod
+    def _request_response(subject_location_summary, api_key):
+        """Send the request for 'subject_location_summary' and return the
+        requests.Response.
         """
         request = DarkSkyGateway._make_request(
             subject_location_summary,
             api_key
         )
 
-        response = requests.get(request).json()
-
-        return DarkSkyGateway._pluck_response(response)
+        response = http_session.get_session().get(request)
+        http_session.check_api_key(response)
+        return response
 
     @staticmethod
     def _make_request(subject_location_summary, api_key):
         """Using 'api_key' for authorization, make a request for fetching weather
         data at 'subject_location_summary'.
         """
-        return ('https://api.darksky.net/forecast/{api_key}/{latitude},'
+        return ('{base_url}/{api_key}/{latitude},'
                 '{longitude},{date}T00:00:00?exclude=currently,minutely,'
                 'alerts,flags').format(
+                    base_url=DarkSkyGateway.BASE_URL,
                     api_key=api_key,
                     date=subject_location_summary.date.isoformat(),
                     latitude=subject_location_summary.latitude,
                     longitude=subject_location_summary.longitude
                 )
 
+    @staticmethod
+    def pluck_cached_responses(subject_location_summaries, cache_directory,
+                               processes=None, chunksize=256, cell_size=None):
+        """Yield a (subject_location_summary, weather_summary) pair for each of
+        'subject_location_summaries', in order, plucking the WeatherSummary
+        from the response cached for it in the ResponseCache at
+        'cache_directory'. With 'cell_size', a location without a response of
+        its own is given the one cached for the centre of its cell, as a
+        CoalescingWeatherGateway with that 'cell_size' fetched it. The
+        weather summary is None when no response is cached. The work is
+        spread over 'processes' worker processes as
+        process_pool.map_in_chunks does.
+        """
+        return map_in_chunks(
+            partial(DarkSkyGateway._pluck_cached_response, cache_directory,
+                    cell_size),
+            subject_location_summaries,
+            processes,
+            chunksize
+        )
+
+    @staticmethod
+    def _pluck_cached_response(cache_directory, cell_size,
+                               subject_location_summary):
+        cached_locations = [subject_location_summary]
+        if cell_size:
+            cached_locations.append(CoalescingWeatherGateway.make_cell(
+                subject_location_summary,
+                cell_size
+            ))
+
+        for cached_location in cached_locations:
+            response = ResponseCache.read(
+                cache_directory,
+                DarkSkyGateway._make_cache_key(cached_location)
+            )
+            if response is not None:
+                return DarkSkyGateway._pluck_response(json.loads(response))
+        return None
+
+    @staticmethod
+    def _make_cache_key(subject_location_summary):
+        """Make the request for 'subject_location_summary' with the API key
+        left out, for use as a cache key.
+        """
+        return DarkSkyGateway._make_request(subject_location_summary, '')
+
     @staticmethod
     def _pluck_response(response):
-        """Pluck the WeatherSummary from 'response'."""
-        try:
-            temperatures = [data['temperature'] for data in
-                            response['hourly']['data']]
-            mean_temp = sum(temperatures)/len(temperatures)
-        except:
-            mean_temp = None
+        """Pluck the WeatherSummary from 'response'. Its hourly statistics
+        count the hours warmer than TEMPERATURE_THRESHOLD.
+        """
+        hourly = DarkSkyGateway._extract_hourly_columns(response)
+        temperatures = hourly['temperature']
+
+        mean_temp = DarkSkyGateway._mean(temperatures)
+        apparent_mean_temp = DarkSkyGateway._mean(hourly['apparentTemperature'])
+        precipitation = DarkSkyGateway._sum(hourly['precipIntensity'])
+
+        if mean_temp is None:
+            median_temp = None
+            stddev_temp = None
+            hours_above_threshold = None
+        else:
+            median_temp = statistics.median(temperatures)
+            stddev_temp = DarkSkyGateway._stddev(temperatures, mean_temp)
+            hours_above_threshold = sum(
+                1 for temperature in temperatures
+                if temperature > DarkSkyGateway.TEMPERATURE_THRESHOLD
+            )
+
         try:
             max_temp = response['daily']['data'][0]['temperatureHigh']
         except KeyError:
@@ -50,12 +180,6 @@ class DarkSkyGateway:
             min_temp = response['daily']['data'][0]['temperatureLow']
         except KeyError:
             min_temp = None
-        try:
-            apparent_temperatures = [data['apparentTemperature'] for data in
-                                     response['hourly']['data']]
-            apparent_mean_temp = sum(apparent_temperatures)/len(apparent_temperatures)
-        except:
-            apparent_mean_temp = None
         try:
             apparent_max_temp = response['daily']['data'][0]['apparentTemperatureHigh']
         except KeyError:
@@ -64,12 +188,6 @@ class DarkSkyGateway:
             apparent_min_temp = response['daily']['data'][0]['apparentTemperatureLow']
         except KeyError:
             apparent_min_temp = None
-        try:
-            precip_intensities = [data['precipIntensity'] for data in
-                                  response['hourly']['data']]
-            precipitation = sum(precip_intensities)
-        except KeyError:
-            precipitation = None
 
         return WeatherSummary(
             mean_temp,
@@ -78,5 +196,50 @@ class DarkSkyGateway:
             precipitation,
             apparent_mean_temp,
             apparent_max_temp,
-            apparent_min_temp
+            apparent_min_temp,
+            median_temp,
+            stddev_temp,
+            hours_above_threshold
         )
+
+    @staticmethod
+    def _extract_hourly_columns(response):
+        """Extract every field in HOURLY_FIELDS from the hours in 'response' in
+        one pass. Return a dict mapping each field to a list with one value
+        per hour, where None marks an hour without that field. Every list is
+        None if 'response' has no hourly data at all.
+        """
+        try:
+            hours = response['hourly']['data']
+        except (KeyError, TypeError):
+            return dict.fromkeys(DarkSkyGateway.HOURLY_FIELDS)
+
+        columns = {field: [] for field in DarkSkyGateway.HOURLY_FIELDS}
+        for hour in hours:
+            for field, column in columns.items():
+                column.append(hour.get(field))
+        return columns
+
+    @staticmethod
+    def _mean(column):
+        """Return the mean of 'column', or None if it is empty or any hour is
+        missing.
+        """
+        if not column or None in column:
+            return None
+        return sum(column)/len(column)
+
+    @staticmethod
+    def _stddev(column, mean):
+        """Return the population standard deviation of 'column', whose mean
+        is 'mean', in one pass of float arithmetic.
+        """
+        squares = [(value - mean)*(value - mean) for value in column]
+        return math.sqrt(sum(squares)/len(column))
+
+    @staticmethod
+    def _sum(column):
+        """Return the sum of 'column', or None if any hour is missing."""
+        if column is None or None in column:
+            return None
+        return sum(column)
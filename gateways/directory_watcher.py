@@ -0,0 +1,73 @@
+"""Module for directory_watcher."""
+
+import os
+import time
+
+class DirectoryWatcher:
+    """Watches a directory for files that are new or have changed, by
+    comparing snapshots of their mtimes and sizes. No external service or
+    library is needed.
+
+    A file is only reported once it looks the same in two polls in a row, so
+    files that are still being written are not picked up early.
+    """
+    def __init__(self, directory_name, interval=2.0):
+        self._directory_name = directory_name
+        self._interval = interval
+        self._reported = {}
+        self._pending = {}
+
+    def poll(self):
+        """Return the paths, in name order, of the files that are new or
+        changed and have settled since the last poll.
+        """
+        snapshot = DirectoryWatcher._take_snapshot(self._directory_name)
+        settled = []
+
+        for path, signature in snapshot.items():
+            if self._reported.get(path) == signature:
+                continue
+            if self._pending.get(path) == signature:
+                settled.append(path)
+                self._reported[path] = signature
+                del self._pending[path]
+            else:
+                self._pending[path] = signature
+
+        for path in set(self._pending) - set(snapshot):
+            del self._pending[path]
+        for path in set(self._reported) - set(snapshot):
+            del self._reported[path]
+
+        return sorted(settled)
+
+    def forget(self, paths):
+        """Forget that 'paths' were reported, so that they are reported again
+        once they have settled, even if they have not changed.
+        """
+        for path in paths:
+            self._reported.pop(path, None)
+
+    def watch(self):
+        """Poll forever, every 'interval' seconds, yielding each non-empty list
+        of settled files.
+        """
+        while True:
+            settled = self.poll()
+            if settled:
+                yield settled
+            time.sleep(self._interval)
+
+    @staticmethod
+    def _take_snapshot(directory_name):
+        snapshot = {}
+        with os.scandir(directory_name) as entries:
+            for entry in entries:
+                try:
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
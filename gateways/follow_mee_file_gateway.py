@@ -1,27 +1,196 @@
 """Module for follow_mee_file_gateway."""
 
 import csv
+import os
 from datetime import date
+from functools import partial
+import metrics
 from definitions import SubjectLocationSummary
+from .process_pool import map_in_chunks
+
+_parse_seconds = metrics.histogram(
+    'follow_mee_file_parse_seconds',
+    'Seconds taken to read the location from one FollowMee file.'
+)
+_invalid_files = metrics.counter(
+    'follow_mee_invalid_files_total',
+    'FollowMee files without valid data.'
+)
+_unreadable_files = metrics.counter(
+    'follow_mee_unreadable_files_total',
+    'FollowMee files that could not be read.'
+)
 
 class FollowMeeFileGateway:
     """Gateway class that understands files produced by 'FollowMee'."""
 
     @staticmethod
     def extract_subject_location_summary(filename):
-        """Extract the SubjectLocationSummary contained in 'filename'."""
+        """Extract the SubjectLocationSummary contained in 'filename'. Only the
+        header and first row of the file are read.
+        """
+        with _parse_seconds.time():
+            subject_location_summary = \
+                FollowMeeFileGateway._read_subject_location_summary(filename)
+
+        if subject_location_summary is None:
+            FollowMeeFileGateway._report_invalid_file(filename)
+
+        return subject_location_summary
+
+    @staticmethod
+    def extract_subject_location_summaries(filenames, processes=None,
+                                           chunksize=64):
+        """Extract the SubjectLocationSummary contained in each of
+        'filenames' using a pool of 'processes' worker processes (one per CPU
+        by default) that are handed 'chunksize' files at a time. Summaries are
+        yielded in the order of 'filenames'. Files without valid data are
+        reported and skipped.
+        """
+        results = FollowMeeFileGateway.extract_file_subject_location_summaries(
+            filenames,
+            processes,
+            chunksize
+        )
+
+        for _, subject_location_summary in results:
+            if subject_location_summary is not None:
+                yield subject_location_summary
+
+    @staticmethod
+    def extract_file_subject_location_summaries(filenames, processes=None,
+                                                chunksize=64, executor=None):
+        """Like 'extract_subject_location_summaries', but yield a
+        (filename, subject_location_summary) pair for every file, with None
+        as the summary of a file without valid data. Files that cannot be
+        read at all are reported and left out, so that they can be tried
+        again. 'executor' is passed on to process_pool.map_in_chunks.
+        """
+        if metrics.REGISTRY.enabled:
+            results = FollowMeeFileGateway._read_timed(
+                filenames,
+                processes,
+                chunksize,
+                executor
+            )
+        else:
+            results = map_in_chunks(
+                FollowMeeFileGateway._try_read_subject_location_summary,
+                filenames,
+                processes,
+                chunksize,
+                executor
+            )
+
+        for filename, (subject_location_summary, error) in results:
+            if error is not None:
+                FollowMeeFileGateway._report_unreadable_file(filename, error)
+                continue
+            if subject_location_summary is None:
+                FollowMeeFileGateway._report_invalid_file(filename)
+            yield filename, subject_location_summary
+
+    @staticmethod
+    def ingest_directory(directory_name, processes=None, chunksize=64):
+        """Extract the SubjectLocationSummary of every file in
+        'directory_name', in filename order, as
+        'extract_subject_location_summaries' does.
+        """
+        filenames = sorted(os.path.join(directory_name, filename)
+                           for filename in os.listdir(directory_name))
+
+        return FollowMeeFileGateway.extract_subject_location_summaries(
+            filenames,
+            processes,
+            chunksize
+        )
+
+    @staticmethod
+    def extract_trace_location_summaries(filename, precision=3,
+                                         centroid=False):
+        """Yield a SubjectLocationSummary for every distinct location, rounded
+        to 'precision' decimal places, that appears on each day of the trace
+        in 'filename'. With 'centroid', yield one summary per day instead,
+        located at the mean of that day's points.
+
+        The file is streamed and only the current day's locations are kept,
+        so memory use does not grow with the length of the trace. FollowMee
+        writes its points in time order; if a day reappears later in the
+        trace its locations are summarized again. Rows without valid data
+        are skipped.
+        """
+        subject_id = FollowMeeFileGateway._extract_subject_id(filename)
+        current_date = None
+        locations = {}
+        longitude_total = latitude_total = point_count = 0
+
+        def summarize_day():
+            if centroid:
+                day_locations = [(longitude_total/point_count,
+                                  latitude_total/point_count)]
+            else:
+                day_locations = locations
+
+            for longitude, latitude in day_locations:
+                yield SubjectLocationSummary(
+                    subject_id,
+                    FollowMeeFileGateway._round(longitude, precision),
+                    FollowMeeFileGateway._round(latitude, precision),
+                    current_date
+                )
+
+        with open(filename, 'r') as follow_mee_file:
+            for row_record in csv.DictReader(follow_mee_file):
+                try:
+                    longitude, latitude = FollowMeeFileGateway._extract_location(
+                        row_record
+                    )
+                    record_date = FollowMeeFileGateway._extract_date(row_record)
+                except (KeyError, TypeError, ValueError):
+                    continue
+
+                if record_date != current_date:
+                    if point_count:
+                        yield from summarize_day()
+                    current_date = record_date
+                    locations = {}
+                    longitude_total = latitude_total = point_count = 0
+
+                if centroid:
+                    longitude_total += longitude
+                    latitude_total += latitude
+                else:
+                    locations[(
+                        FollowMeeFileGateway._round(longitude, precision),
+                        FollowMeeFileGateway._round(latitude, precision)
+                    )] = None
+                point_count += 1
+
+        if point_count:
+            yield from summarize_day()
+
+    @staticmethod
+    def _round(coordinate, precision):
+        if precision is None:
+            return coordinate
+        return round(coordinate, precision)
+
+    @staticmethod
+    def _read_subject_location_summary(filename):
+        """Return the SubjectLocationSummary contained in 'filename', or None
+        if it holds no valid data.
+        """
         with open(filename, 'r') as follow_mee_file:
             reader = csv.DictReader(follow_mee_file)
-            first_row_record = list(reader)[0]
             try:
+                first_row_record = next(reader)
                 longitude, latitude = FollowMeeFileGateway._extract_location(
                     first_row_record
                 )
                 date = FollowMeeFileGateway._extract_date(first_row_record)
-            except KeyError:
-                print('Invalid data in {filename}'.format(filename=filename))
+            except (StopIteration, KeyError, TypeError, ValueError):
                 return None
-            
+
         subject_id = FollowMeeFileGateway._extract_subject_id(filename)
         return SubjectLocationSummary(
             subject_id,
@@ -30,6 +199,54 @@ class FollowMeeFileGateway:
             date
         )
 
+    @staticmethod
+    def _try_read_subject_location_summary(filename):
+        """Return (subject_location_summary, None) as
+        '_read_subject_location_summary' does, or (None, error) with the
+        message of the OSError raised if 'filename' cannot be read.
+        """
+        try:
+            return (
+                FollowMeeFileGateway._read_subject_location_summary(filename),
+                None
+            )
+        except OSError as error:
+            return None, str(error)
+
+    @staticmethod
+    def _read_timed(filenames, processes, chunksize, executor=None):
+        """Like mapping '_try_read_subject_location_summary' over
+        'filenames', but time each file in the worker and observe it here,
+        where the metrics are reported.
+        """
+        results = map_in_chunks(
+            partial(
+                metrics.call_timed,
+                FollowMeeFileGateway._try_read_subject_location_summary
+            ),
+            filenames,
+            processes,
+            chunksize,
+            executor
+        )
+
+        for filename, (result, seconds) in results:
+            _parse_seconds.observe(seconds)
+            yield filename, result
+
+    @staticmethod
+    def _report_invalid_file(filename):
+        _invalid_files.inc()
+        print('Invalid data in {filename}'.format(filename=filename))
+
+    @staticmethod
+    def _report_unreadable_file(filename, error):
+        _unreadable_files.inc()
+        print('Could not read {filename}: {error}'.format(
+            filename=filename,
+            error=error
+        ))
+
     @staticmethod
     def _extract_location(row_record):
         """Extract the subject's location as a (longitude, latitude) tuple from
@@ -0,0 +1,108 @@
+"""Module for http_session."""
+
+import threading
+import requests
+import metrics
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+SERVER_ERROR_STATUSES = (500, 502, 503, 504)
+RETRY_STATUSES = (429,) + SERVER_ERROR_STATUSES
+REJECTED_KEY_STATUSES = (401, 403, 429)
+THROTTLED_KEY_STATUSES = (429,)
+
+_session = None
+_session_lock = threading.Lock()
+
+_request_seconds = metrics.histogram(
+    'http_request_seconds',
+    'Seconds taken by each HTTP request, including any retries.'
+)
+_request_errors = metrics.counter(
+    'http_request_errors_total',
+    'HTTP requests that raised or ended with an error status.'
+)
+
+class ApiKeyRejectedError(Exception):
+    """Raised when an API refuses a request because of its API key, either
+    because the key is not authorized or because its quota is spent.
+    """
+    def __init__(self, status_code):
+        super().__init__(
+            'API key rejected with status {}'.format(status_code)
+        )
+        self.status_code = status_code
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies 'timeout' to requests that do not set one."""
+    def __init__(self, timeout, **kwargs):
+        self._timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self._timeout
+
+        with _request_seconds.time():
+            try:
+                response = super().send(request, **kwargs)
+            except Exception:
+                _request_errors.inc()
+                raise
+
+        if response.status_code >= 400:
+            _request_errors.inc()
+        return response
+
+def make_session(pool_size=10, timeout=(5, 30), retries=3, backoff_factor=0.5,
+                 retry_statuses=RETRY_STATUSES):
+    """Make a requests.Session that keeps up to 'pool_size' connections per
+    host alive, gives up on a request after 'timeout' seconds (a number or a
+    (connect, read) tuple) and retries responses with 'retry_statuses' and
+    connection errors up to 'retries' times with exponential backoff.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=retry_statuses
+    )
+    adapter = TimeoutHTTPAdapter(
+        timeout,
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=retry
+    )
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def configure_session(**kwargs):
+    """Replace the session shared by the gateways with one made by
+    'make_session' from 'kwargs'.
+    """
+    global _session
+
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = make_session(**kwargs)
+
+def get_session():
+    """Return the session shared by the gateways, making a default one the
+    first time it is needed.
+    """
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            _session = make_session()
+        return _session
+
+def check_api_key(response):
+    """Raise ApiKeyRejectedError if 'response' shows that its API key was
+    rejected.
+    """
+    if response.status_code in REJECTED_KEY_STATUSES:
+        raise ApiKeyRejectedError(response.status_code)
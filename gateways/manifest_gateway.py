@@ -0,0 +1,131 @@
+"""Module for manifest_gateway."""
+
+import json
+import os
+from datetime import date
+from definitions import SubjectLocationSummary, SubjectLocationSummaryArray
+from .append_only_file import truncate_partial_line
+
+class ManifestGateway:
+    """Gateway for the progress manifest of a backfill.
+
+    The manifest is an append-only file of JSON lines recording which input
+    files have been fully processed, identified by name, mtime and size, and
+    which locations have had their weather stored. Records are buffered
+    until 'flush', which appends and fsyncs them together. A line cut short
+    by a crash is discarded on the next start, so the process can be killed
+    at any point. 'is_seeded' tells whether the manifest has been recorded
+    as holding every location of the store it was first used with.
+
+    The fetched locations are kept in a SubjectLocationSummaryArray, since
+    there can be millions of them.
+    """
+    def __init__(self, filename):
+        self._filename = filename
+        self._file_signatures = {}
+        self._locations = SubjectLocationSummaryArray()
+        self._lines = []
+        self.is_seeded = False
+
+        try:
+            truncate_partial_line(filename)
+        except FileNotFoundError:
+            pass
+        else:
+            self._load()
+
+    @staticmethod
+    def default_filename(csv_filename, shard_directory=None):
+        """Return the name of the manifest for the weather recorded in
+        'csv_filename', or in the shards in 'shard_directory' if it is given,
+        so that each store has a manifest of its own.
+        """
+        if shard_directory:
+            return os.path.join(shard_directory, 'manifest.jsonl')
+        return csv_filename + '.manifest.jsonl'
+
+    @staticmethod
+    def file_signature(filename):
+        """Return the (mtime_ns, size) of 'filename', which changes whenever
+        the file does.
+        """
+        stat = os.stat(filename)
+        return stat.st_mtime_ns, stat.st_size
+
+    def is_file_processed(self, filename, signature):
+        """Return whether 'filename', as identified by 'signature', has been
+        recorded as processed.
+        """
+        return self._file_signatures.get(filename) == signature
+
+    def is_location_fetched(self, subject_location_summary):
+        return subject_location_summary in self._locations
+
+    def record_file(self, filename, signature):
+        """Record that 'filename', as identified by 'signature', has been
+        processed. It is written to disk by the next 'flush'.
+        """
+        self._file_signatures[filename] = signature
+        self._lines.append({
+            'file': filename,
+            'mtime_ns': signature[0],
+            'size': signature[1]
+        })
+
+    def record_location(self, subject_location_summary):
+        """Record that the weather at 'subject_location_summary' is stored. It
+        is written to disk by the next 'flush'.
+        """
+        self._add_location(subject_location_summary)
+        self._lines.append({'location': [
+            subject_location_summary.subject_id,
+            subject_location_summary.longitude,
+            subject_location_summary.latitude,
+            subject_location_summary.date.isoformat()
+        ]})
+
+    def record_seeded(self):
+        """Record that every location of the store has been recorded. It is
+        written to disk by the next 'flush'.
+        """
+        self.is_seeded = True
+        self._lines.append({'seeded': True})
+
+    def flush(self):
+        """Append every buffered record to the manifest."""
+        if not self._lines:
+            return
+
+        data = ''.join(json.dumps(line) + '\n' for line in self._lines)
+
+        with open(self._filename, 'a') as manifest_file:
+            manifest_file.write(data)
+            manifest_file.flush()
+            os.fsync(manifest_file.fileno())
+
+        self._lines = []
+
+    def _load(self):
+        with open(self._filename, 'r') as manifest_file:
+            for line in manifest_file:
+                record = json.loads(line)
+                if 'seeded' in record:
+                    self.is_seeded = True
+                elif 'file' in record:
+                    self._file_signatures[record['file']] = (
+                        record['mtime_ns'],
+                        record['size']
+                    )
+                else:
+                    subject_id, longitude, latitude, location_date = \
+                        record['location']
+                    self._add_location(SubjectLocationSummary(
+                        subject_id,
+                        longitude,
+                        latitude,
+                        date.fromisoformat(location_date)
+                    ))
+
+    def _add_location(self, subject_location_summary):
+        if subject_location_summary not in self._locations:
+            self._locations.append(subject_location_summary)
@@ -0,0 +1,56 @@
+"""Module for nearby_weather_gateway."""
+
+import metrics
+from .background_fetch import BackgroundFetch
+
+_reused = metrics.counter(
+    'nearby_weather_reused_total',
+    'Locations answered with weather already recorded for a nearby location.'
+)
+
+class NearbyWeatherGateway:
+    """Gateway that reuses weather already recorded nearby instead of
+    fetching it.
+
+    Each location is first looked up with
+    'csv_gateway.fetch_nearby_weather_summary'; if weather was recorded
+    within 'max_distance_km' kilometres on the same date, that is given
+    as an ApproximateWeatherSummary. The rest are fetched with
+    'fetch_weather_summaries', a callable such as
+    ConcurrentWeatherGateway.fetch_weather_summaries that takes an iterable
+    of SubjectLocationSummary and yields (subject_location_summary,
+    weather_summary) pairs.
+
+    Weather fetched here can only be reused once it is recorded in
+    'csv_gateway'.
+    """
+    def __init__(self, csv_gateway, fetch_weather_summaries,
+                 max_distance_km=1.0):
+        self._csv_gateway = csv_gateway
+        self._fetch_weather_summaries = fetch_weather_summaries
+        self._max_distance_km = max_distance_km
+
+    def fetch_weather_summaries(self, subject_location_summaries):
+        """Yield a (subject_location_summary, weather_summary) pair for each of
+        'subject_location_summaries', answering from nearby recorded weather
+        where possible. Reused weather is yielded as soon as it is found,
+        while the rest is fetched on a thread of its own.
+        """
+        fetch = BackgroundFetch(self._fetch_weather_summaries)
+        try:
+            for location in subject_location_summaries:
+                weather_summary = self._csv_gateway.fetch_nearby_weather_summary(
+                    location,
+                    self._max_distance_km
+                )
+                if weather_summary is None:
+                    fetch.request(location)
+                else:
+                    _reused.inc()
+                    yield location, weather_summary
+
+                yield from fetch.completed()
+
+            yield from fetch.finish()
+        finally:
+            fetch.close()
@@ -0,0 +1,245 @@
+"""Module for parquet_gateway."""
+
+import os
+import time
+import uuid
+from definitions import (ApproximateWeatherSummary, SubjectLocationSummary,
+                         WeatherSummary)
+
+try:
+    import pyarrow
+    import pyarrow.dataset
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+WEATHER_FIELDNAMES = [
+    'mean_temp',
+    'max_temp',
+    'min_temp',
+    'apparent_mean_temp',
+    'apparent_max_temp',
+    'apparent_min_temp',
+    'precipitation',
+    'median_temp',
+    'stddev_temp',
+    'hours_above_threshold',
+    'source_distance_km'
+]
+INTEGER_FIELDNAMES = {'hours_above_threshold'}
+
+class ParquetGateway:
+    """Gateway that persists weather summaries as a columnar Parquet dataset.
+
+    It offers the same interface as CsvGateway. Summaries are buffered and
+    appended to the dataset in 'directory' as one new file, holding a single
+    row group, per 'row_group_size' summaries. Columns are typed, missing
+    values are stored as nulls, and lookups push their filters on
+    subject_id, date and location down to the row groups. Files are named
+    by the time they were written and a UUID, so several writers can append
+    to one dataset without colliding, and are read in the order they were
+    written. Files written before a column was added are read with that
+    column null. Use the gateway as a context manager, or call 'flush', so
+    that the last row group is written. Requires pyarrow.
+    """
+    def __init__(self, directory, row_group_size=50000):
+        if pyarrow is None:
+            raise ImportError('ParquetGateway requires pyarrow')
+
+        self._directory = directory
+        self._row_group_size = row_group_size
+        self._rows = []
+        self.schema = pyarrow.schema(
+            [('subject_id', pyarrow.string()),
+             ('longitude', pyarrow.float64()),
+             ('latitude', pyarrow.float64()),
+             ('date', pyarrow.date32())] +
+            [(fieldname, pyarrow.int64() if fieldname in INTEGER_FIELDNAMES
+              else pyarrow.float64())
+             for fieldname in WEATHER_FIELDNAMES]
+        )
+
+        os.makedirs(directory, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def record_weather_summary(self, weather_summary, subject_location_summary):
+        """Record 'weather_summary' and associate it with
+        'subject_location_summary'.
+        """
+        self._rows.append(
+            ParquetGateway._make_row(weather_summary, subject_location_summary)
+        )
+
+        if len(self._rows) >= self._row_group_size:
+            self.flush()
+
+    def flush(self):
+        """Append every buffered summary to the dataset as one row group."""
+        if not self._rows:
+            return
+
+        table = pyarrow.Table.from_pylist(self._rows, schema=self.schema)
+        name = 'part-{time:020d}-{unique}.parquet'.format(
+            time=time.time_ns(),
+            unique=uuid.uuid4().hex
+        )
+        temporary_filename = os.path.join(self._directory, '.' + name)
+        pyarrow.parquet.write_table(
+            table,
+            temporary_filename,
+            row_group_size=len(self._rows)
+        )
+        os.replace(temporary_filename, os.path.join(self._directory, name))
+
+        self._rows = []
+
+    def fetch_weather_summary(self, subject_location_summary):
+        """Fetch the weather summary associated with
+        'subject_location_summary'. Return None if no such weather summary
+        exists.
+        """
+        key = ParquetGateway._make_key(subject_location_summary)
+
+        for row in self._rows:
+            if ParquetGateway._make_key(row) == key:
+                return ParquetGateway._extract_weather_summary(row)
+
+        field = pyarrow.dataset.field
+        table = self.read_table(
+            columns=WEATHER_FIELDNAMES,
+            filter=((field('subject_id') == key[0]) &
+                    (field('date') == key[3]) &
+                    (field('longitude') == key[1]) &
+                    (field('latitude') == key[2]))
+        )
+
+        if table is None or table.num_rows == 0:
+            return None
+        return ParquetGateway._extract_weather_summary(
+            table.slice(0, 1).to_pylist()[0]
+        )
+
+    def fetch_unrecorded_locations(self, subject_location_summaries):
+        """Return, in their original order, the members of
+        'subject_location_summaries' that have no weather summary recorded.
+        Only the key columns are read, and only once.
+        """
+        subject_location_summaries = list(subject_location_summaries)
+        recorded = {ParquetGateway._make_key(row) for row in self._rows}
+
+        table = self.read_table(columns=['subject_id', 'longitude', 'latitude',
+                                    'date'])
+        if table is not None:
+            recorded.update(zip(*(table.column(name).to_pylist()
+                                  for name in table.column_names)))
+
+        return [summary for summary in subject_location_summaries
+                if ParquetGateway._make_key(summary) not in recorded]
+
+    def fetch_all_weather_summaries(self):
+        """Yield a (subject_location_summary, weather_summary) pair for every
+        recorded summary, one row group at a time.
+        """
+        for filename in self._part_filenames():
+            parquet_file = pyarrow.parquet.ParquetFile(filename)
+            for index in range(parquet_file.num_row_groups):
+                for row in parquet_file.read_row_group(index).to_pylist():
+                    yield (ParquetGateway._extract_subject_location_summary(row),
+                           ParquetGateway._extract_weather_summary(row))
+
+        for row in self._rows:
+            yield (ParquetGateway._extract_subject_location_summary(row),
+                   ParquetGateway._extract_weather_summary(row))
+
+    def read_table(self, **kwargs):
+        """Read the dataset into a pyarrow Table, passing 'kwargs', such as
+        'columns' and 'filter', on to pyarrow.dataset.Dataset.to_table. Return
+        None if nothing has been written yet.
+        """
+        filenames = self._part_filenames()
+        if not filenames:
+            return None
+
+        dataset = pyarrow.dataset.dataset(
+            filenames,
+            schema=self.schema,
+            format='parquet'
+        )
+        return dataset.to_table(**kwargs)
+
+    def _part_filenames(self):
+        return sorted(os.path.join(self._directory, name)
+                      for name in os.listdir(self._directory)
+                      if name.startswith('part-') and name.endswith('.parquet'))
+
+    @staticmethod
+    def _make_key(record):
+        """Make a (subject_id, longitude, latitude, date) tuple from a
+        SubjectLocationSummary or a row.
+        """
+        if isinstance(record, dict):
+            return (record['subject_id'], record['longitude'],
+                    record['latitude'], record['date'])
+        return (str(record.subject_id), float(record.longitude),
+                float(record.latitude), record.date)
+
+    @staticmethod
+    def _extract_subject_location_summary(row):
+        return SubjectLocationSummary(
+            row['subject_id'],
+            row['longitude'],
+            row['latitude'],
+            row['date']
+        )
+
+    @staticmethod
+    def _extract_weather_summary(row):
+        """Extract the WeatherSummary from 'row', in which columns that were
+        added after its file was written are missing.
+        """
+        weather_summary = WeatherSummary(
+            row['mean_temp'],
+            row['max_temp'],
+            row['min_temp'],
+            row['precipitation'],
+            row['apparent_mean_temp'],
+            row['apparent_max_temp'],
+            row['apparent_min_temp'],
+            row.get('median_temp'),
+            row.get('stddev_temp'),
+            row.get('hours_above_threshold')
+        )
+
+        if row.get('source_distance_km') is None:
+            return weather_summary
+        return ApproximateWeatherSummary.from_weather_summary(
+            weather_summary,
+            row['source_distance_km']
+        )
+
+    @staticmethod
+    def _make_row(weather_summary, subject_location_summary):
+        row = {
+            'subject_id': str(subject_location_summary.subject_id),
+            'longitude': float(subject_location_summary.longitude),
+            'latitude': float(subject_location_summary.latitude),
+            'date': subject_location_summary.date
+        }
+        for fieldname in WEATHER_FIELDNAMES:
+            if fieldname == 'source_distance_km':
+                value = getattr(weather_summary, 'distance_km', None)
+            else:
+                value = getattr(weather_summary, fieldname)
+
+            if value is None:
+                row[fieldname] = None
+            elif fieldname in INTEGER_FIELDNAMES:
+                row[fieldname] = int(value)
+            else:
+                row[fieldname] = float(value)
+        return row
@@ -0,0 +1,58 @@
+"""Module for process_pool."""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+
+def map_in_chunks(function, items, processes=None, chunksize=64,
+                  executor=None):
+    """Yield an (item, function(item)) pair for each of 'items', in order,
+    computing them in a pool of 'processes' worker processes (one per CPU by
+    default, or in this process if 'processes' is 1). Pass a
+    ProcessPoolExecutor of 'processes' workers as 'executor' to reuse it
+    instead of starting a new pool.
+
+    Items are handed to the workers 'chunksize' at a time and only a couple
+    of chunks per worker are queued, so 'items' may be an arbitrarily long
+    stream. 'function' and the items must be picklable.
+    """
+    chunks = _make_chunks(items, chunksize)
+    apply = partial(_apply_to_chunk, function)
+
+    if processes == 1:
+        results = map(apply, chunks)
+    elif executor is not None:
+        results = _map_in_executor(apply, chunks, processes, executor)
+    else:
+        results = _map_in_pool(apply, chunks, processes)
+
+    for chunk, chunk_results in results:
+        yield from zip(chunk, chunk_results)
+
+def _make_chunks(items, chunksize):
+    items = iter(items)
+    chunk = list(islice(items, chunksize))
+    while chunk:
+        yield chunk
+        chunk = list(islice(items, chunksize))
+
+def _apply_to_chunk(function, chunk):
+    return chunk, [function(item) for item in chunk]
+
+def _map_in_pool(apply, chunks, processes):
+    with ProcessPoolExecutor(processes) as executor:
+        yield from _map_in_executor(apply, chunks, processes, executor)
+
+def _map_in_executor(apply, chunks, processes, executor):
+    max_queued = 2*(processes or os.cpu_count() or 1)
+    queued = deque()
+
+    for chunk in chunks:
+        queued.append(executor.submit(apply, chunk))
+        if len(queued) >= max_queued:
+            yield queued.popleft().result()
+
+    while queued:
+        yield queued.popleft().result()
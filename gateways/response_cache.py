@@ -0,0 +1,172 @@
+"""Module for response_cache."""
+
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+import metrics
+
+_hits = metrics.counter(
+    'response_cache_hits_total',
+    'Lookups answered from the response cache.'
+)
+_misses = metrics.counter(
+    'response_cache_misses_total',
+    'Lookups not found in the response cache.'
+)
+_evictions = metrics.counter(
+    'response_cache_evictions_total',
+    'Responses evicted from the response cache to stay under its size limit.'
+)
+
+class ResponseCache:
+    """On-disk cache of raw API responses, keyed by the request that produced
+    them. Callers must strip any API key from the request first.
+
+    Each response is stored gzip-compressed, together with its request, in
+    'directory' under a name derived from the SHA-256 of the request. When
+    the cache holds more than 'max_bytes' of compressed responses, the least
+    recently used are evicted. Hits, misses and evictions are counted.
+    """
+    def __init__(self, directory, max_bytes=2**30):
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sizes = OrderedDict()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_sizes()
+
+    def get(self, request):
+        """Return the response cached for 'request', or None."""
+        digest = ResponseCache._make_digest(request)
+        response = ResponseCache.read(self._directory, request)
+
+        with self._lock:
+            if response is None:
+                self.misses += 1
+                _misses.inc()
+                return None
+
+            self.hits += 1
+            _hits.inc()
+            if digest in self._sizes:
+                self._sizes.move_to_end(digest)
+
+        try:
+            os.utime(self._make_filename(self._directory, digest))
+        except FileNotFoundError:
+            pass
+
+        return response
+
+    def put(self, request, response):
+        """Cache the text 'response' for 'request'."""
+        digest = ResponseCache._make_digest(request)
+        filename = ResponseCache._make_filename(self._directory, digest)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+        temporary_filename = '{filename}.{thread}.tmp'.format(
+            filename=filename,
+            thread=threading.get_ident()
+        )
+        with gzip.open(temporary_filename, 'wt', encoding='utf-8') as entry:
+            entry.write(request)
+            entry.write('\n')
+            entry.write(response)
+        os.replace(temporary_filename, filename)
+
+        with self._lock:
+            self._total_bytes -= self._sizes.pop(digest, 0)
+            self._sizes[digest] = os.path.getsize(filename)
+            self._total_bytes += self._sizes[digest]
+            self._evict()
+
+    def requests(self):
+        """Yield every request that has a cached response."""
+        with self._lock:
+            digests = list(self._sizes)
+
+        for digest in digests:
+            try:
+                request, _ = ResponseCache._read_entry(
+                    ResponseCache._make_filename(self._directory, digest)
+                )
+            except FileNotFoundError:
+                continue
+            yield request
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits/lookups if lookups else None,
+                'entries': len(self._sizes),
+                'bytes': self._total_bytes
+            }
+
+    @staticmethod
+    def read(directory, request):
+        """Return the response cached for 'request' in 'directory', or None.
+        Unlike 'get', this neither counts the lookup nor marks the response
+        as used, so it can be called from other processes.
+        """
+        filename = ResponseCache._make_filename(
+            directory,
+            ResponseCache._make_digest(request)
+        )
+        try:
+            cached_request, response = ResponseCache._read_entry(filename)
+        except (FileNotFoundError, EOFError, OSError):
+            return None
+
+        if cached_request != request:
+            return None
+        return response
+
+    def _load_sizes(self):
+        """Index the entries already on disk, least recently used first."""
+        entries = []
+        for root, _, filenames in os.walk(self._directory):
+            for filename in filenames:
+                if not filename.endswith('.gz'):
+                    continue
+                stat = os.stat(os.path.join(root, filename))
+                entries.append((stat.st_mtime_ns, filename[:-3], stat.st_size))
+
+        for _, digest, size in sorted(entries):
+            self._sizes[digest] = size
+            self._total_bytes += size
+
+    def _evict(self):
+        while self._total_bytes > self._max_bytes and len(self._sizes) > 1:
+            digest, size = self._sizes.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            _evictions.inc()
+            try:
+                os.remove(ResponseCache._make_filename(self._directory, digest))
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _read_entry(filename):
+        with gzip.open(filename, 'rt', encoding='utf-8') as entry:
+            request, _, response = entry.read().partition('\n')
+        return request, response
+
+    @staticmethod
+    def _make_digest(request):
+        return hashlib.sha256(request.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _make_filename(directory, digest):
+        return os.path.join(directory, digest[:2], digest + '.gz')
@@ -0,0 +1,253 @@
+"""Module for sharded_csv_gateway."""
+
+import json
+import os
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+from .csv_gateway import CsvGateway
+
+class ShardedCsvGateway:
+    """Gateway that spreads weather summaries over 'shards' CSV files in
+    'directory', each managed by a CsvGateway.
+
+    A SubjectLocationSummary belongs to the shard its subject ID hashes to,
+    so a lookup only reads and indexes that one shard, and each subject's
+    rows stay together. Like a CsvGateway, a ShardedCsvGateway belongs to
+    one thread. Its batch writer writes every shard from a thread of its
+    own, so the shards are written in parallel without any locks.
+
+    The number of shards is saved in the directory on creation; opening it
+    again with a different number raises ValueError, since the rows would
+    no longer be found in the shards they hash to.
+    """
+    def __init__(self, directory, shards=16, indexed=True):
+        os.makedirs(directory, exist_ok=True)
+        ShardedCsvGateway._check_shard_count(directory, shards)
+
+        self._shards = [
+            CsvGateway(
+                os.path.join(directory, 'shard-{:03d}.csv'.format(shard)),
+                indexed
+            ) for shard in range(shards)
+        ]
+        self._directory = directory
+
+    def record_weather_summary(self, weather_summary, subject_location_summary):
+        """Record 'weather_summary' and associate it with
+        'subject_location_summary'.
+        """
+        self._shards[
+            self._shard_number(subject_location_summary)
+        ].record_weather_summary(weather_summary, subject_location_summary)
+
+    def batch_writer(self, max_rows=1000, max_seconds=5.0, on_flush=None):
+        """Return a ShardedCsvBatchWriter, which batches like
+        CsvGateway.batch_writer but writes each batch to the shards in
+        parallel.
+        """
+        return ShardedCsvBatchWriter(self, max_rows, max_seconds, on_flush)
+
+    def fetch_weather_summary(self, subject_location_summary):
+        """Fetch the weather summary associated with
+        'subject_location_summary' from its shard. Return None if no such
+        weather summary exists.
+        """
+        return self._shards[
+            self._shard_number(subject_location_summary)
+        ].fetch_weather_summary(subject_location_summary)
+
+    def fetch_nearby_weather_summary(self, subject_location_summary,
+                                     max_distance_km):
+        """Like CsvGateway.fetch_nearby_weather_summary. Nearby locations may
+        belong to any subject, so every shard is searched.
+        """
+        nearest = None
+        for csv_gateway in self._shards:
+            weather_summary = csv_gateway.fetch_nearby_weather_summary(
+                subject_location_summary,
+                max_distance_km
+            )
+            if weather_summary is not None and (
+                    nearest is None or
+                    weather_summary.distance_km < nearest.distance_km):
+                nearest = weather_summary
+
+        return nearest
+
+    def fetch_unrecorded_locations(self, subject_location_summaries):
+        """Return, in their original order, the members of
+        'subject_location_summaries' that have no weather summary recorded.
+        Each shard is read at most once.
+        """
+        subject_location_summaries = list(subject_location_summaries)
+        by_shard = [[] for _ in self._shards]
+        for location in subject_location_summaries:
+            by_shard[self._shard_number(location)].append(location)
+
+        unrecorded = set()
+        for shard, locations in enumerate(by_shard):
+            if not locations:
+                continue
+            unrecorded.update(
+                self._shards[shard].fetch_unrecorded_locations(locations)
+            )
+
+        return [location for location in subject_location_summaries
+                if location in unrecorded]
+
+    def fetch_all_weather_summaries(self):
+        """Yield a (subject_location_summary, weather_summary) pair for every
+        row of every shard, one shard after another, reading them as
+        streams.
+        """
+        return chain.from_iterable(
+            csv_gateway.fetch_all_weather_summaries()
+            for csv_gateway in self._shards
+        )
+
+    def import_csv(self, csv_filename, batch_size=10000):
+        """Copy the rows of the CsvGateway file 'csv_filename' into the
+        shards, once, returning how many were copied. The import is recorded
+        in the directory when it finishes, so later calls copy nothing. One
+        that is interrupted can simply be run again, since locations already
+        in the shards are not copied twice.
+        """
+        imported_filename = os.path.join(self._directory, 'imported.json')
+        source = os.path.abspath(csv_filename)
+        try:
+            with open(imported_filename, 'r') as imported_file:
+                imported = json.load(imported_file)['filenames']
+        except FileNotFoundError:
+            imported = []
+        if source in imported or not os.path.exists(csv_filename):
+            return 0
+
+        copied = 0
+        pairs = CsvGateway(csv_filename, indexed=False) \
+            .fetch_all_weather_summaries()
+        with self.batch_writer(max_rows=float('inf'),
+                               max_seconds=float('inf')) as writer:
+            while True:
+                rows = list(islice(pairs, batch_size))
+                if not rows:
+                    break
+                batch = {}
+                for location, weather_summary in rows:
+                    batch.setdefault(location, weather_summary)
+                for location in self.fetch_unrecorded_locations(batch):
+                    writer.record_weather_summary(batch[location], location)
+                    copied += 1
+                writer.flush()
+
+        temporary_filename = imported_filename + '.tmp'
+        with open(temporary_filename, 'w') as imported_file:
+            json.dump({'filenames': imported + [source]}, imported_file)
+        os.replace(temporary_filename, imported_filename)
+
+        return copied
+
+    def _shard_number(self, subject_location_summary):
+        subject_id = str(subject_location_summary.subject_id).encode('utf-8')
+        return zlib.crc32(subject_id) % len(self._shards)
+
+    @staticmethod
+    def _check_shard_count(directory, shards):
+        filename = os.path.join(directory, 'shards.json')
+        try:
+            with open(filename, 'x') as shards_file:
+                json.dump({'shards': shards}, shards_file)
+            return
+        except FileExistsError:
+            pass
+
+        with open(filename, 'r') as shards_file:
+            saved_shards = json.load(shards_file)['shards']
+        if saved_shards != shards:
+            raise ValueError(
+                '{directory} has {saved} shards, not {shards}'.format(
+                    directory=directory,
+                    saved=saved_shards,
+                    shards=shards
+                )
+            )
+
+
+class ShardedCsvBatchWriter:
+    """Records weather summaries into the shards of a ShardedCsvGateway,
+    through a CsvBatchWriter per shard.
+
+    Rows are buffered until 'max_rows' of them are waiting or, when the next
+    row is recorded, 'max_seconds' have passed since the oldest was
+    buffered, as in CsvBatchWriter. Every shard's batch is then
+    written and fsync'd in parallel, one thread per shard, and 'on_flush'
+    is called once all of them are on disk.
+    """
+    def __init__(self, sharded_gateway, max_rows, max_seconds, on_flush=None):
+        self._sharded_gateway = sharded_gateway
+        self._max_rows = max_rows
+        self._max_seconds = max_seconds
+        self._on_flush = on_flush
+        self._row_count = 0
+        self._oldest_row_time = None
+        self._writers = None
+        self._executor = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        shards = self._sharded_gateway._shards
+        self._writers = [
+            csv_gateway.batch_writer(max_rows=float('inf'),
+                                     max_seconds=float('inf'))
+            for csv_gateway in shards
+        ]
+        for writer in self._writers:
+            writer.open()
+        self._executor = ThreadPoolExecutor(max_workers=len(shards))
+
+    def close(self):
+        if self._writers is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown()
+            for writer in self._writers:
+                writer.close()
+            self._writers = None
+            self._executor = None
+
+    def record_weather_summary(self, weather_summary, subject_location_summary):
+        """Buffer 'weather_summary', associated with
+        'subject_location_summary', in its shard's writer and flush every
+        shard if the batch is full or old enough.
+        """
+        if not self._row_count:
+            self._oldest_row_time = time.monotonic()
+
+        self._writers[
+            self._sharded_gateway._shard_number(subject_location_summary)
+        ].record_weather_summary(weather_summary, subject_location_summary)
+        self._row_count += 1
+
+        if (self._row_count >= self._max_rows or
+                time.monotonic() - self._oldest_row_time >= self._max_seconds):
+            self.flush()
+
+    def flush(self):
+        """Write every buffered row to disk."""
+        if not self._row_count:
+            return
+
+        list(self._executor.map(lambda writer: writer.flush(), self._writers))
+        self._row_count = 0
+
+        if self._on_flush is not None:
+            self._on_flush()
@@ -0,0 +1,88 @@
+"""Module for spatial_index."""
+
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi*EARTH_RADIUS_KM/180
+
+class SpatialIndex:
+    """Index of values by location and date that finds the nearest location
+    on a given date.
+
+    Locations are bucketed, per date, into a grid of 'cell_size' degrees,
+    so a query only looks at the cells within its distance of the location
+    instead of every location stored. Distances are great-circle distances
+    in kilometres. Locations on either side of the antimeridian are not
+    considered near each other.
+    """
+    def __init__(self, cell_size=0.01):
+        self._cell_size = cell_size
+        self._dates = {}
+
+    def __len__(self):
+        return sum(len(entries)
+                   for cells in self._dates.values()
+                   for entries in cells.values())
+
+    def add(self, subject_location_summary, value):
+        """Store 'value' at the location and date of
+        'subject_location_summary'.
+        """
+        cells = self._dates.setdefault(subject_location_summary.date, {})
+        cell = (self._to_cell(subject_location_summary.longitude),
+                self._to_cell(subject_location_summary.latitude))
+        cells.setdefault(cell, []).append((subject_location_summary, value))
+
+    def nearest(self, subject_location_summary, max_distance_km):
+        """Return the (distance_km, subject_location_summary, value) stored
+        closest to 'subject_location_summary' on its date, or None if
+        nothing is stored within 'max_distance_km' of it.
+        """
+        cells = self._dates.get(subject_location_summary.date)
+        if not cells:
+            return None
+
+        longitude = subject_location_summary.longitude
+        latitude = subject_location_summary.latitude
+
+        latitude_span = max_distance_km/KM_PER_DEGREE
+        widest_latitude = min(abs(latitude) + latitude_span, 90.0)
+        longitude_span = min(
+            latitude_span/max(math.cos(math.radians(widest_latitude)), 1e-9),
+            180.0
+        )
+
+        nearest = None
+        for cell_longitude in self._cell_range(longitude, longitude_span):
+            for cell_latitude in self._cell_range(latitude, latitude_span):
+                for location, value in cells.get(
+                        (cell_longitude, cell_latitude), ()):
+                    distance = haversine_km(
+                        longitude,
+                        latitude,
+                        location.longitude,
+                        location.latitude
+                    )
+                    if (distance <= max_distance_km and
+                            (nearest is None or distance < nearest[0])):
+                        nearest = (distance, location, value)
+
+        return nearest
+
+    def _cell_range(self, coordinate, span):
+        return range(self._to_cell(coordinate - span),
+                     self._to_cell(coordinate + span) + 1)
+
+    def _to_cell(self, coordinate):
+        return math.floor(coordinate/self._cell_size)
+
+def haversine_km(longitude1, latitude1, longitude2, latitude2):
+    """Return the great-circle distance in kilometres between two points."""
+    longitude1, latitude1, longitude2, latitude2 = map(
+        math.radians,
+        (longitude1, latitude1, longitude2, latitude2)
+    )
+    a = (math.sin((latitude2 - latitude1)/2)**2 +
+         math.cos(latitude1)*math.cos(latitude2)*
+         math.sin((longitude2 - longitude1)/2)**2)
+    return 2*EARTH_RADIUS_KM*math.asin(min(math.sqrt(a), 1.0))
@@ -0,0 +1,300 @@
+"""Module for sqlite_gateway."""
+
+import sqlite3
+import threading
+import time
+from datetime import date
+from definitions import (ApproximateWeatherSummary, SubjectLocationSummary,
+                         WeatherSummary)
+
+WEATHER_FIELDNAMES = [
+    'mean_temp',
+    'max_temp',
+    'min_temp',
+    'apparent_mean_temp',
+    'apparent_max_temp',
+    'apparent_min_temp',
+    'precipitation',
+    'median_temp',
+    'stddev_temp',
+    'hours_above_threshold',
+    'source_distance_km'
+]
+INTEGER_FIELDNAMES = {'hours_above_threshold'}
+
+class SqliteGateway:
+    """Gateway that persists weather summaries in an SQLite database.
+
+    It offers the same interface as CsvGateway, but holds at most one row per
+    (subject_id, longitude, latitude, date), enforced by a unique composite
+    index. Recording a summary for a location that already has one updates
+    it in place, keeping stored values wherever the new summary has None,
+    so recording the same summary twice changes nothing; only whether the
+    weather is approximate always follows the new summary. A database
+    created before a column was added has it added, left null in the rows
+    already there. The database runs
+    in WAL mode and every thread gets its own connection, so several fetch
+    workers can record and look up summaries at once. Use the gateway as a
+    context manager, or call 'close', to close every connection.
+    """
+    def __init__(self, filename, timeout=30.0):
+        self._filename = filename
+        self._timeout = timeout
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+        with self._connect() as connection:
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS weather_summaries (
+                    subject_id TEXT NOT NULL,
+                    longitude REAL NOT NULL,
+                    latitude REAL NOT NULL,
+                    date TEXT NOT NULL,
+                    {weather_columns}
+                )'''.format(weather_columns=', '.join(
+                    SqliteGateway._make_column(fieldname)
+                    for fieldname in WEATHER_FIELDNAMES
+                )))
+            columns = {row[1] for row in connection.execute(
+                'PRAGMA table_info(weather_summaries)'
+            )}
+            for fieldname in WEATHER_FIELDNAMES:
+                if fieldname not in columns:
+                    connection.execute(
+                        'ALTER TABLE weather_summaries ADD COLUMN {}'.format(
+                            SqliteGateway._make_column(fieldname)
+                        )
+                    )
+            connection.execute('''
+                CREATE UNIQUE INDEX IF NOT EXISTS weather_summaries_location
+                ON weather_summaries (subject_id, longitude, latitude, date)
+            ''')
+
+        self._upsert = '''
+            INSERT INTO weather_summaries
+            (subject_id, longitude, latitude, date, {fieldnames})
+            VALUES (?, ?, ?, ?, {placeholders})
+            ON CONFLICT (subject_id, longitude, latitude, date) DO UPDATE SET
+            {updates}
+        '''.format(
+            fieldnames=', '.join(WEATHER_FIELDNAMES),
+            placeholders=', '.join('?' for _ in WEATHER_FIELDNAMES),
+            updates=', '.join(
+                '{0} = excluded.{0}'.format(fieldname)
+                if fieldname == 'source_distance_km' else
+                '{0} = COALESCE(excluded.{0}, {0})'.format(fieldname)
+                for fieldname in WEATHER_FIELDNAMES
+            )
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the connection of every thread. The gateway reconnects if it
+        is used again.
+        """
+        with self._connections_lock:
+            connections = self._connections
+            self._connections = []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+    def record_weather_summary(self, weather_summary, subject_location_summary):
+        """Record 'weather_summary' and associate it with
+        'subject_location_summary', committing at once. Use 'batch_writer' to
+        record many summaries in fewer transactions.
+        """
+        self.record_weather_summaries(
+            [(subject_location_summary, weather_summary)]
+        )
+
+    def record_weather_summaries(self, records):
+        """Record every (subject_location_summary, weather_summary) pair in
+        'records' in a single transaction.
+        """
+        with self._connect() as connection:
+            connection.executemany(
+                self._upsert,
+                (SqliteGateway._make_row(weather_summary, location)
+                 for location, weather_summary in records)
+            )
+
+    def batch_writer(self, max_rows=1000, max_seconds=5.0, on_flush=None):
+        """Return a SqliteBatchWriter that records weather summaries in
+        transactions of up to 'max_rows' rows or 'max_seconds' seconds,
+        calling 'on_flush' after each is committed. Use it as a context
+        manager so that the last batch is committed.
+        """
+        return SqliteBatchWriter(self, max_rows, max_seconds, on_flush)
+
+    def fetch_weather_summary(self, subject_location_summary):
+        """Fetch the weather summary associated with
+        'subject_location_summary'. Return None if no such weather summary
+        exists.
+        """
+        row = self._connect().execute(
+            '''SELECT {fieldnames} FROM weather_summaries
+               WHERE subject_id = ? AND longitude = ? AND latitude = ?
+               AND date = ?'''.format(fieldnames=', '.join(WEATHER_FIELDNAMES)),
+            SqliteGateway._make_key(subject_location_summary)
+        ).fetchone()
+
+        if row is None:
+            return None
+        return SqliteGateway._extract_weather_summary(row)
+
+    def fetch_unrecorded_locations(self, subject_location_summaries):
+        """Return, in their original order, the members of
+        'subject_location_summaries' that have no weather summary recorded.
+        """
+        connection = self._connect()
+        query = '''SELECT 1 FROM weather_summaries
+                   WHERE subject_id = ? AND longitude = ? AND latitude = ?
+                   AND date = ?'''
+
+        return [summary for summary in subject_location_summaries
+                if connection.execute(
+                    query,
+                    SqliteGateway._make_key(summary)
+                ).fetchone() is None]
+
+    def fetch_all_weather_summaries(self):
+        """Yield a (subject_location_summary, weather_summary) pair for every
+        recorded summary.
+        """
+        rows = self._connect().execute(
+            '''SELECT subject_id, longitude, latitude, date, {fieldnames}
+               FROM weather_summaries
+               ORDER BY rowid'''.format(
+                   fieldnames=', '.join(WEATHER_FIELDNAMES)
+            )
+        )
+        for row in rows:
+            yield (
+                SubjectLocationSummary(
+                    row[0],
+                    row[1],
+                    row[2],
+                    date.fromisoformat(row[3])
+                ),
+                SqliteGateway._extract_weather_summary(row[4:])
+            )
+
+    def _connect(self):
+        """Return this thread's connection, opening it if need be."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self._filename, timeout=self._timeout,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    @staticmethod
+    def _make_key(subject_location_summary):
+        return (
+            str(subject_location_summary.subject_id),
+            float(subject_location_summary.longitude),
+            float(subject_location_summary.latitude),
+            subject_location_summary.date.isoformat()
+        )
+
+    @staticmethod
+    def _make_column(fieldname):
+        if fieldname in INTEGER_FIELDNAMES:
+            return '{} INTEGER'.format(fieldname)
+        return '{} REAL'.format(fieldname)
+
+    @staticmethod
+    def _extract_weather_summary(values):
+        weather = dict(zip(WEATHER_FIELDNAMES, values))
+        weather_summary = WeatherSummary(
+            weather['mean_temp'],
+            weather['max_temp'],
+            weather['min_temp'],
+            weather['precipitation'],
+            weather['apparent_mean_temp'],
+            weather['apparent_max_temp'],
+            weather['apparent_min_temp'],
+            weather['median_temp'],
+            weather['stddev_temp'],
+            weather['hours_above_threshold']
+        )
+
+        if weather['source_distance_km'] is None:
+            return weather_summary
+        return ApproximateWeatherSummary.from_weather_summary(
+            weather_summary,
+            weather['source_distance_km']
+        )
+
+    @staticmethod
+    def _make_row(weather_summary, subject_location_summary):
+        return SqliteGateway._make_key(subject_location_summary) + tuple(
+            getattr(weather_summary, 'distance_km', None)
+            if fieldname == 'source_distance_km' else
+            getattr(weather_summary, fieldname)
+            for fieldname in WEATHER_FIELDNAMES
+        )
+
+
+class SqliteBatchWriter:
+    """Records weather summaries into a SqliteGateway's database in batches.
+
+    Rows are buffered until 'max_rows' of them are waiting or, when the next
+    row is recorded, 'max_seconds' have passed since the oldest was
+    buffered, as in CsvBatchWriter. Each batch is then upserted
+    and committed in a single transaction, after which 'on_flush' is
+    called.
+    """
+    def __init__(self, sqlite_gateway, max_rows, max_seconds, on_flush=None):
+        self._sqlite_gateway = sqlite_gateway
+        self._max_rows = max_rows
+        self._max_seconds = max_seconds
+        self._on_flush = on_flush
+        self._records = []
+        self._oldest_record_time = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.flush()
+
+    def record_weather_summary(self, weather_summary, subject_location_summary):
+        """Buffer 'weather_summary', associated with
+        'subject_location_summary', and commit the batch if it is full or
+        old enough.
+        """
+        if not self._records:
+            self._oldest_record_time = time.monotonic()
+
+        self._records.append((subject_location_summary, weather_summary))
+
+        if (len(self._records) >= self._max_rows or
+                time.monotonic() - self._oldest_record_time >=
+                self._max_seconds):
+            self.flush()
+
+    def flush(self):
+        """Commit every buffered summary in one transaction."""
+        if not self._records:
+            return
+
+        self._sqlite_gateway.record_weather_summaries(self._records)
+        self._records = []
+
+        if self._on_flush is not None:
+            self._on_flush()
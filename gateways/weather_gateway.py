@@ -1,6 +1,7 @@
 """Module for weather_gateway."""
 
-import requests
+import json
+from . import http_session
 from definitions import WeatherSummary
 
 API_KEY = '88e2f56333477b74'
@@ -8,27 +9,64 @@ API_KEY = '88e2f56333477b74'
 class WeatherGateway:
     """Gateway for fetching weather summaries."""
     @staticmethod
-    def fetch_weather_summary(subject_location_summary, api_key=API_KEY):
+    def fetch_weather_summary(subject_location_summary, api_key=API_KEY,
+                              cache=None, rate_controller=None):
         """Using 'api_key' for authorization, fetch a summary of the weather
-        at 'spacetime_point'.
+        at 'spacetime_point'. If 'cache' is given, it is consulted before
+        making a request, and successful responses are stored in it. If
+        'rate_controller' is given, requests that miss the cache wait on its
+        'control_rate' before being made.
         """
-        history_request = WeatherGateway._make_history_request(
+        history_response = WeatherGateway._fetch_history(
+            subject_location_summary,
             api_key,
-            subject_location_summary
+            cache,
+            rate_controller
+        )
+        return WeatherGateway._pluck_history_response(
+            json.loads(history_response)
         )
-        history_response = requests.get(history_request).json()
-        return WeatherGateway._pluck_history_response(history_response)
 
     @staticmethod
-    def fetch_weather_data(spacetime_point, api_key=API_KEY):
+    def fetch_weather_data(spacetime_point, api_key=API_KEY, cache=None,
+                           rate_controller=None):
         """Using 'api_key' for authorization, fetch all weather data at
         'spacetime_point.
         """
-        request = WeatherGateway._make_history_request(
-            api_key,
-            spacetime_point
-        )
-        response = requests.get(request).text
+        return WeatherGateway._fetch_history(spacetime_point, api_key, cache,
+                                             rate_controller)
+
+    @staticmethod
+    def _fetch_history(point, api_key, cache, rate_controller=None):
+        """Fetch the raw history response for 'point', going through 'cache'
+        if it is given and waiting on 'rate_controller' only when a request
+        is sent.
+        """
+        cache_key = WeatherGateway._make_history_request('', point)
+
+        if cache is not None:
+            response = cache.get(cache_key)
+            if response is not None:
+                return response
+
+        if rate_controller is not None:
+            rate_controller.control_rate()
+
+        response = WeatherGateway._request_history(point, api_key)
+
+        if cache is not None and response.status_code == 200:
+            cache.put(cache_key, response.text)
+
+        return response.text
+
+    @staticmethod
+    def _request_history(point, api_key):
+        """Send the history request for 'point' and return the
+        requests.Response.
+        """
+        request = WeatherGateway._make_history_request(api_key, point)
+        response = http_session.get_session().get(request)
+        http_session.check_api_key(response)
         return response
 
     @staticmethod
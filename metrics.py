@@ -0,0 +1,266 @@
+"""Module for metrics."""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+_NULL_TIMER = nullcontext()
+
+class MetricsRegistry:
+    """Collection of named counters and histograms.
+
+    Metrics are created once, usually at import time, and updated on the hot
+    paths. Until the registry is enabled every update returns straight
+    away, so instrumented code costs next to nothing when no one is
+    watching. Updates are thread-safe.
+    """
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def counter(self, name, documentation):
+        """Return the counter called 'name', creating it if need be."""
+        return self._get_or_create(Counter, name, documentation)
+
+    def histogram(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        """Return the histogram called 'name', creating it with upper bounds
+        'buckets' if need be.
+        """
+        return self._get_or_create(Histogram, name, documentation, buckets)
+
+    def reset(self):
+        """Set every metric back to zero."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+    def snapshot(self):
+        """Return the current value of every metric as a JSON-serializable
+        dict.
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+
+        snapshot = {'timestamp': time.time(), 'counters': {}, 'histograms': {}}
+        for name, metric in metrics:
+            if isinstance(metric, Counter):
+                snapshot['counters'][name] = metric.value
+            else:
+                snapshot['histograms'][name] = metric.snapshot()
+        return snapshot
+
+    def to_prometheus(self):
+        """Return every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+
+        lines = []
+        for name, metric in metrics:
+            lines.append('# HELP {} {}'.format(name, metric.documentation))
+            lines.extend(metric.to_prometheus())
+        return '\n'.join(lines) + '\n'
+
+    def append_json(self, filename):
+        """Append a snapshot to 'filename' as a single line of JSON."""
+        with open(filename, 'a') as json_file:
+            json_file.write(json.dumps(self.snapshot()) + '\n')
+
+    def write_prometheus(self, filename):
+        """Replace 'filename' with the Prometheus text format of every metric,
+        atomically so that a collector never reads half a file.
+        """
+        temporary_filename = filename + '.tmp'
+        with open(temporary_filename, 'w') as prometheus_file:
+            prometheus_file.write(self.to_prometheus())
+        os.replace(temporary_filename, filename)
+
+    def _get_or_create(self, metric_class, name, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(self, name, *args)
+            elif not isinstance(metric, metric_class):
+                raise ValueError('{} is already a {}'.format(
+                    name,
+                    type(metric).__name__
+                ))
+            return metric
+
+class Counter:
+    """Count of events that only ever goes up."""
+    def __init__(self, registry, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._registry = registry
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        if not self._registry.enabled:
+            return
+        with self._lock:
+            self.value += amount
+
+    def reset(self):
+        with self._lock:
+            self.value = 0
+
+    def to_prometheus(self):
+        return ['# TYPE {} counter'.format(self.name),
+                '{} {}'.format(self.name, self.value)]
+
+class Histogram:
+    """Distribution of observed values, such as latencies in seconds, counted
+    into buckets with the upper bounds 'buckets'.
+    """
+    def __init__(self, registry, name, documentation, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self._registry = registry
+        self._lock = threading.Lock()
+        self._bucket_counts = [0]*(len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        if not self._registry.enabled:
+            return
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            self._bucket_counts[bucket] += 1
+            self.count += 1
+            self.sum += value
+
+    def time(self):
+        """Return a context manager that observes the seconds spent in its
+        body.
+        """
+        if not self._registry.enabled:
+            return _NULL_TIMER
+        return _Timer(self)
+
+    def reset(self):
+        with self._lock:
+            self._bucket_counts = [0]*(len(self.buckets) + 1)
+            self.count = 0
+            self.sum = 0.0
+
+    def snapshot(self):
+        """Return the count, sum, mean and cumulative bucket counts."""
+        with self._lock:
+            bucket_counts = list(self._bucket_counts)
+            count = self.count
+            total = self.sum
+
+        return {
+            'count': count,
+            'sum': total,
+            'mean': total/count if count else None,
+            'buckets': dict(zip(
+                [str(bound) for bound in self.buckets] + ['+Inf'],
+                _accumulate(bucket_counts)
+            ))
+        }
+
+    def to_prometheus(self):
+        snapshot = self.snapshot()
+        lines = ['# TYPE {} histogram'.format(self.name)]
+        for bound, count in snapshot['buckets'].items():
+            lines.append('{}_bucket{{le="{}"}} {}'.format(self.name, bound, count))
+        lines.append('{}_sum {}'.format(self.name, snapshot['sum']))
+        lines.append('{}_count {}'.format(self.name, snapshot['count']))
+        return lines
+
+class _Timer:
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._histogram.observe(time.perf_counter() - self._start)
+
+class MetricsReporter:
+    """Writes the metrics in 'registry' every 'interval' seconds from a
+    background thread: a JSON line is appended to 'json_filename' and
+    'prometheus_filename' is replaced, for whichever are given. The
+    registry is enabled while the reporter runs, and a final report is
+    written when it stops.
+    """
+    def __init__(self, registry, json_filename=None, prometheus_filename=None,
+                 interval=60.0):
+        self._registry = registry
+        self._json_filename = json_filename
+        self._prometheus_filename = prometheus_filename
+        self._interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        self._registry.enabled = True
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+        self.report()
+        self._registry.enabled = False
+
+    def report(self):
+        if self._json_filename:
+            self._registry.append_json(self._json_filename)
+        if self._prometheus_filename:
+            self._registry.write_prometheus(self._prometheus_filename)
+
+    def _run(self):
+        while not self._stopped.wait(self._interval):
+            self.report()
+
+def call_timed(function, *args):
+    """Return (function(*args), seconds taken). Being picklable, it lets
+    work done in other processes be timed and observed in this one.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def _accumulate(counts):
+    total = 0
+    for count in counts:
+        total += count
+        yield total
+
+REGISTRY = MetricsRegistry()
+
+def counter(name, documentation):
+    """Return the counter called 'name' in the default registry."""
+    return REGISTRY.counter(name, documentation)
+
+def histogram(name, documentation, buckets=DEFAULT_BUCKETS):
+    """Return the histogram called 'name' in the default registry."""
+    return REGISTRY.histogram(name, documentation, buckets)
@@ -0,0 +1,171 @@
+"""Module for rate_controller."""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+import metrics
+
+_wait_seconds = metrics.histogram(
+    'rate_controller_wait_seconds',
+    'Seconds each call waited for the rate controller to allow it.'
+)
+
+class RateController:
+    """Class that controls the rate at which calls are made to a metered
+    weather API.
+
+    Calls are limited by a token bucket that refills at 'calls_per_minute'
+    calls per minute and holds up to 'burst' calls, and by a budget of
+    'calls_per_day' calls per calendar day in 'timezone'. Either budget may
+    be None to disable it. Callers only block when a budget is exhausted, so
+    time spent making a call counts towards the wait for the next one. No
+    60 second window ever sees more than calls_per_minute + burst - 1 calls.
+
+    When 'state_filename' is given, the number of calls made today is saved
+    there after every call and read back on construction, so the daily
+    budget survives restarts.
+    """
+    def __init__(self, calls_per_minute=10, calls_per_day=500, burst=1,
+                 state_filename=None, timezone='America/New_York',
+                 clock=time.time):
+        self._calls_per_minute = calls_per_minute
+        self._burst = burst
+        self._calls_per_day = calls_per_day
+        self._state_filename = state_filename
+        self._timezone = ZoneInfo(timezone)
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        self._tokens = burst
+        self._last_refill = clock()
+        self._current_date = self._today()
+        self._calls_today = 0
+
+        if state_filename is not None:
+            self._load_state()
+
+    @property
+    def calls_today(self):
+        return self._calls_today
+
+    @property
+    def remaining_calls_today(self):
+        """Return how many calls are left in today's budget, or None if there
+        is no daily budget.
+        """
+        if self._calls_per_day is None:
+            return None
+        with self._lock:
+            self._roll_date()
+            return self._calls_per_day - self._calls_today
+
+    def control_rate(self):
+        """Block until a call may be made and count it against the budgets."""
+        with _wait_seconds.time():
+            while True:
+                wait = self.try_reserve()
+                if not wait:
+                    return
+                time.sleep(wait)
+
+    async def control_rate_async(self):
+        """Like 'control_rate', but waits without blocking the event loop."""
+        with _wait_seconds.time():
+            while True:
+                wait = self.try_reserve()
+                if not wait:
+                    return
+                await asyncio.sleep(wait)
+
+    def try_reserve(self):
+        """Count a call and return 0 if the budgets allow one right now.
+        Otherwise return the number of seconds to wait before trying again,
+        without blocking.
+        """
+        with self._lock:
+            return self._reserve()
+
+    def _reserve(self):
+        """Count a call and return 0 if the budgets allow one right now.
+        Otherwise return the number of seconds to wait before trying again.
+        """
+        self._roll_date()
+
+        if (self._calls_per_day is not None and
+                self._calls_today >= self._calls_per_day):
+            seconds_until_tomorrow = self._get_seconds_until_tomorrow()
+            logging.info('Sleeping until tomorrow for {seconds} seconds'.format(
+                seconds=seconds_until_tomorrow
+            ))
+            return seconds_until_tomorrow
+
+        if self._calls_per_minute is not None:
+            self._refill()
+            if self._tokens < 1:
+                return (1 - self._tokens)*60/self._calls_per_minute
+            self._tokens -= 1
+
+        self._calls_today += 1
+        self._save_state()
+
+        logging.info('Calls today: {calls}'.format(calls=self._calls_today))
+
+        return 0
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = max(now - self._last_refill, 0)
+        self._tokens = min(
+            self._burst,
+            self._tokens + elapsed*self._calls_per_minute/60
+        )
+        self._last_refill = now
+
+    def _now(self):
+        return datetime.fromtimestamp(self._clock(), tz=self._timezone)
+
+    def _today(self):
+        return self._now().date()
+
+    def _roll_date(self):
+        today = self._today()
+        if today != self._current_date:
+            self._current_date = today
+            self._calls_today = 0
+
+    def _get_seconds_until_tomorrow(self):
+        """Return the number of seconds from now until midnight."""
+        now = self._now()
+        midnight = datetime.combine(
+            now.date() + timedelta(days=1),
+            datetime.min.time(),
+            tzinfo=self._timezone
+        )
+        return max(midnight.timestamp() - now.timestamp(), 0)
+
+    def _load_state(self):
+        try:
+            with open(self._state_filename, 'r') as state_file:
+                state = json.load(state_file)
+        except (FileNotFoundError, ValueError):
+            return
+
+        if state.get('date') == self._current_date.isoformat():
+            self._calls_today = state.get('calls', 0)
+
+    def _save_state(self):
+        if self._state_filename is None:
+            return
+
+        temporary_filename = self._state_filename + '.tmp'
+        with open(temporary_filename, 'w') as state_file:
+            json.dump({
+                'date': self._current_date.isoformat(),
+                'calls': self._calls_today
+            }, state_file)
+        os.replace(temporary_filename, self._state_filename)
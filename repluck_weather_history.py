@@ -0,0 +1,77 @@
+import argparse
+import os
+from itertools import tee
+
+from definitions import ApproximateWeatherSummary
+from gateways import CsvGateway, DarkSkyGateway
+
+def repluck_weather_history(csv_filename, cache_directory, processes=None,
+                            cell_size=None):
+    """Recompute every weather summary in 'csv_filename' from the raw Dark Sky
+    responses cached in 'cache_directory', and rewrite the file with the
+    current set of columns. Pass the 'cell_size' the weather was fetched
+    with, if any, so that rows sharing the response cached for their cell
+    are found. Rows without a cached response, and weather approximated
+    from a nearby location, are kept as they are. Return counts of the rows
+    replucked, missing and approximate.
+    """
+    temporary_filename = csv_filename + '.repluck'
+    if os.path.exists(temporary_filename):
+        os.remove(temporary_filename)
+
+    records, cached_records = tee(CsvGateway(
+        csv_filename,
+        indexed=False
+    ).fetch_all_weather_summaries())
+
+    replucked_records = DarkSkyGateway.pluck_cached_responses(
+        (location for location, _ in cached_records),
+        cache_directory,
+        processes,
+        cell_size=cell_size
+    )
+
+    counts = {'replucked': 0, 'missing': 0, 'approximate': 0}
+
+    with CsvGateway(temporary_filename).batch_writer(max_rows=10000) \
+            as csvWriter:
+        for (location, weather_summary), (_, replucked_summary) in zip(
+                records, replucked_records):
+            if isinstance(weather_summary, ApproximateWeatherSummary):
+                counts['approximate'] += 1
+            elif replucked_summary is None:
+                counts['missing'] += 1
+            else:
+                counts['replucked'] += 1
+                weather_summary = replucked_summary
+
+            csvWriter.record_weather_summary(weather_summary, location)
+
+    os.replace(temporary_filename, csv_filename)
+
+    print('Replucked {replucked} rows; {missing} rows had no cached response '
+          'and {approximate} approximate rows were kept'.format(**counts))
+    return counts
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--csv-filename', default='dark_sky_data.csv')
+    parser.add_argument('--cache-directory', default='dark_sky_cache')
+    parser.add_argument(
+        '--processes',
+        type=int,
+        help='number of worker processes; defaults to one per CPU'
+    )
+    parser.add_argument(
+        '--cell-size',
+        type=float,
+        help='the --cell-size that weather_history.py fetched the weather with'
+    )
+    args = parser.parse_args()
+
+    repluck_weather_history(
+        args.csv_filename,
+        args.cache_directory,
+        args.processes,
+        args.cell_size
+    )
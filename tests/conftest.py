@@ -0,0 +1,46 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pytest import fixture
+
+class JsonHandler(BaseHTTPRequestHandler):
+    """Base handler for stub APIs; subclasses implement 'do_GET'."""
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class StubServer(ThreadingHTTPServer):
+    """Server that accepts many connections at once, so concurrent clients
+    are not held up by dropped connection attempts.
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+@fixture
+def json_handler():
+    """Return JsonHandler, for tests to subclass into stub APIs."""
+    return JsonHandler
+
+@fixture
+def stub_server():
+    """Serve a handler class on localhost and return its base URL."""
+    servers = []
+
+    def serve(handler_class):
+        server = StubServer(('127.0.0.1', 0), handler_class)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return 'http://127.0.0.1:{port}'.format(port=server.server_port)
+
+    yield serve
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
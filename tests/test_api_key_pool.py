@@ -0,0 +1,174 @@
+import os
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+from pytest import raises
+from api_key_pool import ApiKeyPool, NoApiKeysError
+from definitions import SubjectLocationSummary
+from gateways import DarkSkyGateway, ResponseCache
+from gateways.http_session import ApiKeyRejectedError
+
+class FakeClock:
+    def __init__(self):
+        self.timestamp = datetime(2018, 9, 12, 12,
+                                  tzinfo=ZoneInfo('UTC')).timestamp()
+
+    def __call__(self):
+        return self.timestamp
+
+def test_routes_to_key_with_most_calls_left():
+    key_pool = ApiKeyPool(['first', 'second'], calls_per_day=3,
+                          clock=FakeClock())
+
+    keys = [key_pool.acquire() for _ in range(6)]
+
+    assert ['first', 'second']*3 == keys
+
+def test_takes_turns_without_daily_budget():
+    key_pool = ApiKeyPool(['first', 'second', 'third'], clock=FakeClock())
+
+    keys = [key_pool.acquire() for _ in range(4)]
+
+    assert ['first', 'second', 'third', 'first'] == keys
+
+def test_allows_the_calls_of_all_keys_together():
+    key_pool = ApiKeyPool(['first', 'second'], calls_per_minute=1,
+                          clock=FakeClock())
+
+    assert {'first', 'second'} == {key_pool._try_acquire()[0]
+                                   for _ in range(2)}
+    assert (None, 60) == key_pool._try_acquire()
+
+def test_never_exceeds_calls_per_minute_in_a_minute():
+    clock = FakeClock()
+    key_pool = ApiKeyPool(['only'], calls_per_minute=10, clock=clock)
+    calls = 0
+
+    for _ in range(10):
+        while key_pool._try_acquire()[0] is not None:
+            calls += 1
+        clock.timestamp += 6
+
+    assert 10 == calls
+
+def test_retires_rejected_keys():
+    key_pool = ApiKeyPool(['bad', 'good'], clock=FakeClock())
+    keys_tried = []
+
+    def fetch(location, api_key):
+        keys_tried.append(api_key)
+        if api_key == 'bad':
+            raise ApiKeyRejectedError(403)
+        return location
+
+    assert 'somewhere' == key_pool.call(fetch, 'somewhere')
+    assert 'somewhere' == key_pool.call(fetch, 'somewhere')
+    assert ['bad', 'good', 'good'] == keys_tried
+    assert ['good'] == key_pool.api_keys
+
+def test_rests_throttled_keys_and_uses_them_again(monkeypatch):
+    clock = FakeClock()
+    key_pool = ApiKeyPool(['only'], clock=clock, initial_backoff=30)
+    sleeps = []
+    responses = [ApiKeyRejectedError(429), ApiKeyRejectedError(429),
+                 'somewhere']
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock.timestamp += seconds
+
+    def fetch(location, api_key):
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr('api_key_pool.time.sleep', sleep)
+
+    assert 'somewhere' == key_pool.call(fetch, 'somewhere')
+    assert [30, 60] == sleeps
+    assert ['only'] == key_pool.api_keys
+    assert {} == key_pool._backoffs
+
+def test_raises_when_every_key_is_retired():
+    key_pool = ApiKeyPool(['only'], clock=FakeClock())
+    key_pool.retire('only')
+
+    with raises(NoApiKeysError):
+        key_pool.acquire()
+
+def test_persists_calls_of_each_key(tmp_path):
+    state_directory = str(tmp_path / 'calls')
+    clock = FakeClock()
+
+    key_pool = ApiKeyPool(['first', 'second'], calls_per_day=5,
+                          state_directory=state_directory, clock=clock)
+    for _ in range(3):
+        key_pool.acquire()
+
+    restarted_pool = ApiKeyPool(['first', 'second'], calls_per_day=5,
+                                state_directory=state_directory, clock=clock)
+
+    assert 2 == len(os.listdir(state_directory))
+    assert not any('first' in filename or 'second' in filename
+                   for filename in os.listdir(state_directory))
+    assert 'second' == restarted_pool.acquire()
+
+def test_moves_legacy_state_to_first_key(tmp_path):
+    state_directory = str(tmp_path / 'calls')
+    legacy_state = tmp_path / 'dark_sky_calls.json'
+    legacy_state.write_text('{"date": "2018-09-12", "calls": 4}')
+
+    key_pool = ApiKeyPool(['first', 'second'], calls_per_day=5,
+                          state_directory=state_directory, clock=FakeClock(),
+                          legacy_state_filename=str(legacy_state))
+
+    assert not legacy_state.exists()
+    assert ['second']*4 + ['first'] == [key_pool.acquire()
+                                        for _ in range(5)]
+
+def test_integration_retires_keys_dark_sky_rejects(stub_server, json_handler,
+                                                   monkeypatch):
+    class StubDarkSkyHandler(json_handler):
+        def do_GET(self):
+            if '/revoked_key/' in self.path:
+                self.send_json({'error': 'permission denied'}, status=403)
+            else:
+                self.send_json({'daily': {'data': [{'temperatureHigh': 80}]}})
+
+    monkeypatch.setattr(DarkSkyGateway, 'BASE_URL', stub_server(
+        StubDarkSkyHandler
+    ))
+    key_pool = ApiKeyPool(['revoked_key', 'valid_key'], clock=FakeClock())
+
+    weather_summary = key_pool.call(
+        DarkSkyGateway.fetch_weather_summary,
+        SubjectLocationSummary('904299266', -73.98859, 40.71567,
+                               date(1995, 6, 20))
+    )
+
+    assert 80 == weather_summary.max_temp
+    assert ['valid_key'] == key_pool.api_keys
+
+def test_integration_only_counts_calls_that_miss_the_cache(
+        stub_server, json_handler, monkeypatch, tmp_path):
+    class StubDarkSkyHandler(json_handler):
+        def do_GET(self):
+            self.send_json({'daily': {'data': [{'temperatureHigh': 80}]}})
+
+    monkeypatch.setattr(DarkSkyGateway, 'BASE_URL', stub_server(
+        StubDarkSkyHandler
+    ))
+    key_pool = ApiKeyPool(['only'], calls_per_day=5, clock=FakeClock())
+    cache = ResponseCache(str(tmp_path / 'cache'))
+    location = SubjectLocationSummary('904299266', -73.98859, 40.71567,
+                                      date(1995, 6, 20))
+
+    for _ in range(3):
+        weather_summary = DarkSkyGateway.fetch_weather_summary(
+            location,
+            cache=cache,
+            key_pool=key_pool
+        )
+
+    assert 80 == weather_summary.max_temp
+    assert 4 == key_pool._rate_controllers['only'].remaining_calls_today
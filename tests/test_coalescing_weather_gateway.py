@@ -0,0 +1,128 @@
+import threading
+from datetime import date
+from definitions import SubjectLocationSummary
+from gateways import CoalescingWeatherGateway
+
+class RecordingGateway:
+    """Fetches a fake weather summary, remembering every request."""
+    def __init__(self):
+        self.requests = []
+
+    def fetch_weather_summaries(self, subject_location_summaries):
+        for location in subject_location_summaries:
+            self.requests.append(location)
+            yield location, (location.longitude, location.latitude)
+
+def test_snaps_locations_to_cell_centres():
+    gateway = CoalescingWeatherGateway(None, cell_size=0.01)
+
+    cell = gateway._make_cell(SubjectLocationSummary(
+        '904299266',
+        -73.93524,
+        40.73061,
+        date(2018, 9, 12)
+    ))
+
+    assert SubjectLocationSummary(None, -73.94, 40.73, date(2018, 9, 12)) == cell
+
+def test_fetches_once_per_cell_and_day():
+    recording_gateway = RecordingGateway()
+    gateway = CoalescingWeatherGateway(
+        recording_gateway.fetch_weather_summaries,
+        cell_size=0.01
+    )
+
+    locations = [
+        SubjectLocationSummary('1', -73.93524, 40.73061, date(2018, 9, 12)),
+        SubjectLocationSummary('2', -73.93871, 40.73201, date(2018, 9, 12)),
+        SubjectLocationSummary('3', -73.93524, 40.73061, date(2018, 9, 13)),
+        SubjectLocationSummary('4', -73.98859, 40.71567, date(2018, 9, 12))
+    ]
+
+    results = dict(gateway.fetch_weather_summaries(locations))
+    later_results = dict(gateway.fetch_weather_summaries(locations[:1]))
+
+    assert 3 == len(recording_gateway.requests)
+    assert set(locations) == set(results)
+    assert results[locations[0]] == results[locations[1]] == (-73.94, 40.73)
+    assert results[locations[3]] == (-73.99, 40.72)
+    assert {locations[0]: (-73.94, 40.73)} == later_results
+
+def test_forgets_least_recently_used_cells():
+    recording_gateway = RecordingGateway()
+    gateway = CoalescingWeatherGateway(
+        recording_gateway.fetch_weather_summaries,
+        cell_size=0.01,
+        max_cells=2
+    )
+    first, second, third = [
+        SubjectLocationSummary(str(i), -73.93524 + i, 40.73061,
+                               date(2018, 9, 12))
+        for i in range(3)
+    ]
+
+    for locations in [[first, second], [first], [third], [first, second]]:
+        list(gateway.fetch_weather_summaries(locations))
+
+    assert [gateway._make_cell(location)
+            for location in [first, second, third, second]] == \
+        recording_gateway.requests
+    assert 2 == len(gateway._weather_summaries)
+
+class BlockedGateway:
+    """Fetches a fake weather summary once 'release' is set."""
+    def __init__(self):
+        self.release = threading.Event()
+
+    def fetch_weather_summaries(self, subject_location_summaries):
+        for location in subject_location_summaries:
+            self.release.wait()
+            yield location, (location.longitude, location.latitude)
+
+def test_yields_known_cells_while_new_ones_are_fetched():
+    blocked_gateway = BlockedGateway()
+    gateway = CoalescingWeatherGateway(
+        blocked_gateway.fetch_weather_summaries,
+        cell_size=0.01
+    )
+    known = SubjectLocationSummary('1', -73.93524, 40.73061, date(2018, 9, 12))
+    new = SubjectLocationSummary('2', -118.2437, 34.0522, date(2018, 9, 12))
+    blocked_gateway.release.set()
+    list(gateway.fetch_weather_summaries([known]))
+    blocked_gateway.release.clear()
+    read = []
+
+    def locations():
+        yield new
+        for subject_id in range(1000):
+            read.append(subject_id)
+            yield known._replace(subject_id=str(subject_id))
+
+    results = gateway.fetch_weather_summaries(locations())
+
+    assert (known._replace(subject_id='0'), (-73.94, 40.73)) == next(results)
+    assert 1 == len(read)
+    blocked_gateway.release.set()
+    assert 1000 == len(list(results))
+
+def test_stops_reading_while_too_many_locations_wait():
+    blocked_gateway = BlockedGateway()
+    gateway = CoalescingWeatherGateway(
+        blocked_gateway.fetch_weather_summaries,
+        cell_size=0.01,
+        max_waiting=10
+    )
+    read = []
+
+    def locations():
+        for subject_id in range(1000):
+            read.append(subject_id)
+            yield SubjectLocationSummary(str(subject_id), -73.93524, 40.73061,
+                                         date(2018, 9, 12))
+
+    threading.Timer(0.2, blocked_gateway.release.set).start()
+    results = gateway.fetch_weather_summaries(locations())
+
+    next(results)
+    assert 10 == len(read)
+    assert 999 == len(list(results))
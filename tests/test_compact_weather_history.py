@@ -0,0 +1,69 @@
+from datetime import date
+from compact_weather_history import compact_weather_history
+from definitions import SubjectLocationSummary
+from gateways import CsvGateway, ManifestGateway
+from weather_history import ProgressTracker
+
+HEADER = ('subject_id,longitude,latitude,date,mean_temp,max_temp,min_temp,'
+          'precipitation\n')
+
+def test_integration_refetches_quarantined_locations(tmp_path):
+    csv_filename = tmp_path / 'dark_sky_data.csv'
+    csv_filename.write_text(
+        HEADER +
+        '1,-118.2437,34.0522,1995-06-20,75.10,90.40,63.90,2.0000\n'
+        '2,-73.93524,40.73061,2018-09-12,70.00\n'
+    )
+    recorded = SubjectLocationSummary('1', -118.2437, 34.0522,
+                                      date(1995, 6, 20))
+    quarantined = SubjectLocationSummary('2', -73.93524, 40.73061,
+                                         date(2018, 9, 12))
+    manifest_filename = ManifestGateway.default_filename(str(csv_filename))
+    manifest = ManifestGateway(manifest_filename)
+    for location in [recorded, quarantined]:
+        manifest.record_location(location)
+    manifest.record_seeded()
+    manifest.flush()
+
+    compact_weather_history(str(csv_filename))
+
+    manifest = ManifestGateway(manifest_filename)
+    ProgressTracker(manifest).seed(CsvGateway(str(csv_filename)))
+    assert manifest.is_location_fetched(recorded)
+    assert not manifest.is_location_fetched(quarantined)
+
+def test_integration_keeps_manifest_when_nothing_is_quarantined(tmp_path):
+    csv_filename = tmp_path / 'dark_sky_data.csv'
+    csv_filename.write_text(
+        HEADER +
+        '1,-118.2437,34.0522,1995-06-20,75.10,90.40,63.90,2.0000\n'
+        '1,-118.2437,34.0522,1995-06-20,75.10,90.40,63.90,2.0000\n'
+    )
+    manifest_filename = ManifestGateway.default_filename(str(csv_filename))
+    manifest = ManifestGateway(manifest_filename)
+    manifest.record_seeded()
+    manifest.flush()
+
+    compact_weather_history(str(csv_filename))
+
+    assert ManifestGateway(manifest_filename).is_seeded
+
+def test_integration_refetches_locations_without_weather(tmp_path):
+    csv_filename = tmp_path / 'dark_sky_data.csv'
+    csv_filename.write_text(
+        HEADER + '2,-73.93524,40.73061,2018-09-12,,,,\n'
+    )
+    empty = SubjectLocationSummary('2', -73.93524, 40.73061,
+                                   date(2018, 9, 12))
+    manifest_filename = ManifestGateway.default_filename(str(csv_filename))
+    ProgressTracker(ManifestGateway(manifest_filename)).seed(
+        CsvGateway(str(csv_filename))
+    )
+
+    compact_weather_history(str(csv_filename))
+
+    csv_gateway = CsvGateway(str(csv_filename))
+    manifest = ManifestGateway(manifest_filename)
+    ProgressTracker(manifest).seed(csv_gateway)
+    assert [] == list(csv_gateway.fetch_all_weather_summaries())
+    assert not manifest.is_location_fetched(empty)
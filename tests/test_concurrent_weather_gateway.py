@@ -0,0 +1,83 @@
+import threading
+import time
+from datetime import date
+from functools import partial
+from pytest import fixture
+from definitions import SubjectLocationSummary
+from gateways import ConcurrentWeatherGateway, CsvGateway, DarkSkyGateway
+
+LATENCY = 0.05
+
+@fixture
+def stub_dark_sky(stub_server, json_handler, monkeypatch):
+    class StubDarkSkyHandler(json_handler):
+        """Answers every request like Dark Sky would, after LATENCY seconds."""
+        def do_GET(self):
+            time.sleep(LATENCY)
+            self.send_json({
+                'daily': {'data': [{'temperatureHigh': 80,
+                                    'temperatureLow': 60}]},
+                'hourly': {'data': [{
+                    'temperature': 70,
+                    'apparentTemperature': 72,
+                    'precipIntensity': 0.01
+                }]}
+            })
+
+    monkeypatch.setattr(
+        DarkSkyGateway,
+        'BASE_URL',
+        stub_server(StubDarkSkyHandler) + '/forecast'
+    )
+
+def make_locations(count):
+    return [SubjectLocationSummary(str(i), -73.9352, 40.7306, date(2018, 9, 12))
+            for i in range(count)]
+
+def test_fetches_every_location():
+    locations = make_locations(20)
+    gateway = ConcurrentWeatherGateway(lambda location: location.subject_id, 4)
+
+    results = list(gateway.fetch_weather_summaries(locations))
+
+    assert sorted(locations) == sorted(location for location, _ in results)
+    assert all(location.subject_id == summary for location, summary in results)
+
+def test_bounds_requests_in_flight():
+    lock = threading.Lock()
+    in_flight = [0]
+    most_in_flight = [0]
+
+    def fetch_weather_summary(location):
+        with lock:
+            in_flight[0] += 1
+            most_in_flight[0] = max(most_in_flight[0], in_flight[0])
+        time.sleep(0.01)
+        with lock:
+            in_flight[0] -= 1
+
+    gateway = ConcurrentWeatherGateway(fetch_weather_summary, 3)
+
+    list(gateway.fetch_weather_summaries(make_locations(20)))
+
+    assert 3 == most_in_flight[0]
+
+def test_integration_fetches_from_stub_dark_sky_into_csv(stub_dark_sky,
+                                                         tmp_path):
+    locations = make_locations(40)
+    csv_gateway = CsvGateway(str(tmp_path / 'csv_gateway.csv'))
+    gateway = ConcurrentWeatherGateway(
+        partial(DarkSkyGateway.fetch_weather_summary, api_key='fake_api_key'),
+        max_in_flight=10
+    )
+
+    start = time.monotonic()
+    with csv_gateway.batch_writer() as writer:
+        for location, weather_summary in gateway.fetch_weather_summaries(
+                locations):
+            writer.record_weather_summary(weather_summary, location)
+    elapsed = time.monotonic() - start
+
+    assert [] == csv_gateway.fetch_unrecorded_locations(locations)
+    assert 70 == csv_gateway.fetch_weather_summary(locations[0]).mean_temp
+    assert elapsed < len(locations) * LATENCY / 2
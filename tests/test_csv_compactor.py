@@ -0,0 +1,105 @@
+from datetime import date
+from pytest import raises
+from definitions import (ApproximateWeatherSummary, SubjectLocationSummary,
+                         WeatherSummary)
+from gateways import CsvCompactor, CsvGateway
+
+HEADER = ('subject_id,longitude,latitude,date,mean_temp,max_temp,min_temp,'
+          'precipitation\n')
+
+def test_integration_keeps_best_row_per_location(tmp_path):
+    filename = tmp_path / 'csv_gateway.csv'
+    filename.write_text(
+        HEADER +
+        '2,-73.93524,40.73061,2018-09-12,,,,\n'
+        '1,-118.2437,34.0522,1995-06-20,75.10,90.40,63.90,\n'
+        '2,-73.93524,40.73061,2018-09-12,70.00,80.00,60.00,0.0000\n'
+        '1,-118.24370,34.0522,1995-06-20,75.10,90.40,63.90,2.0000\n'
+        '1,-118.2437,34.0522,1995-06-20,12.00,14.00,10.00,0.0000\n'
+        '3,-73.98859,40.71567,2018-09-12,,,,\n'
+        '3,-73.98859,40.71567,2018-09-12,,,,\n'
+        '4,-73.98859,40.71567,not a date,1,2,3,4\n'
+        '4,-73.98859,40.71567,2018-09-12,1,2\n'
+    )
+
+    stats = CsvCompactor(str(filename)).compact()
+
+    assert HEADER + (
+        '1,-118.24370,34.0522,1995-06-20,75.10,90.40,63.90,2.0000\n'
+        '2,-73.93524,40.73061,2018-09-12,70.00,80.00,60.00,0.0000\n'
+    ) == filename.read_text()
+    assert {'rows': 9, 'kept': 2, 'duplicates': 4, 'empty': 1,
+            'invalid': 2} == stats
+    assert HEADER + (
+        '4,-73.98859,40.71567,not a date,1,2,3,4\n'
+        '4,-73.98859,40.71567,2018-09-12,1,2\n'
+    ) == (tmp_path / 'csv_gateway.csv.quarantine').read_text()
+    assert 2 == len(list(tmp_path.iterdir()))
+
+def test_integration_appends_to_quarantine(tmp_path):
+    filename = tmp_path / 'csv_gateway.csv'
+    for invalid_row in ['1,2\n', '3,4\n']:
+        filename.write_text(HEADER + invalid_row)
+        CsvCompactor(str(filename)).compact()
+
+    assert HEADER == filename.read_text()
+    assert HEADER + '1,2\n3,4\n' == \
+        (tmp_path / 'csv_gateway.csv.quarantine').read_text()
+
+def test_integration_compacts_with_many_runs(tmp_path):
+    filename = str(tmp_path / 'csv_gateway.csv')
+    csv_gateway = CsvGateway(filename)
+    locations = [
+        SubjectLocationSummary(str(subject_id), -73.93524, 40.73061,
+                               date(2018, 9, day))
+        for subject_id in range(10) for day in range(1, 21)
+    ]
+
+    with csv_gateway.batch_writer() as writer:
+        for repeat in range(3):
+            for location in reversed(locations):
+                writer.record_weather_summary(
+                    WeatherSummary(repeat, 2, 3, 4),
+                    location
+                )
+
+    stats = CsvCompactor(filename, max_memory_bytes=2000).compact()
+
+    assert 600 == stats['rows']
+    assert 200 == stats['kept']
+    assert sorted(locations) == [
+        location for location, _ in csv_gateway.fetch_all_weather_summaries()
+    ]
+    assert all(WeatherSummary(0, 2, 3, 4) == csv_gateway.fetch_weather_summary(
+        location
+    ) for location in locations)
+
+def test_integration_prefers_exact_weather(tmp_path):
+    filename = str(tmp_path / 'csv_gateway.csv')
+    csv_gateway = CsvGateway(filename)
+    location = SubjectLocationSummary('1', -73.93524, 40.73061,
+                                      date(2018, 9, 12))
+
+    csv_gateway.record_weather_summary(
+        ApproximateWeatherSummary(1, 2, 3, 4, distance_km=0.5),
+        location
+    )
+    csv_gateway.record_weather_summary(WeatherSummary(5, 6, 7, 8), location)
+    CsvCompactor(filename).compact()
+
+    assert WeatherSummary(5, 6, 7, 8) == \
+        CsvGateway(filename).fetch_weather_summary(location)
+
+def test_integration_leaves_file_alone_if_it_changes(tmp_path, monkeypatch):
+    filename = tmp_path / 'csv_gateway.csv'
+    contents = HEADER + '1,-118.2437,34.0522,1995-06-20,1,2,3,4\n'
+    filename.write_text(contents)
+    compactor = CsvCompactor(str(filename))
+    signatures = iter([(0, 0), (1, 1)])
+    monkeypatch.setattr(compactor, '_signature', lambda: next(signatures))
+
+    with raises(RuntimeError):
+        compactor.compact()
+
+    assert contents == filename.read_text()
+    assert 1 == len(list(tmp_path.iterdir()))
@@ -1,6 +1,8 @@
 from datetime import date
-from definitions import SubjectLocationSummary, WeatherSummary
+from definitions import (ApproximateWeatherSummary, SubjectLocationSummary,
+                         WeatherSummary)
 from gateways import CsvGateway
+from gateways import csv_gateway as csv_gateway_module
 
 def test_extracts_subject_location_summary():
     expected = SubjectLocationSummary(
@@ -29,7 +31,10 @@ def test_extracts_weather_summary():
         2,
         81.3,
         96.4,
-        63.4
+        63.4,
+        74.2,
+        8.35,
+        3
     )
 
     row = {
@@ -39,7 +44,10 @@ def test_extracts_weather_summary():
         'precipitation': expected.precipitation,
         'apparent_mean_temp': expected.apparent_mean_temp,
         'apparent_max_temp': expected.apparent_max_temp,
-        'apparent_min_temp': expected.apparent_min_temp
+        'apparent_min_temp': expected.apparent_min_temp,
+        'median_temp': '74.20',
+        'stddev_temp': '8.35',
+        'hours_above_threshold': '3'
     }
 
     actual = CsvGateway._extract_weather_summary(row)
@@ -102,6 +110,19 @@ def test_integration_records_weather_summary():
 
     assert expected_weather_summary == weather_summary
 
+def test_integration_records_hourly_statistics(tmp_path):
+    filename = str(tmp_path / 'csv_gateway.csv')
+    weather_summary = WeatherSummary(75.1, 90.4, 63.9, 2, median_temp=74.2,
+                                     stddev_temp=8.35, hours_above_threshold=3)
+    location = SubjectLocationSummary('904299266', -118.2437, 34.0522,
+                                      date(1995, 6, 20))
+
+    CsvGateway(filename).record_weather_summary(weather_summary, location)
+
+    assert weather_summary == CsvGateway(filename).fetch_weather_summary(
+        location
+    )
+
 def test_makes_row():
     expected_row = {
         'subject_id': '904299266',
@@ -114,7 +135,10 @@ def test_makes_row():
         'apparent_mean_temp': None,
         'apparent_max_temp': None,
         'apparent_min_temp': None,
-        'precipitation': '0.3300'
+        'precipitation': '0.3300',
+        'median_temp': None,
+        'stddev_temp': None,
+        'hours_above_threshold': None
     }
 
     weather_summary = WeatherSummary(
@@ -134,3 +158,224 @@ def test_makes_row():
     row = CsvGateway._make_row(weather_summary, subject_location_summary)
 
     assert expected_row == row
+
+def test_integration_indexed_lookup_returns_first_recorded_summary(tmp_path):
+    filename = str(tmp_path / 'csv_gateway.csv')
+    csv_gateway = CsvGateway(filename)
+
+    subject_location_summary = SubjectLocationSummary(
+        '904299266',
+        -118.2437,
+        34.0522,
+        date(1995, 6, 20)
+    )
+
+    first_weather_summary = WeatherSummary(75.1, 90.4, 63.9, 2)
+    second_weather_summary = WeatherSummary(12.0, 14.0, 10.0, 0)
+
+    assert csv_gateway.fetch_weather_summary(subject_location_summary) is None
+
+    csv_gateway.record_weather_summary(
+        first_weather_summary,
+        subject_location_summary
+    )
+    csv_gateway.record_weather_summary(
+        second_weather_summary,
+        subject_location_summary
+    )
+
+    indexed = csv_gateway.fetch_weather_summary(subject_location_summary)
+    scanned = CsvGateway(filename, indexed=False).fetch_weather_summary(
+        subject_location_summary
+    )
+
+    assert first_weather_summary == indexed
+    assert scanned == indexed
+
+def test_integration_index_reloads_when_file_changes(tmp_path):
+    filename = str(tmp_path / 'csv_gateway.csv')
+    csv_gateway = CsvGateway(filename)
+    other_csv_gateway = CsvGateway(filename)
+
+    subject_location_summary = SubjectLocationSummary(
+        '904299266',
+        -118.2437,
+        34.0522,
+        date(1995, 6, 20)
+    )
+
+    assert csv_gateway.fetch_weather_summary(subject_location_summary) is None
+
+    expected_weather_summary = WeatherSummary(75.1, 90.4, 63.9, 2)
+    other_csv_gateway.record_weather_summary(
+        expected_weather_summary,
+        subject_location_summary
+    )
+
+    weather_summary = csv_gateway.fetch_weather_summary(
+        subject_location_summary
+    )
+
+    assert expected_weather_summary == weather_summary
+
+def test_integration_fetches_unrecorded_locations(tmp_path):
+    csv_gateway = CsvGateway(str(tmp_path / 'csv_gateway.csv'))
+
+    recorded = SubjectLocationSummary(
+        '904299266',
+        -118.2437,
+        34.0522,
+        date(1995, 6, 20)
+    )
+    unrecorded = [
+        SubjectLocationSummary('11423412', -73.9352, 40.7306, date(2018, 9, 12)),
+        SubjectLocationSummary('98123345', -73.9352, 40.7306, date(2018, 9, 13))
+    ]
+
+    csv_gateway.record_weather_summary(
+        WeatherSummary(75.1, 90.4, 63.9, 2),
+        recorded
+    )
+
+    locations = [unrecorded[1], recorded, unrecorded[0]]
+
+    assert ([unrecorded[1], unrecorded[0]] ==
+            csv_gateway.fetch_unrecorded_locations(locations))
+
+def test_integration_batch_writer_records_weather_summaries(tmp_path):
+    csv_gateway = CsvGateway(str(tmp_path / 'csv_gateway.csv'))
+
+    locations = [
+        SubjectLocationSummary('904299266', -118.2437, 34.0522, date(1995, 6, d))
+        for d in range(1, 6)
+    ]
+    weather_summary = WeatherSummary(75.1, 90.4, 63.9, 2)
+
+    with csv_gateway.batch_writer(max_rows=2) as writer:
+        for location in locations:
+            writer.record_weather_summary(weather_summary, location)
+
+    assert all(csv_gateway.fetch_weather_summary(location) == weather_summary
+               for location in locations)
+
+def test_integration_batch_writer_flushes_old_rows_as_rows_arrive(
+        tmp_path, monkeypatch):
+    filename = tmp_path / 'csv_gateway.csv'
+    csv_gateway = CsvGateway(str(filename))
+    now = [0.0]
+    monkeypatch.setattr(csv_gateway_module.time, 'monotonic', lambda: now[0])
+    weather_summary = WeatherSummary(75.1, 90.4, 63.9, 2)
+
+    with csv_gateway.batch_writer(max_seconds=1.0) as writer:
+        writer.record_weather_summary(
+            weather_summary,
+            SubjectLocationSummary('1', -118.2437, 34.0522, date(1995, 6, 20))
+        )
+        now[0] = 10.0
+        assert 1 == len(filename.read_text().splitlines())
+
+        writer.record_weather_summary(
+            weather_summary,
+            SubjectLocationSummary('2', -118.2437, 34.0522, date(1995, 6, 20))
+        )
+        assert 3 == len(filename.read_text().splitlines())
+
+def test_integration_batch_writer_drops_partial_row(tmp_path):
+    filename = str(tmp_path / 'csv_gateway.csv')
+    csv_gateway = CsvGateway(filename)
+
+    recorded = SubjectLocationSummary(
+        '904299266',
+        -118.2437,
+        34.0522,
+        date(1995, 6, 20)
+    )
+    weather_summary = WeatherSummary(75.1, 90.4, 63.9, 2)
+
+    with open(filename, 'a') as csvfile:
+        csvfile.write('904299266,-118.2437,34.05')
+
+    with csv_gateway.batch_writer() as writer:
+        writer.record_weather_summary(weather_summary, recorded)
+
+    with open(filename) as csvfile:
+        assert 2 == len(csvfile.readlines())
+
+    assert weather_summary == csv_gateway.fetch_weather_summary(recorded)
+
+def test_integration_fetches_all_weather_summaries_from_older_files(tmp_path):
+    filename = tmp_path / 'csv_gateway.csv'
+    filename.write_text(
+        'subject_id,longitude,latitude,date,mean_temp,max_temp,min_temp,'
+        'precipitation\n'
+        '904299266,-118.2437,34.0522,1995-06-20,75.10,90.40,63.90,2.0000\n'
+    )
+
+    records = list(CsvGateway(str(filename)).fetch_all_weather_summaries())
+
+    assert [(
+        SubjectLocationSummary('904299266', -118.2437, 34.0522,
+                               date(1995, 6, 20)),
+        WeatherSummary(75.1, 90.4, 63.9, 2)
+    )] == records
+
+def test_integration_fetches_nearby_weather_summary(tmp_path):
+    csv_gateway = CsvGateway(str(tmp_path / 'csv_gateway.csv'))
+    recorded = SubjectLocationSummary('904299266', -73.93524, 40.73061,
+                                      date(2018, 9, 12))
+    nearby = SubjectLocationSummary('11423412', -73.9355, 40.7306,
+                                    date(2018, 9, 12))
+
+    assert csv_gateway.fetch_nearby_weather_summary(nearby, 1) is None
+
+    csv_gateway.record_weather_summary(WeatherSummary(75.1, 90.4, 63.9, 2),
+                                       recorded)
+    weather_summary = csv_gateway.fetch_nearby_weather_summary(nearby, 1)
+
+    assert isinstance(weather_summary, ApproximateWeatherSummary)
+    assert 75.1 == weather_summary.mean_temp
+    assert weather_summary.distance_km < 0.1
+    assert weather_summary == CsvGateway(
+        csv_gateway._filename,
+        indexed=False
+    ).fetch_nearby_weather_summary(nearby, 1)
+
+def test_integration_does_not_reuse_approximate_weather(tmp_path):
+    filename = str(tmp_path / 'csv_gateway.csv')
+    csv_gateway = CsvGateway(filename)
+    approximate = ApproximateWeatherSummary(75.1, 90.4, 63.9, 2,
+                                            distance_km=0.5)
+    location = SubjectLocationSummary('904299266', -73.93524, 40.73061,
+                                      date(2018, 9, 12))
+
+    csv_gateway.record_weather_summary(approximate, location)
+
+    assert approximate == CsvGateway(filename).fetch_weather_summary(location)
+    assert csv_gateway.fetch_nearby_weather_summary(location, 1) is None
+
+def test_integration_adds_new_columns_to_older_files(tmp_path):
+    filename = tmp_path / 'csv_gateway.csv'
+    filename.write_text(
+        'subject_id,longitude,latitude,date,mean_temp,max_temp,min_temp,'
+        'precipitation\n'
+        '904299266,-118.2437,34.0522,1995-06-20,75.10,90.40,63.90,2.0000\n'
+    )
+    recorded = SubjectLocationSummary('904299266', -118.2437, 34.0522,
+                                      date(1995, 6, 20))
+    approximated = SubjectLocationSummary('11423412', -118.2438, 34.0522,
+                                          date(1995, 6, 20))
+    approximate = ApproximateWeatherSummary(75.1, 90.4, 63.9, 2,
+                                            distance_km=0.009)
+
+    CsvGateway(str(filename)).record_weather_summary(approximate,
+                                                     approximated)
+
+    header = filename.read_text().splitlines()[0].split(',')
+    reopened = CsvGateway(str(filename))
+    nearby = reopened.fetch_nearby_weather_summary(approximated, 1)
+
+    assert 'source_distance_km' == header[-1]
+    assert WeatherSummary(75.1, 90.4, 63.9, 2) == \
+        reopened.fetch_weather_summary(recorded)
+    assert approximate == reopened.fetch_weather_summary(approximated)
+    assert 0 < nearby.distance_km
@@ -1,6 +1,7 @@
+import statistics
 from datetime import date
 from definitions import SubjectLocationSummary, WeatherSummary
-from gateways import DarkSkyGateway
+from gateways import DarkSkyGateway, ResponseCache
 
 def test_makes_request():
 
@@ -33,7 +34,10 @@ def test_plucks_response():
         precipitation=sum(precipitations),
         apparent_mean_temp=sum(apparent_temperatures)/len(apparent_temperatures),
         apparent_max_temp=47.0,
-        apparent_min_temp=11.8
+        apparent_min_temp=11.8,
+        median_temp=32.4,
+        stddev_temp=statistics.pstdev(temperatures),
+        hours_above_threshold=0
     )
 
     response = {
@@ -79,3 +83,148 @@ def test_handles_response_without_data():
     assert expected == weather_summary
 
     
+
+def test_makes_cache_key_without_api_key():
+    subject_location_summary = SubjectLocationSummary(
+        '904299266',
+        -73.98859,
+        40.71567,
+        date(1995, 6, 20)
+    )
+
+    cache_key = DarkSkyGateway._make_cache_key(subject_location_summary)
+
+    assert 'fake_api_key' not in cache_key
+    assert cache_key == DarkSkyGateway._make_cache_key(
+        subject_location_summary._replace(subject_id='11423412')
+    )
+
+def test_integration_fetches_through_cache(stub_server, json_handler,
+                                           monkeypatch, tmp_path):
+    requests_seen = []
+
+    class StubDarkSkyHandler(json_handler):
+        def do_GET(self):
+            requests_seen.append(self.path)
+            self.send_json({'daily': {'data': [{'temperatureHigh': 80}]}})
+
+    monkeypatch.setattr(DarkSkyGateway, 'BASE_URL', stub_server(
+        StubDarkSkyHandler
+    ))
+    cache = ResponseCache(str(tmp_path))
+    subject_location_summary = SubjectLocationSummary(
+        '904299266',
+        -73.98859,
+        40.71567,
+        date(1995, 6, 20)
+    )
+
+    summaries = [
+        DarkSkyGateway.fetch_weather_summary(
+            subject_location_summary,
+            'fake_api_key',
+            cache
+        ) for _ in range(2)
+    ]
+
+    assert 1 == len(requests_seen)
+    assert 80 == summaries[0].max_temp == summaries[1].max_temp
+    assert 1 == cache.hits
+
+def test_integration_only_waits_on_rate_controller_for_requests(
+        stub_server, json_handler, monkeypatch, tmp_path):
+    class StubDarkSkyHandler(json_handler):
+        def do_GET(self):
+            self.send_json({'daily': {'data': [{'temperatureHigh': 80}]}})
+
+    class CountingRateController:
+        calls = 0
+
+        def control_rate(self):
+            self.calls += 1
+
+    monkeypatch.setattr(DarkSkyGateway, 'BASE_URL', stub_server(
+        StubDarkSkyHandler
+    ))
+    cache = ResponseCache(str(tmp_path))
+    rate_controller = CountingRateController()
+    subject_location_summary = SubjectLocationSummary(
+        '904299266',
+        -73.98859,
+        40.71567,
+        date(1995, 6, 20)
+    )
+
+    for _ in range(3):
+        DarkSkyGateway.fetch_weather_summary(
+            subject_location_summary,
+            'fake_api_key',
+            cache,
+            rate_controller
+        )
+
+    assert 1 == rate_controller.calls
+
+def test_integration_plucks_cached_responses(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cached = SubjectLocationSummary('1', -73.98859, 40.71567, date(1995, 6, 20))
+    uncached = SubjectLocationSummary('2', -73.98859, 40.71567, date(1995, 6, 21))
+
+    cache.put(
+        DarkSkyGateway._make_cache_key(cached),
+        '{"daily": {"data": [{"temperatureHigh": 80}]}}'
+    )
+
+    results = list(DarkSkyGateway.pluck_cached_responses(
+        [cached, uncached],
+        str(tmp_path),
+        processes=2
+    ))
+
+    assert [cached, uncached] == [location for location, _ in results]
+    assert 80 == results[0][1].max_temp
+    assert results[1][1] is None
+
+def test_handles_missing_hours():
+    response = {
+        'hourly': {
+            'data': [
+                {'temperature': 23.1, 'apparentTemperature': 12.1},
+                {'temperature': 32.4, 'precipIntensity': 0.02}
+            ]
+        }
+    }
+
+    weather_summary = DarkSkyGateway._pluck_response(response)
+
+    assert (23.1 + 32.4)/2 == weather_summary.mean_temp
+    assert weather_summary.apparent_mean_temp is None
+    assert weather_summary.precipitation is None
+
+def test_plucks_hourly_statistics():
+    temperatures = [70.0, 90.0, 80.0, 84.0]
+    response = {
+        'hourly': {
+            'data': [{'temperature': temperature}
+                     for temperature in temperatures]
+        }
+    }
+
+    weather_summary = DarkSkyGateway._pluck_response(response)
+
+    assert 82.0 == weather_summary.median_temp
+    assert statistics.pstdev(temperatures) == weather_summary.stddev_temp
+    assert 2 == weather_summary.hours_above_threshold
+
+def test_omits_hourly_statistics_when_an_hour_is_missing():
+    response = {
+        'hourly': {
+            'data': [{'temperature': 70.0}, {'apparentTemperature': 72.0}]
+        }
+    }
+
+    weather_summary = DarkSkyGateway._pluck_response(response)
+
+    assert weather_summary.median_temp is None
+    assert weather_summary.stddev_temp is None
+    assert weather_summary.hours_above_threshold is None
@@ -0,0 +1,48 @@
+import os
+from gateways import DirectoryWatcher
+
+def test_integration_reports_settled_files(tmp_path):
+    watcher = DirectoryWatcher(str(tmp_path))
+    first = tmp_path / 'first_json.csv'
+    first.write_text('Data.Longitude')
+
+    assert [] == watcher.poll()
+    assert [str(first)] == watcher.poll()
+    assert [] == watcher.poll()
+
+def test_integration_waits_for_files_being_written(tmp_path):
+    watcher = DirectoryWatcher(str(tmp_path))
+    growing = tmp_path / 'growing_json.csv'
+
+    growing.write_text('Data.Longitude')
+    watcher.poll()
+    with open(str(growing), 'a') as growing_file:
+        growing_file.write(',Data.Latitude')
+
+    assert [] == watcher.poll()
+    assert [str(growing)] == watcher.poll()
+
+def test_integration_reports_changed_files(tmp_path):
+    watcher = DirectoryWatcher(str(tmp_path))
+    changed = tmp_path / 'changed_json.csv'
+    changed.write_text('Data.Longitude')
+    watcher.poll()
+    watcher.poll()
+
+    changed.write_text('Data.Longitude,Data.Latitude')
+    os.mkdir(str(tmp_path / 'directory'))
+
+    assert [] == watcher.poll()
+    assert [str(changed)] == watcher.poll()
+
+def test_integration_reports_forgotten_files_again(tmp_path):
+    watcher = DirectoryWatcher(str(tmp_path))
+    forgotten = tmp_path / 'forgotten_json.csv'
+    forgotten.write_text('Data.Longitude')
+    watcher.poll()
+    watcher.poll()
+
+    watcher.forget([str(forgotten)])
+
+    assert [] == watcher.poll()
+    assert [str(forgotten)] == watcher.poll()
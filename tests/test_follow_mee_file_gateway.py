@@ -66,3 +66,134 @@ def test_integration_extracts_subject_location_summary():
     actual = FollowMeeFileGateway.extract_subject_location_summary(filename)
 
     assert expected == actual
+
+def test_integration_reads_only_first_row(tmp_path):
+    filename = str(tmp_path / '98123345_follow_mee_integration_test.csv')
+
+    row = b'-73.935242,40.730610,2018-09-12T22:41:57-04:00\n'
+
+    with open(filename, 'wb') as follow_mee_file:
+        follow_mee_file.write(b'Data.Longitude,Data.Latitude,Data.Date\n')
+        follow_mee_file.write(row*2000)
+        follow_mee_file.write(b'\xff\xfe undecodable trailing data\n')
+
+    actual = FollowMeeFileGateway.extract_subject_location_summary(filename)
+
+    assert date(2018, 9, 12) == actual.date
+
+def test_integration_handles_file_without_rows(tmp_path, capsys):
+    filename = str(tmp_path / '98123345_follow_mee_integration_test.csv')
+
+    with open(filename, 'w') as follow_mee_file:
+        follow_mee_file.write('Data.Longitude,Data.Latitude,Data.Date\n')
+
+    assert FollowMeeFileGateway.extract_subject_location_summary(filename) is None
+    assert 'Invalid data in {}\n'.format(filename) == capsys.readouterr().out
+
+@mark.parametrize('processes', [1, 2])
+def test_integration_ingests_directory_in_order(tmp_path, capsys, processes):
+    subject_ids = ['{:05d}'.format(i) for i in range(25)]
+
+    for subject_id in reversed(subject_ids):
+        filename = tmp_path / '{}_2018-09-12_json.csv'.format(subject_id)
+        filename.write_text(
+            'Data.Longitude,Data.Latitude,Data.Date\n'
+            '-73.935242,40.730610,2018-09-12T22:41:57-04:00\n'
+        )
+
+    invalid_filename = tmp_path / '00010_invalid_json.csv'
+    invalid_filename.write_text('Data.Longitude,Data.Latitude\n1.0,2.0\n')
+
+    summaries = list(FollowMeeFileGateway.ingest_directory(
+        str(tmp_path),
+        processes=processes,
+        chunksize=4
+    ))
+
+    assert subject_ids == [summary.subject_id for summary in summaries]
+    assert ('Invalid data in {}\n'.format(invalid_filename) ==
+            capsys.readouterr().out)
+
+def write_trace(tmp_path, rows):
+    filename = tmp_path / '98123345_2018-09-12_json.csv'
+    with open(str(filename), 'w') as follow_mee_file:
+        writer = csv.writer(follow_mee_file)
+        writer.writerow(['Data.Longitude', 'Data.Latitude', 'Data.Date'])
+        writer.writerows(rows)
+    return str(filename)
+
+def test_integration_extracts_distinct_trace_locations_per_day(tmp_path):
+    filename = write_trace(tmp_path, [
+        [-73.93524, 40.73061, '2018-09-12T08:00:00-04:00'],
+        [-73.93521, 40.73059, '2018-09-12T09:00:00-04:00'],
+        [-73.98859, 40.71567, '2018-09-12T10:00:00-04:00'],
+        ['', 40.71567, '2018-09-12T11:00:00-04:00'],
+        [-73.93524, 40.73061, '2018-09-13T08:00:00-04:00']
+    ])
+
+    summaries = list(FollowMeeFileGateway.extract_trace_location_summaries(
+        filename,
+        precision=3
+    ))
+
+    assert [
+        SubjectLocationSummary('98123345', -73.935, 40.731, date(2018, 9, 12)),
+        SubjectLocationSummary('98123345', -73.989, 40.716, date(2018, 9, 12)),
+        SubjectLocationSummary('98123345', -73.935, 40.731, date(2018, 9, 13))
+    ] == summaries
+
+def test_integration_extracts_trace_centroid_per_day(tmp_path):
+    filename = write_trace(tmp_path, [
+        [-74.0, 40.0, '2018-09-12T08:00:00-04:00'],
+        [-73.0, 41.0, '2018-09-12T09:00:00-04:00'],
+        [-72.0, 42.0, '2018-09-13T08:00:00-04:00']
+    ])
+
+    summaries = list(FollowMeeFileGateway.extract_trace_location_summaries(
+        filename,
+        centroid=True
+    ))
+
+    assert [
+        SubjectLocationSummary('98123345', -73.5, 40.5, date(2018, 9, 12)),
+        SubjectLocationSummary('98123345', -72.0, 42.0, date(2018, 9, 13))
+    ] == summaries
+
+def test_integration_reports_malformed_and_unreadable_files(tmp_path):
+    malformed = tmp_path / '98123345_malformed_json.csv'
+    malformed.write_text('Data.Longitude,Data.Latitude,Data.Date\n'
+                         'east,40.730610,2018-09-12T22:41:57-04:00\n')
+    unreadable = tmp_path / '98123345_unreadable_json.csv'
+    unreadable.mkdir()
+
+    results = list(FollowMeeFileGateway.extract_file_subject_location_summaries(
+        [str(malformed), str(unreadable)],
+        processes=1
+    ))
+
+    assert [(str(malformed), None)] == results
+
+def test_integration_reports_truncated_rows_as_invalid(tmp_path, capsys):
+    truncated = tmp_path / '98123345_truncated_json.csv'
+    truncated.write_text('Data.Longitude,Data.Latitude,Data.Date\n'
+                         '-73.935242,40.73')
+
+    summaries = list(FollowMeeFileGateway.extract_subject_location_summaries(
+        [str(truncated)],
+        processes=1
+    ))
+
+    assert [] == summaries
+    assert 'Invalid data in {}\n'.format(truncated) == capsys.readouterr().out
+
+def test_integration_skips_truncated_trace_rows(tmp_path):
+    filename = tmp_path / '98123345_2018-09-12_json.csv'
+    filename.write_text('Data.Longitude,Data.Latitude,Data.Date\n'
+                        '-73.93524,40.73061,2018-09-12T08:00:00-04:00\n'
+                        '-73.98859\n')
+
+    assert [
+        SubjectLocationSummary('98123345', -73.935, 40.731, date(2018, 9, 12))
+    ] == list(FollowMeeFileGateway.extract_trace_location_summaries(
+        str(filename)
+    ))
@@ -0,0 +1,58 @@
+import time
+from pytest import raises
+from requests.exceptions import ConnectionError, RetryError
+from gateways import http_session
+
+def test_retries_server_errors(stub_server, json_handler):
+    requests_seen = []
+
+    class FlakyHandler(json_handler):
+        def do_GET(self):
+            requests_seen.append(self.path)
+            if len(requests_seen) < 3:
+                self.send_json({'error': 'unavailable'}, status=503)
+            else:
+                self.send_json({'ok': True})
+
+    url = stub_server(FlakyHandler)
+    session = http_session.make_session(retries=3, backoff_factor=0)
+
+    assert {'ok': True} == session.get(url).json()
+    assert 3 == len(requests_seen)
+
+def test_gives_up_after_retries(stub_server, json_handler):
+    class RateLimitedHandler(json_handler):
+        def do_GET(self):
+            self.send_json({'error': 'slow down'}, status=429)
+
+    url = stub_server(RateLimitedHandler)
+    session = http_session.make_session(retries=1, backoff_factor=0)
+
+    with raises(RetryError):
+        session.get(url)
+
+def test_applies_default_timeout(stub_server, json_handler):
+    class SlowHandler(json_handler):
+        def do_GET(self):
+            time.sleep(0.5)
+            self.send_json({'ok': True})
+
+    url = stub_server(SlowHandler)
+    session = http_session.make_session(timeout=0.1, retries=0)
+
+    with raises(ConnectionError):
+        session.get(url)
+
+def test_reuses_connections(stub_server, json_handler):
+    class KeepAliveHandler(json_handler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            self.send_json({'port': self.client_address[1]})
+
+    url = stub_server(KeepAliveHandler)
+    session = http_session.make_session(pool_size=1)
+
+    ports = {session.get(url).json()['port'] for _ in range(5)}
+
+    assert 1 == len(ports)
@@ -0,0 +1,79 @@
+from datetime import date
+from definitions import SubjectLocationSummary
+from gateways import ManifestGateway
+
+def test_integration_records_progress(tmp_path):
+    filename = str(tmp_path / 'manifest.jsonl')
+    location = SubjectLocationSummary('904299266', -118.2437, 34.0522,
+                                      date(1995, 6, 20))
+
+    manifest = ManifestGateway(filename)
+    manifest.record_file('/data/904299266_json.csv', (1234, 56))
+    manifest.record_location(location)
+    manifest.flush()
+
+    manifest = ManifestGateway(filename)
+
+    assert manifest.is_file_processed('/data/904299266_json.csv', (1234, 56))
+    assert not manifest.is_file_processed('/data/904299266_json.csv', (1234, 57))
+    assert manifest.is_location_fetched(location)
+
+def test_integration_forgets_unflushed_progress(tmp_path):
+    filename = str(tmp_path / 'manifest.jsonl')
+
+    manifest = ManifestGateway(filename)
+    manifest.record_file('/data/904299266_json.csv', (1234, 56))
+
+    assert not ManifestGateway(filename).is_file_processed(
+        '/data/904299266_json.csv',
+        (1234, 56)
+    )
+
+def test_integration_discards_partial_line(tmp_path):
+    filename = tmp_path / 'manifest.jsonl'
+    filename.write_text(
+        '{"file": "/data/a.csv", "mtime_ns": 1, "size": 2}\n'
+        '{"file": "/data/b.csv", "mtime'
+    )
+
+    manifest = ManifestGateway(str(filename))
+    manifest.record_file('/data/c.csv', (3, 4))
+    manifest.flush()
+
+    manifest = ManifestGateway(str(filename))
+
+    assert manifest.is_file_processed('/data/a.csv', (1, 2))
+    assert manifest.is_file_processed('/data/c.csv', (3, 4))
+
+def test_integration_records_seeding(tmp_path):
+    filename = str(tmp_path / 'manifest.jsonl')
+
+    manifest = ManifestGateway(filename)
+    manifest.record_seeded()
+    manifest.flush()
+
+    assert not ManifestGateway(str(tmp_path / 'other.jsonl')).is_seeded
+    assert ManifestGateway(filename).is_seeded
+
+def test_integration_keeps_each_location_once(tmp_path):
+    filename = str(tmp_path / 'manifest.jsonl')
+    location = SubjectLocationSummary('904299266', -118.2437, 34.0522,
+                                      date(1995, 6, 20))
+
+    manifest = ManifestGateway(filename)
+    manifest.record_location(location)
+    manifest.record_location(location)
+    manifest.flush()
+
+    manifest = ManifestGateway(filename)
+
+    assert [location] == list(manifest._locations)
+    assert not manifest.is_location_fetched(location._replace(latitude=34.05))
+
+def test_defaults_to_a_manifest_per_store():
+    assert 'a.csv.manifest.jsonl' == ManifestGateway.default_filename('a.csv')
+    assert 'b.csv.manifest.jsonl' == ManifestGateway.default_filename('b.csv')
+    assert 'shards/manifest.jsonl' == ManifestGateway.default_filename(
+        'a.csv',
+        'shards'
+    )
@@ -0,0 +1,87 @@
+import json
+from metrics import MetricsRegistry, MetricsReporter, call_timed
+
+def test_updates_are_ignored_until_enabled():
+    registry = MetricsRegistry()
+    counter = registry.counter('calls_total', 'Calls.')
+    histogram = registry.histogram('call_seconds', 'Call seconds.')
+
+    counter.inc()
+    histogram.observe(1.0)
+    with histogram.time():
+        pass
+
+    assert 0 == counter.value
+    assert 0 == histogram.count
+
+def test_counts_and_buckets_observations():
+    registry = MetricsRegistry()
+    registry.enabled = True
+    counter = registry.counter('calls_total', 'Calls.')
+    histogram = registry.histogram('call_seconds', 'Call seconds.',
+                                   buckets=(0.1, 1.0))
+
+    counter.inc()
+    counter.inc(2)
+    for value in [0.05, 0.1, 0.5, 5.0]:
+        histogram.observe(value)
+
+    snapshot = registry.snapshot()
+    assert 3 == snapshot['counters']['calls_total']
+    assert {
+        'count': 4,
+        'sum': 5.65,
+        'mean': 5.65/4,
+        'buckets': {'0.1': 2, '1.0': 3, '+Inf': 4}
+    } == snapshot['histograms']['call_seconds']
+
+def test_returns_the_same_metric_for_the_same_name():
+    registry = MetricsRegistry()
+
+    assert (registry.counter('calls_total', 'Calls.') is
+            registry.counter('calls_total', 'Calls.'))
+
+def test_formats_prometheus_text():
+    registry = MetricsRegistry()
+    registry.enabled = True
+    registry.counter('calls_total', 'Calls.').inc()
+    registry.histogram('call_seconds', 'Call seconds.',
+                       buckets=(1.0,)).observe(0.5)
+
+    assert (
+        '# HELP call_seconds Call seconds.\n'
+        '# TYPE call_seconds histogram\n'
+        'call_seconds_bucket{le="1.0"} 1\n'
+        'call_seconds_bucket{le="+Inf"} 1\n'
+        'call_seconds_sum 0.5\n'
+        'call_seconds_count 1\n'
+        '# HELP calls_total Calls.\n'
+        '# TYPE calls_total counter\n'
+        'calls_total 1\n'
+    ) == registry.to_prometheus()
+
+def test_reporter_writes_final_report_on_stop(tmp_path):
+    registry = MetricsRegistry()
+    counter = registry.counter('calls_total', 'Calls.')
+    json_filename = str(tmp_path / 'metrics.jsonl')
+    prometheus_filename = str(tmp_path / 'metrics.prom')
+
+    with MetricsReporter(registry, json_filename, prometheus_filename,
+                         interval=60):
+        counter.inc()
+
+    with open(json_filename) as json_file:
+        snapshots = [json.loads(line) for line in json_file]
+    with open(prometheus_filename) as prometheus_file:
+        prometheus_text = prometheus_file.read()
+
+    assert 1 == len(snapshots)
+    assert 1 == snapshots[0]['counters']['calls_total']
+    assert 'calls_total 1\n' in prometheus_text
+    assert not registry.enabled
+
+def test_call_timed_returns_result_and_seconds():
+    result, seconds = call_timed(sum, [1, 2])
+
+    assert 3 == result
+    assert 0 <= seconds
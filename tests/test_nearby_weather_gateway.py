@@ -0,0 +1,71 @@
+import threading
+from datetime import date
+from definitions import (ApproximateWeatherSummary, SubjectLocationSummary,
+                         WeatherSummary)
+from gateways import CsvGateway, NearbyWeatherGateway
+
+class RecordingGateway:
+    """Fetches a fake weather summary, remembering every request."""
+    def __init__(self):
+        self.requests = []
+
+    def fetch_weather_summaries(self, subject_location_summaries):
+        for location in subject_location_summaries:
+            self.requests.append(location)
+            yield location, WeatherSummary(70, 80, 60, 0)
+
+def test_integration_reuses_weather_recorded_nearby(tmp_path):
+    csv_gateway = CsvGateway(str(tmp_path / 'csv_gateway.csv'))
+    csv_gateway.record_weather_summary(
+        WeatherSummary(75.1, 90.4, 63.9, 2),
+        SubjectLocationSummary('1', -73.93524, 40.73061, date(2018, 9, 12))
+    )
+    recording_gateway = RecordingGateway()
+    gateway = NearbyWeatherGateway(
+        csv_gateway,
+        recording_gateway.fetch_weather_summaries,
+        max_distance_km=1
+    )
+
+    nearby = SubjectLocationSummary('2', -73.9355, 40.7306, date(2018, 9, 12))
+    far = SubjectLocationSummary('3', -73.98859, 40.71567, date(2018, 9, 12))
+    results = dict(gateway.fetch_weather_summaries([nearby, far]))
+
+    assert [far] == recording_gateway.requests
+    assert isinstance(results[nearby], ApproximateWeatherSummary)
+    assert 75.1 == results[nearby].mean_temp
+    assert WeatherSummary(70, 80, 60, 0) == results[far]
+
+def test_integration_yields_reused_weather_while_fetching(tmp_path):
+    csv_gateway = CsvGateway(str(tmp_path / 'csv_gateway.csv'))
+    csv_gateway.record_weather_summary(
+        WeatherSummary(75.1, 90.4, 63.9, 2),
+        SubjectLocationSummary('1', -73.93524, 40.73061, date(2018, 9, 12))
+    )
+    release = threading.Event()
+
+    def fetch_weather_summaries(locations):
+        for location in locations:
+            release.wait()
+            yield location, WeatherSummary(70, 80, 60, 0)
+
+    gateway = NearbyWeatherGateway(csv_gateway, fetch_weather_summaries,
+                                   max_distance_km=1)
+    far = SubjectLocationSummary('2', -73.98859, 40.71567, date(2018, 9, 12))
+    read = []
+
+    def locations():
+        yield far
+        for subject_id in range(100):
+            read.append(subject_id)
+            yield SubjectLocationSummary(str(subject_id), -73.9355, 40.7306,
+                                         date(2018, 9, 12))
+
+    results = gateway.fetch_weather_summaries(locations())
+
+    location, weather_summary = next(results)
+    assert '0' == location.subject_id
+    assert isinstance(weather_summary, ApproximateWeatherSummary)
+    assert 1 == len(read)
+    release.set()
+    assert (far, WeatherSummary(70, 80, 60, 0)) in list(results)
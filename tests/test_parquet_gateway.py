@@ -0,0 +1,126 @@
+from datetime import date
+from pytest import importorskip
+from definitions import (ApproximateWeatherSummary, SubjectLocationSummary,
+                         WeatherSummary)
+from gateways import ParquetGateway
+
+pyarrow = importorskip('pyarrow')
+
+def make_location(subject_id='904299266', day=20):
+    return SubjectLocationSummary(subject_id, -118.2437, 34.0522,
+                                  date(1995, 6, day))
+
+def test_makes_row_with_nulls():
+    row = ParquetGateway._make_row(
+        WeatherSummary(75.1, 90.4, 63.9, 2),
+        make_location()
+    )
+
+    assert 2.0 == row['precipitation']
+    assert row['apparent_mean_temp'] is None
+    assert date(1995, 6, 20) == row['date']
+
+def test_integration_records_weather_summary(tmp_path):
+    expected = WeatherSummary(75.1, 90.4, 63.9, 2, 81.3, 96.4, None)
+
+    with ParquetGateway(str(tmp_path)) as parquet_gateway:
+        parquet_gateway.record_weather_summary(expected, make_location())
+
+        assert expected == parquet_gateway.fetch_weather_summary(
+            make_location()
+        )
+
+    parquet_gateway = ParquetGateway(str(tmp_path))
+
+    assert expected == parquet_gateway.fetch_weather_summary(make_location())
+    assert parquet_gateway.fetch_weather_summary(make_location(day=21)) is None
+
+def test_integration_appends_row_groups(tmp_path):
+    parquet_gateway = ParquetGateway(str(tmp_path), row_group_size=2)
+    locations = [make_location(str(i)) for i in range(5)]
+
+    with parquet_gateway:
+        for index, location in enumerate(locations):
+            parquet_gateway.record_weather_summary(
+                WeatherSummary(index, index, index, index),
+                location
+            )
+
+    assert 3 == len(parquet_gateway._part_filenames())
+    assert ([(location, WeatherSummary(index, index, index, index))
+             for index, location in enumerate(locations)] ==
+            list(parquet_gateway.fetch_all_weather_summaries()))
+    assert 3.0 == parquet_gateway.fetch_weather_summary(locations[3]).mean_temp
+
+def test_integration_fetches_unrecorded_locations(tmp_path):
+    parquet_gateway = ParquetGateway(str(tmp_path))
+
+    with parquet_gateway:
+        parquet_gateway.record_weather_summary(
+            WeatherSummary(75.1, 90.4, 63.9, 2),
+            make_location()
+        )
+
+    locations = [make_location(day=21), make_location(), make_location('1')]
+
+    assert ([make_location(day=21), make_location('1')] ==
+            parquet_gateway.fetch_unrecorded_locations(locations))
+
+def test_integration_shares_dataset_between_writers(tmp_path):
+    first_gateway = ParquetGateway(str(tmp_path))
+    second_gateway = ParquetGateway(str(tmp_path))
+    locations = [make_location(str(i)) for i in range(4)]
+
+    for index, location in enumerate(locations):
+        gateway = second_gateway if index % 2 else first_gateway
+        gateway.record_weather_summary(
+            WeatherSummary(index, index, index, index),
+            location
+        )
+        gateway.flush()
+
+    assert 4 == len(first_gateway._part_filenames())
+    assert locations == [location for location, _ in
+                         second_gateway.fetch_all_weather_summaries()]
+
+def test_integration_records_every_weather_field(tmp_path):
+    exact = WeatherSummary(75.1, 90.4, 63.9, 2, 81.3, 96.4, 60.2, 74.0, 6.5,
+                           9)
+    approximate = ApproximateWeatherSummary(75.1, 90.4, 63.9, 2, 81.3, 96.4,
+                                            60.2, 74.0, 6.5, 9,
+                                            distance_km=0.4)
+
+    with ParquetGateway(str(tmp_path)) as parquet_gateway:
+        parquet_gateway.record_weather_summary(exact, make_location())
+        parquet_gateway.record_weather_summary(approximate, make_location('1'))
+
+    parquet_gateway = ParquetGateway(str(tmp_path))
+
+    assert [(make_location(), exact), (make_location('1'), approximate)] == \
+        list(parquet_gateway.fetch_all_weather_summaries())
+    assert approximate == parquet_gateway.fetch_weather_summary(
+        make_location('1')
+    )
+
+def test_integration_reads_files_written_before_new_columns(tmp_path):
+    pyarrow.parquet.write_table(
+        pyarrow.Table.from_pylist([{
+            'subject_id': '904299266', 'longitude': -118.2437,
+            'latitude': 34.0522, 'date': date(1995, 6, 20), 'mean_temp': 75.1,
+            'max_temp': 90.4, 'min_temp': 63.9, 'apparent_mean_temp': None,
+            'apparent_max_temp': None, 'apparent_min_temp': None,
+            'precipitation': 2.0
+        }]),
+        str(tmp_path / 'part-00000000000000000000-old.parquet')
+    )
+    expected = WeatherSummary(70, 80, 60, 0, median_temp=71.0,
+                              stddev_temp=4.5, hours_above_threshold=3)
+
+    with ParquetGateway(str(tmp_path)) as parquet_gateway:
+        parquet_gateway.record_weather_summary(expected, make_location('1'))
+
+    assert WeatherSummary(75.1, 90.4, 63.9, 2) == \
+        parquet_gateway.fetch_weather_summary(make_location())
+    assert [(make_location(), WeatherSummary(75.1, 90.4, 63.9, 2)),
+            (make_location('1'), expected)] == \
+        list(parquet_gateway.fetch_all_weather_summaries())
@@ -0,0 +1,81 @@
+import asyncio
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from pytest import approx
+from rate_controller import RateController
+
+class FakeClock:
+    def __init__(self, timestamp):
+        self.timestamp = timestamp
+
+    def __call__(self):
+        return self.timestamp
+
+def make_clock(hour=12):
+    return FakeClock(datetime(
+        2018, 9, 12, hour, tzinfo=ZoneInfo('America/New_York')
+    ).timestamp())
+
+def test_allows_burst_without_waiting():
+    rate_controller = RateController(calls_per_minute=10, burst=3,
+                                     clock=make_clock())
+
+    waits = [rate_controller._reserve() for _ in range(4)]
+
+    assert [0, 0, 0] == waits[:3]
+    assert 6 == waits[3]
+
+def test_refills_tokens_over_time():
+    clock = make_clock()
+    rate_controller = RateController(calls_per_minute=10, clock=clock)
+
+    assert 0 == rate_controller._reserve()
+    clock.timestamp += 4
+    assert approx(2) == rate_controller._reserve()
+    clock.timestamp += 2
+    assert 0 == rate_controller._reserve()
+
+def test_waits_until_midnight_when_daily_budget_is_spent():
+    rate_controller = RateController(calls_per_minute=None, calls_per_day=2,
+                                     clock=make_clock(hour=22))
+
+    assert 0 == rate_controller._reserve()
+    assert 0 == rate_controller._reserve()
+    assert 2*60*60 == rate_controller._reserve()
+
+def test_resets_daily_budget_at_midnight():
+    clock = make_clock(hour=23)
+    rate_controller = RateController(calls_per_minute=None, calls_per_day=1,
+                                     clock=clock)
+
+    assert 0 == rate_controller._reserve()
+    assert 0 < rate_controller._reserve()
+    clock.timestamp += 60*60
+    assert 0 == rate_controller._reserve()
+
+def test_persists_calls_today(tmp_path):
+    state_filename = str(tmp_path / 'calls.json')
+    clock = make_clock()
+
+    rate_controller = RateController(calls_per_minute=None, calls_per_day=5,
+                                     state_filename=state_filename,
+                                     clock=clock)
+    for _ in range(3):
+        rate_controller.control_rate()
+
+    restarted = RateController(calls_per_minute=None, calls_per_day=5,
+                               state_filename=state_filename, clock=clock)
+
+    assert 3 == restarted.calls_today
+    assert 2 == restarted.remaining_calls_today
+
+def test_controls_rate_without_blocking_event_loop():
+    rate_controller = RateController(calls_per_minute=6000, calls_per_day=None)
+
+    async def make_calls():
+        await asyncio.gather(*[rate_controller.control_rate_async()
+                               for _ in range(5)])
+
+    asyncio.run(make_calls())
+
+    assert 5 == rate_controller.calls_today
@@ -0,0 +1,92 @@
+from datetime import date
+from functools import partial
+from definitions import (ApproximateWeatherSummary, SubjectLocationSummary,
+                         WeatherSummary)
+from gateways import (CoalescingWeatherGateway, ConcurrentWeatherGateway,
+                      CsvGateway, DarkSkyGateway, ResponseCache)
+from repluck_weather_history import repluck_weather_history
+
+def test_integration_replucks_coalesced_rows_from_fetched_cache(
+        stub_server, json_handler, monkeypatch, tmp_path):
+    class StubDarkSkyHandler(json_handler):
+        def do_GET(self):
+            self.send_json({
+                'daily': {'data': [{'temperatureHigh': 90.0}]},
+                'hourly': {'data': [{'temperature': temperature}
+                                    for temperature in [70.0, 82.0, 84.0]]}
+            })
+
+    monkeypatch.setattr(DarkSkyGateway, 'BASE_URL', stub_server(
+        StubDarkSkyHandler
+    ))
+    cache_directory = str(tmp_path / 'cache')
+    csv_filename = str(tmp_path / 'dark_sky_data.csv')
+    locations = [
+        SubjectLocationSummary('1', -73.93524, 40.73061, date(2018, 9, 12)),
+        SubjectLocationSummary('2', -73.93871, 40.73201, date(2018, 9, 12))
+    ]
+    uncached = SubjectLocationSummary('3', -118.2437, 34.0522,
+                                      date(2018, 9, 12))
+    approximate = ApproximateWeatherSummary(75.0, 90.0, 60.0, 0.0,
+                                            distance_km=0.4)
+
+    concurrentGateway = ConcurrentWeatherGateway(partial(
+        DarkSkyGateway.fetch_weather_summary,
+        api_key='fake_api_key',
+        cache=ResponseCache(cache_directory)
+    ))
+    coalescingGateway = CoalescingWeatherGateway(
+        concurrentGateway.fetch_weather_summaries,
+        cell_size=0.01
+    )
+
+    csvGateway = CsvGateway(csv_filename)
+    for location, weather_summary in coalescingGateway.fetch_weather_summaries(
+            locations):
+        csvGateway.record_weather_summary(
+            WeatherSummary(weather_summary.mean_temp, weather_summary.max_temp,
+                           weather_summary.min_temp,
+                           weather_summary.precipitation),
+            location
+        )
+    csvGateway.record_weather_summary(WeatherSummary(1.0, 2.0, 0.0, 0.0),
+                                      uncached)
+    csvGateway.record_weather_summary(
+        approximate,
+        SubjectLocationSummary('4', -73.93525, 40.73061, date(2018, 9, 12))
+    )
+
+    counts = repluck_weather_history(csv_filename, cache_directory,
+                                     processes=1, cell_size=0.01)
+
+    replucked = dict(CsvGateway(csv_filename).fetch_all_weather_summaries())
+
+    assert {'replucked': 2, 'missing': 1, 'approximate': 1} == counts
+    assert 4 == len(replucked)
+    for location in locations:
+        assert 82.0 == replucked[location].median_temp
+        assert 2 == replucked[location].hours_above_threshold
+        assert 90.0 == replucked[location].max_temp
+    assert WeatherSummary(1.0, 2.0, 0.0, 0.0) == replucked[uncached]
+    assert approximate in replucked.values()
+
+def test_integration_finds_only_own_responses_without_cell_size(tmp_path):
+    cache_directory = str(tmp_path / 'cache')
+    csv_filename = str(tmp_path / 'dark_sky_data.csv')
+    location = SubjectLocationSummary('1', -73.93524, 40.73061,
+                                      date(2018, 9, 12))
+    ResponseCache(cache_directory).put(
+        DarkSkyGateway._make_cache_key(
+            CoalescingWeatherGateway.make_cell(location, 0.01)
+        ),
+        '{"daily": {"data": [{"temperatureHigh": 90.0}]}}'
+    )
+    CsvGateway(csv_filename).record_weather_summary(
+        WeatherSummary(1.0, 2.0, 0.0, 0.0),
+        location
+    )
+
+    counts = repluck_weather_history(csv_filename, cache_directory,
+                                     processes=1)
+
+    assert {'replucked': 0, 'missing': 1, 'approximate': 0} == counts
@@ -0,0 +1,38 @@
+from gateways import ResponseCache
+
+def test_integration_caches_responses(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+
+    assert cache.get('request') is None
+
+    cache.put('request', '{"hourly": {}}')
+
+    assert '{"hourly": {}}' == cache.get('request')
+    assert 1 == cache.hits
+    assert 1 == cache.misses
+
+def test_integration_persists_responses(tmp_path):
+    ResponseCache(str(tmp_path)).put('request', 'response')
+
+    cache = ResponseCache(str(tmp_path))
+
+    assert 'response' == cache.get('request')
+    assert ['request'] == list(cache.requests())
+    assert 'response' == ResponseCache.read(str(tmp_path), 'request')
+
+def test_integration_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=1)
+    entry_size = None
+
+    cache.put('first', 'response')
+    entry_size = cache.stats()['bytes']
+    cache = ResponseCache(str(tmp_path), max_bytes=int(entry_size*2.5))
+
+    cache.put('second', 'response')
+    cache.get('first')
+    cache.put('third', 'response')
+
+    assert 'response' == cache.get('first')
+    assert cache.get('second') is None
+    assert 'response' == cache.get('third')
+    assert 1 == cache.evictions
@@ -0,0 +1,114 @@
+import os
+from datetime import date
+from pytest import raises
+from definitions import SubjectLocationSummary, WeatherSummary
+from gateways import CsvGateway, ShardedCsvGateway
+
+def make_location(subject_id, day=12):
+    return SubjectLocationSummary(subject_id, -73.93524, 40.73061,
+                                  date(2018, 9, day))
+
+def test_integration_records_to_one_shard_per_subject(tmp_path):
+    directory = str(tmp_path / 'shards')
+    sharded_gateway = ShardedCsvGateway(directory, shards=4)
+    weather_summary = WeatherSummary(75.1, 90.4, 63.9, 2)
+
+    for day in [12, 13]:
+        sharded_gateway.record_weather_summary(weather_summary,
+                                               make_location('904299266', day))
+
+    shard_lengths = []
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith('.csv'):
+            with open(os.path.join(directory, filename)) as shard:
+                shard_lengths.append(len(shard.readlines()))
+
+    assert [1, 1, 1, 3] == sorted(shard_lengths)
+    assert weather_summary == sharded_gateway.fetch_weather_summary(
+        make_location('904299266', 13)
+    )
+    assert sharded_gateway.fetch_weather_summary(make_location('11423412')) is None
+
+def test_integration_reads_across_shards(tmp_path):
+    sharded_gateway = ShardedCsvGateway(str(tmp_path), shards=4)
+    locations = [make_location(str(subject_id)) for subject_id in range(20)]
+
+    with sharded_gateway.batch_writer() as writer:
+        for location in locations[:10]:
+            writer.record_weather_summary(WeatherSummary(1, 2, 3, 4), location)
+
+    recorded = [location for location, _ in
+                ShardedCsvGateway(str(tmp_path), shards=4)
+                .fetch_all_weather_summaries()]
+
+    assert sorted(locations[:10]) == sorted(recorded)
+    assert locations[10:] == sharded_gateway.fetch_unrecorded_locations(
+        locations
+    )
+
+def test_integration_batch_writer_flushes_every_shard_before_on_flush(
+        tmp_path):
+    sharded_gateway = ShardedCsvGateway(str(tmp_path), shards=4)
+    locations = [make_location(str(subject_id)) for subject_id in range(8)]
+    unrecorded_at_flush = []
+
+    def on_flush():
+        unrecorded_at_flush.append(
+            ShardedCsvGateway(str(tmp_path), shards=4)
+            .fetch_unrecorded_locations(locations)
+        )
+
+    with sharded_gateway.batch_writer(max_rows=8,
+                                      on_flush=on_flush) as writer:
+        for location in locations:
+            writer.record_weather_summary(WeatherSummary(1, 2, 3, 4), location)
+
+    assert [[]] == unrecorded_at_flush
+
+def test_integration_imports_existing_csv_once(tmp_path):
+    csv_filename = str(tmp_path / 'dark_sky_data.csv')
+    csv_gateway = CsvGateway(csv_filename)
+    locations = [make_location(str(subject_id)) for subject_id in range(10)]
+    for location in locations:
+        csv_gateway.record_weather_summary(WeatherSummary(1, 2, 3, 4),
+                                           location)
+    csv_gateway.record_weather_summary(WeatherSummary(5, 6, 7, 8),
+                                       locations[0])
+    directory = str(tmp_path / 'shards')
+
+    sharded_gateway = ShardedCsvGateway(directory, shards=4)
+
+    assert 10 == sharded_gateway.import_csv(csv_filename, batch_size=3)
+    assert 0 == sharded_gateway.import_csv(csv_filename)
+    assert sorted(locations) == sorted(
+        location for location, _ in
+        ShardedCsvGateway(directory, shards=4).fetch_all_weather_summaries()
+    )
+    assert WeatherSummary(1, 2, 3, 4) == \
+        sharded_gateway.fetch_weather_summary(locations[0])
+
+def test_integration_resumes_interrupted_import(tmp_path):
+    csv_filename = str(tmp_path / 'dark_sky_data.csv')
+    csv_gateway = CsvGateway(csv_filename)
+    locations = [make_location(str(subject_id)) for subject_id in range(10)]
+    for location in locations:
+        csv_gateway.record_weather_summary(WeatherSummary(1, 2, 3, 4),
+                                           location)
+    sharded_gateway = ShardedCsvGateway(str(tmp_path / 'shards'), shards=4)
+    for location in locations[:4]:
+        sharded_gateway.record_weather_summary(WeatherSummary(1, 2, 3, 4),
+                                               location)
+
+    assert 6 == sharded_gateway.import_csv(csv_filename)
+    assert 10 == len(list(sharded_gateway.fetch_all_weather_summaries()))
+
+def test_imports_nothing_without_csv(tmp_path):
+    sharded_gateway = ShardedCsvGateway(str(tmp_path / 'shards'), shards=4)
+
+    assert 0 == sharded_gateway.import_csv(str(tmp_path / 'missing.csv'))
+
+def test_refuses_a_different_number_of_shards(tmp_path):
+    ShardedCsvGateway(str(tmp_path), shards=4)
+
+    with raises(ValueError):
+        ShardedCsvGateway(str(tmp_path), shards=8)
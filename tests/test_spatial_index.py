@@ -0,0 +1,47 @@
+from datetime import date
+from pytest import approx
+from definitions import SubjectLocationSummary
+from gateways.spatial_index import SpatialIndex, haversine_km
+
+def make_location(longitude, latitude, day=12):
+    return SubjectLocationSummary('904299266', longitude, latitude,
+                                  date(2018, 9, day))
+
+def test_computes_great_circle_distance():
+    # Manhattan to Los Angeles.
+    assert approx(3936, rel=0.01) == haversine_km(-73.98859, 40.71567,
+                                                  -118.2437, 34.0522)
+
+def test_finds_nearest_location_on_the_same_date():
+    spatial_index = SpatialIndex(cell_size=0.01)
+    far = make_location(-73.95, 40.73)
+    near = make_location(-73.9355, 40.7306)
+    spatial_index.add(far, 'far')
+    spatial_index.add(near, 'near')
+    spatial_index.add(make_location(-73.93524, 40.73061, day=13), 'other day')
+
+    distance, location, value = spatial_index.nearest(
+        make_location(-73.93524, 40.73061),
+        max_distance_km=5
+    )
+
+    assert 'near' == value
+    assert near == location
+    assert approx(0.022, abs=0.001) == distance
+
+def test_searches_neighbouring_cells():
+    spatial_index = SpatialIndex(cell_size=0.001)
+    spatial_index.add(make_location(-73.94, 40.74), 'neighbour')
+
+    nearest = spatial_index.nearest(make_location(-73.935, 40.73),
+                                    max_distance_km=2)
+
+    assert 'neighbour' == nearest[2]
+
+def test_ignores_locations_beyond_max_distance():
+    spatial_index = SpatialIndex()
+    spatial_index.add(make_location(-73.98859, 40.71567), 'manhattan')
+
+    assert spatial_index.nearest(make_location(-118.2437, 34.0522), 100) is None
+    assert spatial_index.nearest(make_location(-73.98859, 40.71567, day=13),
+                                 100) is None
@@ -0,0 +1,162 @@
+import sqlite3
+import threading
+from datetime import date
+from pytest import raises
+from definitions import (ApproximateWeatherSummary, SubjectLocationSummary,
+                         WeatherSummary)
+from gateways import SqliteGateway
+
+def make_location(subject_id='904299266', day=20):
+    return SubjectLocationSummary(subject_id, -118.2437, 34.0522,
+                                  date(1995, 6, day))
+
+def test_integration_records_weather_summary(tmp_path):
+    filename = str(tmp_path / 'weather.sqlite')
+    expected = WeatherSummary(75.1, 90.4, 63.9, 2, 81.3, 96.4, None)
+
+    SqliteGateway(filename).record_weather_summary(expected, make_location())
+
+    sqlite_gateway = SqliteGateway(filename)
+
+    assert expected == sqlite_gateway.fetch_weather_summary(make_location())
+    assert sqlite_gateway.fetch_weather_summary(make_location(day=21)) is None
+
+def test_integration_upserts_weather_summary(tmp_path):
+    sqlite_gateway = SqliteGateway(str(tmp_path / 'weather.sqlite'))
+
+    sqlite_gateway.record_weather_summary(
+        WeatherSummary(75.1, 90.4, 63.9, 2),
+        make_location()
+    )
+    sqlite_gateway.record_weather_summary(
+        WeatherSummary(76.0, None, None, None),
+        make_location()
+    )
+    sqlite_gateway.record_weather_summary(
+        WeatherSummary(76.0, None, None, None),
+        make_location()
+    )
+
+    assert ([(make_location(), WeatherSummary(76.0, 90.4, 63.9, 2))] ==
+            list(sqlite_gateway.fetch_all_weather_summaries()))
+
+def test_integration_fetches_unrecorded_locations(tmp_path):
+    sqlite_gateway = SqliteGateway(str(tmp_path / 'weather.sqlite'))
+    sqlite_gateway.record_weather_summaries([
+        (make_location(), WeatherSummary(75.1, 90.4, 63.9, 2))
+    ])
+
+    locations = [make_location(day=21), make_location(), make_location('1')]
+
+    assert ([make_location(day=21), make_location('1')] ==
+            sqlite_gateway.fetch_unrecorded_locations(locations))
+
+def test_integration_records_from_many_threads(tmp_path):
+    sqlite_gateway = SqliteGateway(str(tmp_path / 'weather.sqlite'))
+    locations = [make_location(str(i)) for i in range(50)]
+
+    def record(worker):
+        for location in locations[worker::5]:
+            sqlite_gateway.record_weather_summary(
+                WeatherSummary(1, 2, 3, 4),
+                location
+            )
+
+    threads = [threading.Thread(target=record, args=(worker,))
+               for worker in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [] == sqlite_gateway.fetch_unrecorded_locations(locations)
+
+def test_integration_commits_batches(tmp_path):
+    filename = str(tmp_path / 'weather.sqlite')
+    locations = [make_location(str(i)) for i in range(5)]
+    unrecorded_after_flushes = []
+
+    def count_unrecorded():
+        with SqliteGateway(filename) as reader:
+            unrecorded_after_flushes.append(
+                len(reader.fetch_unrecorded_locations(locations))
+            )
+
+    with SqliteGateway(filename) as sqlite_gateway:
+        with sqlite_gateway.batch_writer(max_rows=2,
+                                         on_flush=count_unrecorded) as writer:
+            for location in locations:
+                writer.record_weather_summary(WeatherSummary(1, 2, 3, 4),
+                                              location)
+
+    assert [3, 1, 0] == unrecorded_after_flushes
+
+def test_integration_closes_connections_of_every_thread(tmp_path):
+    sqlite_gateway = SqliteGateway(str(tmp_path / 'weather.sqlite'))
+    connections = []
+
+    def record():
+        sqlite_gateway.record_weather_summary(WeatherSummary(1, 2, 3, 4),
+                                              make_location())
+        connections.append(sqlite_gateway._connect())
+
+    thread = threading.Thread(target=record)
+    thread.start()
+    thread.join()
+    connections.append(sqlite_gateway._connect())
+
+    sqlite_gateway.close()
+
+    for connection in connections:
+        with raises(sqlite3.ProgrammingError):
+            connection.execute('SELECT 1')
+    assert sqlite_gateway.fetch_weather_summary(make_location()) is not None
+
+def test_integration_records_every_weather_field(tmp_path):
+    sqlite_gateway = SqliteGateway(str(tmp_path / 'weather.sqlite'))
+    exact = WeatherSummary(75.1, 90.4, 63.9, 2, 81.3, 96.4, 60.2, 74.0, 6.5,
+                           9)
+    approximate = ApproximateWeatherSummary(75.1, 90.4, 63.9, 2, 81.3, 96.4,
+                                            60.2, 74.0, 6.5, 9,
+                                            distance_km=0.4)
+
+    sqlite_gateway.record_weather_summary(approximate, make_location('1'))
+    sqlite_gateway.record_weather_summary(exact, make_location())
+
+    assert approximate == sqlite_gateway.fetch_weather_summary(
+        make_location('1')
+    )
+    assert exact == sqlite_gateway.fetch_weather_summary(make_location())
+
+    sqlite_gateway.record_weather_summary(exact, make_location('1'))
+
+    assert exact == sqlite_gateway.fetch_weather_summary(make_location('1'))
+
+def test_integration_adds_new_columns_to_older_tables(tmp_path):
+    filename = str(tmp_path / 'weather.sqlite')
+    with sqlite3.connect(filename) as connection:
+        connection.execute('''
+            CREATE TABLE weather_summaries (
+                subject_id TEXT NOT NULL, longitude REAL NOT NULL,
+                latitude REAL NOT NULL, date TEXT NOT NULL, mean_temp REAL,
+                max_temp REAL, min_temp REAL, apparent_mean_temp REAL,
+                apparent_max_temp REAL, apparent_min_temp REAL,
+                precipitation REAL
+            )''')
+        connection.execute(
+            '''INSERT INTO weather_summaries VALUES
+               ('904299266', -118.2437, 34.0522, '1995-06-20', 75.1, 90.4,
+                63.9, NULL, NULL, NULL, 2)'''
+        )
+    connection.close()
+    expected = WeatherSummary(70, 80, 60, 0, median_temp=71.0,
+                              stddev_temp=4.5, hours_above_threshold=3)
+
+    with SqliteGateway(filename) as sqlite_gateway:
+        sqlite_gateway.record_weather_summary(expected, make_location('1'))
+
+        assert WeatherSummary(75.1, 90.4, 63.9, 2) == \
+            sqlite_gateway.fetch_weather_summary(make_location())
+        assert expected == sqlite_gateway.fetch_weather_summary(
+            make_location('1')
+        )
@@ -0,0 +1,63 @@
+from datetime import date
+from definitions import (ApproximateWeatherSummary, SubjectLocationSummary,
+                         SubjectLocationSummaryArray, WeatherSummary,
+                         WeatherSummaryArray, WeatherSummaryIndex)
+
+def test_stores_subject_location_summaries():
+    summaries = [
+        SubjectLocationSummary('904299266', -118.2437, 34.0522, date(1995, 6, 20)),
+        SubjectLocationSummary('11423412', -73.935242, 40.73061, date(2018, 9, 12)),
+        SubjectLocationSummary('904299266', -118.2437, 34.0522, date(1995, 6, 21))
+    ]
+
+    array = SubjectLocationSummaryArray(summaries)
+
+    assert 3 == len(array)
+    assert summaries == list(array)
+    assert summaries == array
+    assert summaries[1] == array[-2]
+    assert summaries[1:] == array[1:]
+    assert summaries[2] in array
+    assert 2 == len(array._subject_ids)
+
+def test_finds_first_of_each_subject_location_summary():
+    summaries = [SubjectLocationSummary(str(subject_id % 7), subject_id/10,
+                                        0.0, date(2018, 9, 12))
+                 for subject_id in range(100)]
+
+    array = SubjectLocationSummaryArray(summaries + summaries[:3])
+
+    assert list(range(100)) == [array.find(summary) for summary in summaries]
+    assert array.find(summaries[0]._replace(latitude=-0.0)) == 0
+    assert array.find(summaries[0]._replace(subject_id='unknown')) is None
+    assert summaries[0]._replace(date=date(2018, 9, 13)) not in array
+    assert 103 == len(array)
+
+def test_stores_weather_summaries():
+    summaries = [
+        WeatherSummary(75.1, 90.4, 63.9, 2, 81.3, 96.4, 63.4, 74.0, 6.5, 9),
+        WeatherSummary(1.1, 12.43112, 0.049, 0.33),
+        ApproximateWeatherSummary(1.1, 12.43112, 0.049, 0.33, distance_km=0.4)
+    ]
+
+    array = WeatherSummaryArray(summaries)
+
+    assert summaries == list(array)
+    assert array[1].apparent_mean_temp is None
+    assert isinstance(array[0].hours_above_threshold, int)
+
+def test_indexes_first_weather_summary_per_location():
+    location = SubjectLocationSummary('904299266', -118.2437, 34.0522,
+                                      date(1995, 6, 20))
+    index = WeatherSummaryIndex()
+
+    index.setdefault(location, WeatherSummary(75.1, 90.4, 63.9, 2))
+    index.setdefault(location, WeatherSummary(1, 2, 3, 4))
+
+    assert WeatherSummary(75.1, 90.4, 63.9, 2) == index.get(location)
+    assert index.get(location._replace(subject_id='1')) is None
+    assert [(location, WeatherSummary(75.1, 90.4, 63.9, 2))] == \
+        list(index.items())
+
+def test_weather_summary_has_no_instance_dict():
+    assert not hasattr(WeatherSummary(1, 2, 3, 4), '__dict__')
@@ -0,0 +1,239 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from definitions import SubjectLocationSummary, WeatherSummary
+from gateways import CsvGateway, ManifestGateway
+from weather_history import ProgressTracker, process_files, watch_files
+
+def write_follow_mee_file(directory, name, longitude=-73.935242,
+                          latitude=40.73061):
+    path = directory / name
+    path.write_text(
+        'Data.Longitude,Data.Latitude,Data.Date\n'
+        '{},{},2018-09-12T22:41:57-04:00\n'.format(longitude, latitude)
+    )
+    return str(path)
+
+class FakeWeatherFetcher:
+    """Fetches a fake weather summary, remembering every location asked
+    for.
+    """
+    def __init__(self, log=None):
+        self.requests = []
+        self._log = log
+
+    def __call__(self, subject_location_summaries):
+        for location in subject_location_summaries:
+            self.requests.append(location)
+            if self._log is not None:
+                self._log.append('fetched')
+            yield location, WeatherSummary(75.1, 90.4, 63.9, 2)
+
+class FakeWatcher:
+    """Reports each of 'batches' in turn, along with the files forgotten
+    since the last one.
+    """
+    def __init__(self, batches):
+        self._batches = batches
+        self.forgotten = []
+
+    def watch(self):
+        for batch in self._batches:
+            files = self.forgotten + batch
+            self.forgotten = []
+            yield files
+
+    def forget(self, paths):
+        self.forgotten.extend(paths)
+
+def run(files, tmp_path, fetcher):
+    csv_gateway = CsvGateway(str(tmp_path / 'dark_sky_data.csv'))
+    progress = ProgressTracker(ManifestGateway(str(tmp_path / 'manifest')))
+    progress.seed(csv_gateway)
+    process_files(files, csv_gateway, progress, fetcher, processes=1)
+    return csv_gateway
+
+def make_location(subject_id, longitude=-73.935242, latitude=40.73061):
+    return SubjectLocationSummary(subject_id, longitude, latitude,
+                                  date(2018, 9, 12))
+
+def test_integration_records_weather_for_each_location_once(tmp_path):
+    exports = tmp_path / 'exports'
+    exports.mkdir()
+    files = [
+        write_follow_mee_file(exports, '11423412_first_json.csv'),
+        write_follow_mee_file(exports, '11423412_second_json.csv'),
+        write_follow_mee_file(exports, '904299266_first_json.csv',
+                              longitude=-118.2437, latitude=34.0522)
+    ]
+    (exports / '11423412_invalid_json.csv').write_text('Data.Longitude\n')
+    files.append(str(exports / '11423412_invalid_json.csv'))
+    fetcher = FakeWeatherFetcher()
+
+    csv_gateway = run(files, tmp_path, fetcher)
+
+    expected = [
+        SubjectLocationSummary('11423412', -73.935242, 40.73061,
+                               date(2018, 9, 12)),
+        SubjectLocationSummary('904299266', -118.2437, 34.0522,
+                               date(2018, 9, 12))
+    ]
+    assert expected == fetcher.requests
+    assert expected == [location for location, _ in
+                        csv_gateway.fetch_all_weather_summaries()]
+
+def test_integration_fetches_before_every_file_is_parsed(tmp_path):
+    exports = tmp_path / 'exports'
+    exports.mkdir()
+    log = []
+
+    def discover():
+        for index in range(200):
+            log.append('discovered')
+            yield write_follow_mee_file(
+                exports,
+                '{}_json.csv'.format(index),
+                longitude=index/100
+            )
+
+    run(discover(), tmp_path, FakeWeatherFetcher(log))
+
+    assert 400 == len(log)
+    assert log.index('fetched') < len(log) - 1 - log[::-1].index('discovered')
+
+def test_integration_restarts_without_reading_recorded_weather(tmp_path,
+                                                               monkeypatch):
+    exports = tmp_path / 'exports'
+    exports.mkdir()
+    files = [write_follow_mee_file(exports, '11423412_json.csv'),
+             write_follow_mee_file(exports, '904299266_json.csv')]
+    run(files, tmp_path, FakeWeatherFetcher())
+
+    def fail(*args):
+        raise AssertionError('recorded weather was read')
+
+    monkeypatch.setattr(CsvGateway, 'fetch_all_weather_summaries', fail)
+    monkeypatch.setattr(CsvGateway, '_load_index', fail)
+    fetcher = FakeWeatherFetcher()
+
+    run(files, tmp_path, fetcher)
+
+    assert [] == fetcher.requests
+
+def test_integration_refetches_changed_files(tmp_path):
+    exports = tmp_path / 'exports'
+    exports.mkdir()
+    files = [write_follow_mee_file(exports, '11423412_json.csv'),
+             write_follow_mee_file(exports, '904299266_json.csv')]
+    run(files, tmp_path, FakeWeatherFetcher())
+
+    write_follow_mee_file(exports, '904299266_json.csv', longitude=-118.2437,
+                          latitude=34.0522)
+    os.utime(files[1], ns=(0, 0))
+    fetcher = FakeWeatherFetcher()
+
+    run(files, tmp_path, fetcher)
+
+    assert [make_location('904299266', -118.2437, 34.0522)] == \
+        fetcher.requests
+
+def test_integration_resumes_after_interrupted_batch(tmp_path):
+    exports = tmp_path / 'exports'
+    exports.mkdir()
+    files = [write_follow_mee_file(exports, '11423412_json.csv'),
+             write_follow_mee_file(exports, '904299266_json.csv',
+                                   longitude=-118.2437, latitude=34.0522)]
+    csv_filename = str(tmp_path / 'dark_sky_data.csv')
+    manifest = tmp_path / 'manifest'
+    run(files, tmp_path, FakeWeatherFetcher())
+
+    # Kill the run after the second file's weather was written but before
+    # its manifest records were, with half a line in each file.
+    seeded, first_location, first_file = \
+        manifest.read_text().splitlines(keepends=True)[:3]
+    manifest.write_text(seeded + first_location + first_file +
+                        '{"location": ["9042')
+    with open(csv_filename, 'a') as csvfile:
+        csvfile.write('904299266,-118.2437,34.05')
+    fetcher = FakeWeatherFetcher()
+
+    csv_gateway = run(files, tmp_path, fetcher)
+
+    assert [make_location('904299266', -118.2437, 34.0522)] == \
+        fetcher.requests
+    assert [make_location('11423412'),
+            make_location('904299266', -118.2437, 34.0522),
+            make_location('904299266', -118.2437, 34.0522)] == [
+                location for location, _ in
+                csv_gateway.fetch_all_weather_summaries()
+            ]
+    assert ManifestGateway(str(manifest)).is_file_processed(
+        files[1],
+        ManifestGateway.file_signature(files[1])
+    )
+
+def test_integration_seeds_manifest_with_recorded_weather(tmp_path):
+    exports = tmp_path / 'exports'
+    exports.mkdir()
+    files = [write_follow_mee_file(exports, '11423412_json.csv')]
+    CsvGateway(str(tmp_path / 'dark_sky_data.csv')).record_weather_summary(
+        WeatherSummary(75.1, 90.4, 63.9, 2),
+        make_location('11423412')
+    )
+    fetcher = FakeWeatherFetcher()
+
+    run(files, tmp_path, fetcher)
+
+    assert [] == fetcher.requests
+    assert ManifestGateway(str(tmp_path / 'manifest')).is_seeded
+
+def test_skips_files_that_disappear(tmp_path):
+    progress = ProgressTracker(ManifestGateway(str(tmp_path / 'manifest')))
+    present = tmp_path / 'present_json.csv'
+    present.write_text('Data.Longitude')
+
+    assert [str(present)] == list(progress.skip_processed_files(
+        [str(tmp_path / 'missing_json.csv'), str(present)]
+    ))
+
+def test_integration_watch_retries_files_of_failed_batches(tmp_path):
+    exports = tmp_path / 'exports'
+    exports.mkdir()
+    first = write_follow_mee_file(exports, '11423412_json.csv')
+    second = write_follow_mee_file(exports, '904299266_json.csv',
+                                   longitude=-118.2437, latitude=34.0522)
+    unreadable = exports / '98123345_json.csv'
+    unreadable.mkdir()
+    watcher = FakeWatcher([[first, str(unreadable)], [second], []])
+    failures = [make_location('11423412')]
+    fetcher = FakeWeatherFetcher()
+
+    def fetch_weather_summaries(locations):
+        for location, weather_summary in fetcher(locations):
+            if location in failures:
+                failures.remove(location)
+                raise RuntimeError('Dark Sky is down')
+            yield location, weather_summary
+
+    csv_gateway = CsvGateway(str(tmp_path / 'dark_sky_data.csv'))
+    manifest = ManifestGateway(str(tmp_path / 'manifest'))
+    progress = ProgressTracker(manifest)
+
+    with ProcessPoolExecutor(2) as executor:
+        watch_files(watcher, csv_gateway, progress, fetch_weather_summaries,
+                    2, executor)
+
+    assert [make_location('11423412'),
+            make_location('11423412'),
+            make_location('904299266', -118.2437, 34.0522)] == fetcher.requests
+    assert {make_location('11423412'),
+            make_location('904299266', -118.2437, 34.0522)} == {
+                location for location, _ in
+                csv_gateway.fetch_all_weather_summaries()
+            }
+    assert [str(unreadable)] == watcher.forgotten
+    for filename in [first, second]:
+        assert manifest.is_file_processed(
+            filename,
+            ManifestGateway.file_signature(filename)
+        )
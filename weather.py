@@ -5,68 +5,12 @@ import logging
 import argparse
 import csv
 from collections import namedtuple
-from datetime import date, datetime, timezone, timedelta
-import time
 import requests
 import boto3
+from rate_controller import RateController
 
 logging.basicConfig(filename='weather.log', level=logging.INFO)
 
-class RateController:
-    """Class that controls the rate at which calls are made to the Weather Underground API.
-
-    There are two rates with which we must obide:
-    1) make no more than 10 calls/minute
-    2) make no more than 500 calls/day
-    """
-
-    EST_TIMEZONE = timezone(timedelta(hours=-4))
-
-    def __init__(self):
-        self._current_date = RateController._now().date()
-        self._calls_today = 0
-
-
-    @staticmethod
-    def _now():
-        """Returns the current EST datetime, naively assuming that EST is four hours
-        behind UTC.
-        """
-        return datetime.now(tz=RateController.EST_TIMEZONE)
-
-    @staticmethod
-    def _get_seconds_until_tomorrow():
-        """Return the number of seconds from EST now until EST midnight."""
-        now = RateController._now()
-        tomorrow = now + timedelta(days=1)
-        midnight = datetime(
-            year=tomorrow.year,
-            month=tomorrow.month,
-            day=tomorrow.day,
-            tzinfo=timezone(timedelta(hours=-4))
-        )
-        return (midnight - now).total_seconds()
-
-    def control_rate(self):
-        if self._current_date != RateController._now().date():
-            self._calls_today = 0
-            self._current_date = RateController._now().date()
-
-        self._calls_today += 1
-
-        logging.info('Calls today: {calls}'.format(
-            calls=self._calls_today
-        ))
-
-        if self._calls_today == 500:
-            seconds_until_tomorrow = RateController._get_seconds_until_tomorrow()
-            logging.info('Sleeping until tomorrow for {seconds} seconds'.format(
-                seconds=seconds_until_tomorrow
-            ))
-            time.sleep(seconds_until_tomorrow)
-        else:
-            time.sleep(6.1)
-
 def get_all_weather_data():
     """ DEPRECATED METHOD.
     
@@ -97,9 +41,11 @@ def get_all_weather_data():
     ))
 
     s3_gateway = S3Gateway(args.aws_access_key_id, args.aws_secret_access_key)
-    rate_controller = RateController()
+    rate_controller = RateController(state_filename='weather_calls.json')
 
     for index, valid_point in enumerate(valid_points):
+        rate_controller.control_rate()
+
         weather_data = WeatherUndergroundGateway.fetch_weather_data(valid_point)
         absolute_filename = FileSystemGateway.store_weather_data(
             valid_point,
@@ -109,8 +55,6 @@ def get_all_weather_data():
         s3_gateway.upload_weather_data(absolute_filename)
         logging.info('Processed point #{index}'.format(index=index))
 
-        rate_controller.control_rate()
-
 def get_weather_info():
     files = os.listdir('/vagrant/Downloaded Files')
     
@@ -1,45 +1,429 @@
 import argparse
 import os
 import time
+import traceback
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
 
-from gateways import CsvGateway, FollowMeeFileGateway, DarkSkyGateway
+import metrics
+from api_key_pool import ApiKeyPool
+from gateways import (CsvGateway, FollowMeeFileGateway, DarkSkyGateway,
+                      CoalescingWeatherGateway, ConcurrentWeatherGateway,
+                      DirectoryWatcher, ManifestGateway, NearbyWeatherGateway,
+                      ResponseCache, ShardedCsvGateway, http_session)
 
-def get_weather_history(api_key):
-    downloaded_files_path = '/vagrant/Downloaded Files'
+DOWNLOADED_FILES_PATH = '/vagrant/Downloaded Files'
 
-    files = [os.path.join(downloaded_files_path, downloaded_file)
-             for downloaded_file in os.listdir(downloaded_files_path)]
+def get_weather_history(api_keys, downloaded_files_path=DOWNLOADED_FILES_PATH,
+                        csv_filename='dark_sky_data.csv', processes=None,
+                        max_in_flight=8, calls_per_minute=None,
+                        calls_per_day=None, cell_size=None,
+                        max_distance_km=None,
+                        cache_directory='dark_sky_cache',
+                        cache_max_bytes=2**30,
+                        manifest_filename=None,
+                        watch_interval=None, shard_directory=None,
+                        shards=16, metrics_json_filename=None,
+                        metrics_prometheus_filename=None,
+                        metrics_interval=60.0):
+    """Fetch and record the weather for every location in the FollowMee files
+    in 'downloaded_files_path' that is not yet in 'csv_filename'. The other
+    options are described by the command line help at the end of this file.
+    """
+    reporter = nullcontext()
+    if metrics_json_filename or metrics_prometheus_filename:
+        reporter = metrics.MetricsReporter(
+            metrics.REGISTRY,
+            metrics_json_filename,
+            metrics_prometheus_filename,
+            metrics_interval
+        )
+
+    with reporter:
+        if shard_directory:
+            csvGateway = ShardedCsvGateway(shard_directory, shards)
+            csvGateway.import_csv(csv_filename)
+        else:
+            csvGateway = CsvGateway(csv_filename)
+        if manifest_filename is None:
+            manifest_filename = ManifestGateway.default_filename(
+                csv_filename,
+                shard_directory
+            )
+        progress = ProgressTracker(ManifestGateway(manifest_filename))
+        progress.seed(csvGateway)
 
-    print('Total number of downloaded files: {}'.format(len(files)))
-    
-    csvGateway = CsvGateway('dark_sky_data.csv')
-    
-    locations = [FollowMeeFileGateway.extract_subject_location_summary(f) for f
-                 in files if FollowMeeFileGateway.extract_subject_location_summary(f)]
+        http_session.configure_session(
+            pool_size=max_in_flight,
+            retry_statuses=http_session.SERVER_ERROR_STATUSES
+        )
 
-    print('Total number of locations: {}'.format(len(locations)))
+        cache = None
+        if cache_directory:
+            cache = ResponseCache(cache_directory, cache_max_bytes)
 
-    unprocessed_locations = [location for location in locations
-                             if not csvGateway.fetch_weather_summary(location)]
+        if isinstance(api_keys, str):
+            api_keys = [api_keys]
 
-    print('Total number of unprocessed data points: {}'.format(len(
-        unprocessed_locations
-    )))
-    
-    for unprocessed_location in unprocessed_locations:
-        weather_summary = DarkSkyGateway.fetch_weather_summary(
-            unprocessed_location,
-            api_key
+        fetch_weather_summaries = make_weather_fetcher(
+            api_keys,
+            max_in_flight,
+            calls_per_minute,
+            calls_per_day,
+            cell_size,
+            cache,
+            csvGateway,
+            max_distance_km
         )
-        
-        csvGateway.record_weather_summary(
-            weather_summary,
-            unprocessed_location
+
+        if watch_interval:
+            watcher = DirectoryWatcher(downloaded_files_path, watch_interval)
+            with ProcessPoolExecutor(processes) as executor:
+                watch_files(watcher, csvGateway, progress,
+                            fetch_weather_summaries, processes, executor)
+        else:
+            process_files(discover_files(downloaded_files_path), csvGateway,
+                          progress, fetch_weather_summaries, processes)
+
+        if cache is not None:
+            print('Response cache: {}'.format(cache.stats()))
+
+def watch_files(watcher, csvGateway, progress, fetch_weather_summaries,
+                processes, executor=None):
+    """Process every batch of files that 'watcher' reports, as
+    'process_files' does. A batch that raises is logged rather than ending
+    the watch, and the files it did not finish are handed back to
+    'watcher' to be reported again.
+    """
+    for files in watcher.watch():
+        try:
+            process_files(files, csvGateway, progress,
+                          fetch_weather_summaries, processes, executor)
+        except Exception:
+            traceback.print_exc()
+
+        unfinished_files = progress.take_unfinished_files()
+        if unfinished_files:
+            print('Will retry {} unfinished files'.format(
+                len(unfinished_files)
+            ))
+            watcher.forget(unfinished_files)
+
+def process_files(files, csvGateway, progress, fetch_weather_summaries,
+                  processes, executor=None):
+    """Fetch the weather for the locations in 'files' that 'progress' has
+    not seen fetched, and record it in 'csvGateway'. Files are parsed in
+    'executor', a ProcessPoolExecutor of 'processes' workers, if it is
+    given.
+
+    Weather is written once a second has passed since the oldest unwritten
+    summary, checked as each summary arrives, and when the files run out.
+    While fetching is held up, such as by a rate limit, the last summaries
+    wait; if the process dies first, they are fetched again, usually from
+    the response cache.
+    """
+    counts = Counter()
+
+    files = count(
+        progress.skip_processed_files(files),
+        counts,
+        'new downloaded files'
+    )
+    unprocessed_locations = count(
+        progress.drop_duplicates(
+            FollowMeeFileGateway.extract_file_subject_location_summaries(
+                files,
+                processes,
+                executor=executor
+            )
+        ),
+        counts,
+        'unprocessed data points'
+    )
+
+    with csvGateway.batch_writer(max_seconds=1.0,
+                                 on_flush=progress.flush) as csvWriter:
+        for unprocessed_location, weather_summary in \
+                fetch_weather_summaries(unprocessed_locations):
+            csvWriter.record_weather_summary(
+                weather_summary,
+                unprocessed_location
+            )
+            progress.complete(unprocessed_location)
+
+    progress.flush()
+
+    for name in ['new downloaded files', 'unprocessed data points']:
+        print('Total number of {}: {}'.format(name, counts[name]))
+
+def make_weather_fetcher(api_keys, max_in_flight, calls_per_minute,
+                         calls_per_day, cell_size, cache, csvGateway=None,
+                         max_distance_km=None):
+    """Make a callable that takes a stream of SubjectLocationSummary and yields
+    (subject_location_summary, weather_summary) pairs fetched from Dark Sky
+    with the keys in 'api_keys'. With 'max_distance_km', weather recorded in
+    'csvGateway' that near a location is reused instead.
+    """
+    key_pool = ApiKeyPool(
+        api_keys,
+        calls_per_minute,
+        calls_per_day,
+        state_directory='dark_sky_calls',
+        timezone='UTC',
+        legacy_state_filename='dark_sky_calls.json'
+    )
+    concurrentGateway = ConcurrentWeatherGateway(
+        partial(
+            DarkSkyGateway.fetch_weather_summary,
+            cache=cache,
+            key_pool=key_pool
+        ),
+        max_in_flight
+    )
+
+    fetch_weather_summaries = concurrentGateway.fetch_weather_summaries
+    if cell_size:
+        fetch_weather_summaries = CoalescingWeatherGateway(
+            fetch_weather_summaries,
+            cell_size
+        ).fetch_weather_summaries
+    if max_distance_km:
+        fetch_weather_summaries = NearbyWeatherGateway(
+            csvGateway,
+            fetch_weather_summaries,
+            max_distance_km
+        ).fetch_weather_summaries
+
+    return fetch_weather_summaries
+
+def discover_files(directory_name):
+    """Yield the path of every file in 'directory_name', in name order."""
+    for filename in sorted(os.listdir(directory_name)):
+        yield os.path.join(directory_name, filename)
+
+class ProgressTracker:
+    """Keeps track of which files are waiting for which locations' weather,
+    and records files and locations in 'manifest' once they are complete.
+    """
+    SEED_BATCH_SIZE = 10000
+
+    def __init__(self, manifest):
+        self._manifest = manifest
+        self._file_signatures = {}
+        self._waiting_files = {}
+
+    def seed(self, store):
+        """Record every location that has weather in 'store', such as a
+        CsvGateway, as fetched, unless the manifest has been seeded before.
+        """
+        if self._manifest.is_seeded:
+            return
+
+        for index, (location, _) in enumerate(
+                store.fetch_all_weather_summaries(), 1):
+            self._manifest.record_location(location)
+            if index % ProgressTracker.SEED_BATCH_SIZE == 0:
+                self._manifest.flush()
+
+        self._manifest.record_seeded()
+        self._manifest.flush()
+
+    def skip_processed_files(self, filenames):
+        """Yield those 'filenames' that the manifest does not list as
+        processed in their current state. Files that disappear before they
+        are looked at are skipped.
+        """
+        for filename in filenames:
+            try:
+                signature = ManifestGateway.file_signature(filename)
+            except FileNotFoundError:
+                continue
+            if not self._manifest.is_file_processed(filename, signature):
+                self._file_signatures[filename] = signature
+                yield filename
+
+    def drop_duplicates(self, file_locations):
+        """Take (filename, subject_location_summary) pairs and yield each
+        location the first time it is seen. Files without a valid location,
+        or whose location has already been fetched, are complete at once;
+        files whose location is being fetched wait for it.
+        """
+        for filename, location in file_locations:
+            if location is None or self._manifest.is_location_fetched(location):
+                self._complete_file(filename)
+            elif location in self._waiting_files:
+                self._waiting_files[location].append(filename)
+            else:
+                self._waiting_files[location] = [filename]
+                yield location
+
+    def complete(self, location):
+        """Record that the weather at 'location' is stored, completing every
+        file that was waiting for it.
+        """
+        self._manifest.record_location(location)
+        for filename in self._waiting_files.pop(location, []):
+            self._complete_file(filename)
+
+    def flush(self):
+        self._manifest.flush()
+
+    def take_unfinished_files(self):
+        """Return the names of the files that were let through but not
+        completed, such as those that could not be read or whose batch
+        failed, and forget them and the locations they were waiting for, so
+        that they can be processed again.
+        """
+        unfinished_files = list(self._file_signatures)
+        self._file_signatures = {}
+        self._waiting_files = {}
+        return unfinished_files
+
+    def _complete_file(self, filename):
+        self._manifest.record_file(
+            filename,
+            self._file_signatures.pop(filename)
         )
 
+def count(items, counts, name):
+    """Yield 'items', counting them in 'counts[name]' as they pass."""
+    for item in items:
+        counts[name] += 1
+        yield item
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
-    parser.add_argument('api_key')
+    parser.add_argument(
+        'api_keys',
+        nargs='+',
+        metavar='api_key',
+        help=('Dark Sky API keys, each with its own budget; requests go to '
+              'the key with the most budget left, and keys that Dark Sky '
+              'rejects are no longer used')
+    )
+    parser.add_argument(
+        '--downloaded-files-path',
+        default=DOWNLOADED_FILES_PATH,
+        help='directory containing the FollowMee exports'
+    )
+    parser.add_argument(
+        '--csv-filename',
+        default='dark_sky_data.csv',
+        help='file in which to record the weather'
+    )
+    parser.add_argument(
+        '--shard-directory',
+        help=('record the weather in shards in this directory instead of in '
+              'one CSV file, writing each batch to the shards in parallel; '
+              'the weather already in --csv-filename is copied into the '
+              'shards the first time')
+    )
+    parser.add_argument(
+        '--shards',
+        type=int,
+        default=16,
+        help='number of shards in --shard-directory'
+    )
+    parser.add_argument(
+        '--processes',
+        type=int,
+        help='number of processes parsing files; defaults to one per CPU'
+    )
+    parser.add_argument(
+        '--max-in-flight',
+        type=int,
+        default=8,
+        help='number of Dark Sky requests to run at once'
+    )
+    parser.add_argument(
+        '--calls-per-minute',
+        type=int,
+        help='most Dark Sky requests to make per minute with each key'
+    )
+    parser.add_argument(
+        '--calls-per-day',
+        type=int,
+        help='most Dark Sky requests to make per UTC day with each key'
+    )
+    parser.add_argument(
+        '--cell-size',
+        type=float,
+        help=('share one Dark Sky request between all locations in the same '
+              'grid cell of this many degrees on the same day')
+    )
+    parser.add_argument(
+        '--max-distance-km',
+        type=float,
+        help=('reuse the weather already recorded for the nearest location '
+              'within this many kilometres on the same date, recording it '
+              'as approximate')
+    )
+    parser.add_argument(
+        '--cache-directory',
+        default='dark_sky_cache',
+        help=('directory in which to keep raw Dark Sky responses; pass an '
+              'empty string to disable the cache')
+    )
+    parser.add_argument(
+        '--cache-max-bytes',
+        type=int,
+        default=2**30,
+        help='size above which the least recently used responses are evicted'
+    )
+    parser.add_argument(
+        '--manifest-filename',
+        help=('file recording the files and locations done, so that an '
+              'interrupted run can resume; it is seeded with the weather '
+              'already recorded the first time, and alone decides what is '
+              'skipped after that; defaults to --csv-filename with '
+              '.manifest.jsonl appended, or to manifest.jsonl in '
+              '--shard-directory')
+    )
+    parser.add_argument(
+        '--watch',
+        type=float,
+        metavar='SECONDS',
+        help=('keep running, checking for new files every SECONDS seconds and '
+              'fetching their weather as they arrive; files whose batch '
+              'fails are logged and tried again on a later check')
+    )
+    parser.add_argument(
+        '--metrics-json',
+        help=('file to which to append a JSON line of metrics timing the '
+              'requests, rate limiting, CSV lookups and appends, parsing '
+              'and response cache, periodically and when the run ends')
+    )
+    parser.add_argument(
+        '--metrics-prometheus',
+        help='file to keep up to date with metrics in the Prometheus format'
+    )
+    parser.add_argument(
+        '--metrics-interval',
+        type=float,
+        default=60.0,
+        help='seconds between writes of the metrics'
+    )
     args = parser.parse_args()
-    
-    get_weather_history(args.api_key)
+
+    get_weather_history(
+        args.api_keys,
+        downloaded_files_path=args.downloaded_files_path,
+        csv_filename=args.csv_filename,
+        processes=args.processes,
+        max_in_flight=args.max_in_flight,
+        calls_per_minute=args.calls_per_minute,
+        calls_per_day=args.calls_per_day,
+        cell_size=args.cell_size,
+        max_distance_km=args.max_distance_km,
+        cache_directory=args.cache_directory,
+        cache_max_bytes=args.cache_max_bytes,
+        manifest_filename=args.manifest_filename,
+        watch_interval=args.watch,
+        shard_directory=args.shard_directory,
+        shards=args.shards,
+        metrics_json_filename=args.metrics_json,
+        metrics_prometheus_filename=args.metrics_prometheus,
+        metrics_interval=args.metrics_interval
+    )